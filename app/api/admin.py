@@ -13,6 +13,7 @@ from app.schemas.admin import (
     DashboardResponse
 )
 from app.middleware.rate_limit import limiter
+from app.utils.pagination import InvalidCursor
 
 router = APIRouter()
 
@@ -51,11 +52,17 @@ def list_users(
     limit: int = Query(20, ge=1, le=100),
     active_only: bool = Query(False),
     search: Optional[str] = Query(None, description="Search by name or phone number"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces skip)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """List all users with order statistics"""
-    return AdminService.get_all_users(db, skip=skip, limit=limit, active_only=active_only, search=search)
+    try:
+        return AdminService.get_all_users(
+            db, skip=skip, limit=limit, active_only=active_only, search=search, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
 
 
 @router.get("/users/{user_id}", response_model=AdminUserResponse)
@@ -159,6 +166,7 @@ def list_orders(
     search: Optional[str] = Query(None, description="Search by order ID, user phone, or name"),
     date_from: Optional[str] = Query(None, description="Filter from date (ISO format: 2026-01-01)"),
     date_to: Optional[str] = Query(None, description="Filter to date (ISO format: 2026-12-31)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces skip)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
@@ -179,10 +187,13 @@ def list_orders(
         except ValueError:
             pass
     
-    return AdminService.get_all_orders(
-        db, skip=skip, limit=limit, status=status, user_id=user_id,
-        search=search, date_from=parsed_date_from, date_to=parsed_date_to
-    )
+    try:
+        return AdminService.get_all_orders(
+            db, skip=skip, limit=limit, status=status, user_id=user_id,
+            search=search, date_from=parsed_date_from, date_to=parsed_date_to, cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/orders/{order_id}", response_model=AdminOrderResponse)
@@ -225,12 +236,13 @@ def get_coupons_analytics(
 @router.get("/analytics/coupons/{coupon_id}")
 def get_coupon_analytics(
     coupon_id: UUID,
+    exact_uniques: bool = Query(False, description="Count unique viewers exactly (scans coupon_views) instead of estimating"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """Get detailed analytics for a specific coupon"""
     from app.services.coupon_view_service import CouponViewService
-    analytics = CouponViewService.get_coupon_analytics(db, coupon_id)
+    analytics = CouponViewService.get_coupon_analytics(db, coupon_id, exact_uniques=exact_uniques)
     if not analytics:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -243,12 +255,13 @@ def get_coupon_analytics(
 
 @router.get("/analytics/quick-stats")
 def get_quick_stats(
+    exact_uniques: bool = Query(False, description="Count unique viewers exactly (scans coupon_views) instead of estimating"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_admin)
 ):
     """Get today's quick stats: views, redemptions, conversion rate"""
     from app.services.coupon_view_service import CouponViewService
-    return CouponViewService.get_quick_stats(db)
+    return CouponViewService.get_quick_stats(db, exact_uniques=exact_uniques)
 
 
 @router.get("/analytics/trends")
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.auth import Token, ChangePasswordRequest
 from app.schemas.unified_auth import UnifiedRegisterRequest, UnifiedLoginRequest
 from app.schemas.user import UserResponse
 from app.services.auth_service import register_user, authenticate_user, change_password
+from app.services.redis_service import RedisService
 from app.utils.jwt import create_access_token
 from app.utils.currency import get_currency_from_phone_code
 from app.utils.security import get_current_active_user
@@ -28,7 +29,7 @@ def register(request: Request, user_data: UnifiedRegisterRequest, db: Session =
 
 @router.post("/login", response_model=Token)
 @limiter.limit("10/minute")
-def login(request: Request, payload: UnifiedLoginRequest, db: Session = Depends(get_db)):
+def login(request: Request, response: Response, payload: UnifiedLoginRequest, db: Session = Depends(get_db)):
     logger = logging.getLogger(__name__)
     
     # Log attempt based on available identifier
@@ -50,6 +51,12 @@ def login(request: Request, payload: UnifiedLoginRequest, db: Session = Depends(
         data={"sub": str(user.id)},
         currency=currency_code
     )
+    
+    # Only the session this client's own views were recorded under (set by POST /coupons/{id}/view)
+    anonymous_session_id = request.cookies.get(RedisService.ANON_SESSION_COOKIE)
+    if anonymous_session_id:
+        RedisService.merge_recently_viewed(anonymous_session_id, str(user.id))
+        response.delete_cookie(RedisService.ANON_SESSION_COOKIE)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/change-password")
@@ -8,7 +8,6 @@ from app.utils.security import get_current_user
 from app.models.user import User
 from app.schemas.cart import CartItemCreate, CartItemResponse, CartResponse
 from app.services.cart_service import CartService
-from app.services.coupon_service import CouponService
 from app.services.package_service import PackageService
 
 router = APIRouter()
@@ -49,16 +48,16 @@ def get_cart(
 ):
     items = CartService.get_cart(db, current_user.id)
 
-    total = CartService.get_cart_total(db, current_user.id)
+    total = CartService.total_cents(db, items) / 100
     
+    pricing_map = PackageService._pricing_by_package(db, [item.package_id for item in items if item.package])
     for item in items:
         if item.package:
-            coupon_ids = [c.coupon_id for c in item.package.coupon_associations]
-            pricing = PackageService._compute_pricing(db, coupon_ids)
+            pricing = pricing_map.get(item.package_id, {})
             total_price_map = PackageService._compute_total_price(pricing)
             
             # For backward compatibility in response
-            base_sum = sum(CouponService.get_price(c.coupon) for c in item.package.coupon_associations if c.coupon)
+            base_sum = pricing.get("USD", {}).get("price", 0.0)
             discount = item.package.discount or 0.0
             pkg_price = base_sum * (1.0 - discount / 100.0)
             
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
 
 from app.database import get_db
-from app.schemas.coupon import CouponCreate, CouponUpdate, CouponResponse, CouponPublicResponse
+from app.schemas.coupon import CouponCreate, CouponUpdate, CouponResponse, CouponPublicResponse, CouponBatchResponse
+from app.schemas.facet import FacetCounts
 from app.services.coupon_service import CouponService
+from app.services.facet_service import FacetService
 from app.utils.security import get_current_user, get_current_user_optional
 from app.models.user import User
+from app.utils.pagination import InvalidCursor
+from app.utils.batch import TooManyIds, parse_ids
+from app.utils.serialization import PrevalidatedJSONResponse
 
 router = APIRouter()
 
@@ -49,10 +54,6 @@ def create_coupon(
             
             restored = CouponService.update(db, existing.id, update_data)
             
-            # Invalidate cache
-            from app.cache import invalidate_cache
-            invalidate_cache("coupons:*")
-            
             return restored
         else:
             # Coupon exists and is active
@@ -73,13 +74,52 @@ def list_coupons(
     search: Optional[str] = Query(None, description="Search by title, brand, or code"),
     is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
     min_discount: Optional[float] = Query(None, ge=0, description="Filter by minimum discount amount"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
+    currency: str = Query("USD", min_length=3, max_length=3, description="Currency for min_price, max_price and sort=price"),
+    min_price: Optional[float] = Query(None, ge=0, description="Minimum price in currency (unpriced coupons are excluded)"),
+    max_price: Optional[float] = Query(None, ge=0, description="Maximum price in currency (unpriced coupons are excluded)"),
+    sort: Optional[str] = Query(None, pattern="^(newest|price)$", description="newest (default) or price (cheapest first)"),
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_current_user_optional)
 ):
-    return CouponService.get_all(
+    """List coupons, newest first. A full page carries X-Next-Cursor for the next one."""
+    try:
+        coupons = CouponService.get_all(
+            db,
+            skip=skip,
+            limit=limit,
+            active_only=active_only,
+            category_id=category_id,
+            search=search,
+            is_featured=is_featured,
+            min_discount=min_discount,
+            cursor=cursor,
+            currency=currency,
+            min_price=min_price,
+            max_price=max_price,
+            sort=sort,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    following = CouponService.list_cursor(coupons, limit, search, sort, currency)
+    return PrevalidatedJSONResponse(
+        [CouponPublicResponse.payload(c) for c in coupons],
+        headers={"X-Next-Cursor": following} if following else None,
+    )
+
+
+@router.get("/facets", response_model=FacetCounts)
+def get_coupon_facets(
+    active_only: bool = Query(True, description="Show only active coupons (default: true)"),
+    category_id: Optional[UUID] = Query(None, description="Filter by category ID"),
+    search: Optional[str] = Query(None, description="Search by title, brand, or code"),
+    is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
+    min_discount: Optional[float] = Query(None, ge=0, description="Filter by minimum discount amount"),
+    db: Session = Depends(get_db)
+):
+    """Counts per category, brand, country, discount bucket and currency for the listing's filters"""
+    return FacetService.coupon_facets(
         db,
-        skip=skip,
-        limit=limit,
         active_only=active_only,
         category_id=category_id,
         search=search,
@@ -88,15 +128,35 @@ def list_coupons(
     )
 
 
+@router.get("/batch", response_model=CouponBatchResponse)
+def get_coupons_batch(
+    ids: List[str] = Query(..., description="Comma-separated coupon IDs (at most 100)"),
+    db: Session = Depends(get_db)
+):
+    """Get many coupons by ID in one call, in request order"""
+    try:
+        coupon_ids, malformed = parse_ids(ids)
+    except TooManyIds as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    coupons = CouponService.get_many(db, coupon_ids)
+    found = {coupon.id for coupon in coupons}
+    missing = [str(cid) for cid in coupon_ids if cid not in found] + malformed
+    return PrevalidatedJSONResponse({
+        "items": [CouponPublicResponse.payload(c) for c in coupons],
+        "missing": missing,
+    })
+
+
 @router.get("/trending", response_model=List[CouponPublicResponse])
 def get_trending_coupons(
-    period: str = Query("24h", pattern="^(24h|7d)$", description="Trending period: 24h or 7d"),
+    period: str = Query("24h", pattern="^(1h|24h|7d)$", description="Trending period: 1h, 24h or 7d"),
     limit: int = Query(10, ge=1, le=50),
     db: Session = Depends(get_db)
 ):
-    """Get trending coupons ranked by real-time view count"""
+    """Get trending coupons ranked by views in a sliding window (refreshed every minute)"""
     from app.services.redis_service import RedisService
-    return RedisService.get_trending_coupons(db, period=period, limit=limit)
+    coupons = RedisService.get_trending_coupons(db, period=period, limit=limit)
+    return PrevalidatedJSONResponse([CouponPublicResponse.payload(c) for c in coupons])
 
 
 @router.get("/recently-viewed", response_model=List[CouponPublicResponse])
@@ -107,7 +167,8 @@ def get_recently_viewed(
 ):
     """Get recently viewed coupons for a session/user"""
     from app.services.redis_service import RedisService
-    return RedisService.get_recently_viewed(db, session_id=session_id, limit=limit)
+    coupons = RedisService.get_recently_viewed(db, session_id=session_id, limit=limit)
+    return PrevalidatedJSONResponse([CouponPublicResponse.payload(c) for c in coupons])
 
 
 @router.get("/featured", response_model=List[CouponPublicResponse])
@@ -117,7 +178,8 @@ def get_featured_coupons(
 ):
     """Get featured coupons for homepage (fast cached response)"""
     from app.services.redis_service import RedisService
-    return RedisService.get_featured_coupons(db, limit=limit)
+    coupons = RedisService.get_featured_coupons(db, limit=limit)
+    return PrevalidatedJSONResponse([CouponPublicResponse.payload(c) for c in coupons])
 
 
 @router.get("/{coupon_id}", response_model=CouponPublicResponse)
@@ -212,10 +274,14 @@ def claim_coupon(
 @router.post("/{coupon_id}/view", status_code=status.HTTP_201_CREATED)
 def track_coupon_view(
     coupon_id: UUID,
-    session_id: Optional[str] = Query(None, description="Session ID for anonymous tracking"),
+    response: Response,
+    session_id: Optional[str] = Query(None, max_length=128, description="Session ID for anonymous tracking"),
     db: Session = Depends(get_db)
 ):
-    """Track a coupon view (public endpoint - no auth required)"""
+    """
+    Track a coupon view (public endpoint - no auth required).
+    Remembers session_id in an httpOnly cookie; login merges only that session's recently viewed list.
+    """
     from app.services.coupon_view_service import CouponViewService
     from app.services.coupon_service import CouponService
     from app.services.redis_service import RedisService
@@ -233,9 +299,12 @@ def track_coupon_view(
     
     # Feed Redis trending + recently viewed
     coupon_id_str = str(coupon_id)
-    RedisService.record_trending_view(coupon_id_str)
+    RedisService.record_view(coupon_id_str, session_id)
     if session_id:
-        RedisService.record_recently_viewed(session_id, coupon_id_str)
+        response.set_cookie(
+            RedisService.ANON_SESSION_COOKIE, session_id,
+            max_age=RedisService.RECENTLY_VIEWED_TTL, httponly=True, samesite="lax",
+        )
     
     return {"message": "View tracked", "coupon_id": coupon_id_str}
 
@@ -4,11 +4,18 @@ from typing import List, Optional
 from uuid import UUID
 
 from app.database import get_db
-from app.schemas.package import PackageCreate, PackageUpdate, PackageResponse, PackageListResponse
+from app.schemas.package import (
+    PackageCreate, PackageUpdate, PackageResponse, PackageListResponse, PackageBatchResponse,
+)
 from app.schemas.coupon import CouponPublicResponse
+from app.schemas.facet import FacetCounts
 from app.services.package_service import PackageService
+from app.services.facet_service import FacetService
 from app.utils.security import get_current_user, get_current_user_optional
 from app.models.user import User
+from app.utils.pagination import InvalidCursor
+from app.utils.batch import TooManyIds, parse_ids
+from app.utils.serialization import PrevalidatedJSONResponse
 
 router = APIRouter()
 
@@ -59,8 +66,8 @@ def create_package(
         db.refresh(existing)
         
         # Invalidate cache
-        from app.cache import invalidate_cache
-        invalidate_cache("packages:*")
+        from app.cache import invalidate_namespace, NS_PACKAGES
+        invalidate_namespace(NS_PACKAGES)
         
         return existing
 
@@ -78,15 +85,58 @@ def list_packages(
     filter: Optional[str] = Query(None, description="Sort filter: highest_saving, newest, avg_rating, bundle_sold"),
     brands: Optional[List[str]] = Query(None, description="Filter by a list of brand names"),
     country: Optional[str] = Query(None, description="Filter by country (e.g. UAE, KSA)"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header (replaces skip)"),
     db: Session = Depends(get_db),
 ):
-    return PackageService.get_all(
-        db, skip=skip, limit=limit,
-        category_id=category_id, is_active=is_active, is_featured=is_featured,
-        filter_by=filter, country=country, brands=brands,
+    """List packages. A full page carries X-Next-Cursor for the next one."""
+    try:
+        packages = PackageService.get_all(
+            db, skip=skip, limit=limit,
+            category_id=category_id, is_active=is_active, is_featured=is_featured,
+            filter_by=filter, country=country, brands=brands, cursor=cursor,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    following = PackageService.list_cursor(packages, limit, filter)
+    return PrevalidatedJSONResponse(
+        [PackageListResponse.payload(pkg) for pkg in packages],
+        headers={"X-Next-Cursor": following} if following else None,
     )
 
 
+@router.get("/facets", response_model=FacetCounts)
+def get_package_facets(
+    category_id: Optional[UUID] = Query(None, description="Filter by category ID"),
+    is_active: Optional[bool] = Query(True, description="Filter by active status (defaults to True)"),
+    is_featured: Optional[bool] = Query(None, description="Filter by featured status"),
+    brands: Optional[List[str]] = Query(None, description="Filter by a list of brand names"),
+    country: Optional[str] = Query(None, description="Filter by country (e.g. UAE, KSA)"),
+    db: Session = Depends(get_db),
+):
+    """Counts per category, brand, country, discount bucket and currency for the listing's filters."""
+    return FacetService.package_facets(
+        db, category_id=category_id, is_active=is_active, is_featured=is_featured,
+        country=country, brands=brands,
+    )
+
+
+@router.get("/batch", response_model=PackageBatchResponse)
+def get_packages_batch(
+    ids: List[str] = Query(..., description="Comma-separated package IDs (at most 100)"),
+    db: Session = Depends(get_db),
+):
+    """Get many packages by ID in one call, in request order."""
+    try:
+        package_ids, malformed = parse_ids(ids)
+    except TooManyIds as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    found = PackageService.get_by_ids(db, package_ids)
+    return {
+        "items": [found[pid] for pid in package_ids if pid in found],
+        "missing": [str(pid) for pid in package_ids if pid not in found] + malformed,
+    }
+
+
 @router.get("/{package_id}", response_model=PackageResponse)
 def get_package(package_id: UUID, db: Session = Depends(get_db)):
     pkg = PackageService.get_by_id(db, package_id)
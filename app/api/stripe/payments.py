@@ -59,15 +59,12 @@ async def initialize_payment(
             # if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="Not authorized to pay for this order")
              
-        # Convert float total_amount to integer cents using Decimal for precision
-        from decimal import Decimal, ROUND_HALF_UP
         from app.services.coupon_service import CouponService
+        from app.services.cart_service import CartService
         
         # Use currency provided by frontend (the currency the user is viewing in)
         currency = request.currency.upper()
         
-        final_amount_cents = 0
-        
         # We need to fetch order items with coupon details
         if not order.items:
              # Reload with items if missing
@@ -80,44 +77,18 @@ async def initialize_payment(
                  joinedload(Order.items).joinedload(OrderItem.package).joinedload(Package.coupon_associations)
              ).filter(Order.id == request.order_id).first()
 
-        for item in order.items:
+        items = [item for item in order.items if item.coupon or item.package]
+        for item in items:
             coupon = item.coupon
-            package = item.package
-            
-            if not coupon and not package:
-                continue
-
-            item_price = Decimal(0)
-
             if coupon:
-                # 1. Pre-check Validity (Stock & Expiry)
+                # Pre-check Validity (Expiry & Usage)
                 is_valid, reason = CouponService.is_valid(coupon)
                 if not is_valid:
                      raise HTTPException(status_code=400, detail=f"Coupon '{coupon.code}' is not available: {reason}")
-                
-                if coupon.stock is not None and coupon.stock < item.quantity:
-                     raise HTTPException(status_code=400, detail=f"Coupon '{coupon.code}' is out of stock (Requested: {item.quantity}, Available: {coupon.stock})")
-
-                # 2. Get price for this currency (Using Decimal)
-                item_price = Decimal(str(CouponService.get_price(coupon, currency)))
-            
-            elif package:
-                # Package pricing: sum up all base prices of coupons inside the package for the given Currency
-                base_sum = Decimal(0)
-                for assoc in package.coupon_associations:
-                    c = assoc.coupon
-                    if not c: continue
-                    
-                    base_sum += Decimal(str(CouponService.get_price(c, currency)))
-                
-                # Apply package discount
-                discount = Decimal(str(package.discount or 0.0))
-                multiplier = Decimal(1) - (discount / Decimal(100))
-                item_price = base_sum * multiplier
 
-            # Add to total: price * quantity * 100 (to cents)
-            item_total_cents = (item_price * Decimal(100)).quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-            final_amount_cents += int(item_total_cents) * int(item.quantity)
+        # Price every coupon (package members included) for this currency in one
+        # coupon_prices lookup; package discounts apply per unit, rounded to a cent
+        final_amount_cents = CartService.total_cents(db, items, currency)
             
         real_amount_cents = final_amount_cents
 
@@ -130,13 +101,32 @@ async def initialize_payment(
              else:
                   raise HTTPException(status_code=400, detail="Order amount too small for payment processing (min $0.50)")
         
+        # Hold the stock until the payment settles (committed by the webhook,
+        # released on failure, cancellation or expiry). Without Redis, fall
+        # back to checking the coupons' stock column.
+        from app.services.stock_service import StockService
+        reservation = StockService.reserve(db, order.id, StockService.order_quantities(items))
+        if reservation is None:
+            for item in items:
+                coupon = item.coupon
+                if coupon and coupon.stock is not None and coupon.stock < item.quantity:
+                     raise HTTPException(status_code=400, detail=f"Coupon '{coupon.code}' is out of stock (Requested: {int(item.quantity)}, Available: {coupon.stock})")
+        elif not reservation.reserved:
+            short = CouponService.get_by_id(db, UUID(reservation.coupon_id))
+            code = short.code if short else reservation.coupon_id
+            raise HTTPException(status_code=400, detail=f"Coupon '{code}' is out of stock (Requested: {reservation.requested}, Available: {reservation.available})")
+        
         # Create PaymentIntent
-        payment = payment_service.create_payment_intent(
-            order_id=request.order_id,
-            amount=real_amount_cents,
-            currency=currency,
-            metadata=request.metadata,
-        )
+        try:
+            payment = payment_service.create_payment_intent(
+                order_id=request.order_id,
+                amount=real_amount_cents,
+                currency=currency,
+                metadata=request.metadata,
+            )
+        except Exception:
+            StockService.release(order.id)
+            raise
         
         # Generate short-lived token
         token = token_service.generate_payment_token(
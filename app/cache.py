@@ -1,59 +1,575 @@
 """
 Redis caching layer for high-load performance optimization.
 Provides caching for frequently accessed data like coupon listings.
+
+Reads go through two tiers: a small in-process LRU per worker (L1) in front of
+Redis (L2). Every invalidation is broadcast on a Redis pub/sub channel so all
+workers drop their L1 copies; L1 is only consulted while this worker is
+subscribed, so a lost subscription can never serve stale data.
+
+A circuit breaker guards the connection: after repeated connection errors
+(or a failed connect) Redis is skipped entirely and every helper returns its
+"no cache" result immediately, with reconnects probed on an exponential backoff.
 """
 import os
 import json
-from typing import Optional, Any
+import math
+import zlib
+import time
+import uuid
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional, Any, Dict, Iterable, List
 from functools import wraps
 import logging
 
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is in requirements.txt
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.25))  # per-command budget
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", 5))
+REDIS_BREAKER_WINDOW = 10.0        # failures further apart than this don't accumulate
+REDIS_BACKOFF_BASE = 1.0
+REDIS_BACKOFF_MAX = 60.0
+
+
+class CircuitBreaker:
+    """
+    Tracks Redis health so an outage costs one timeout, not one per request.
+
+    closed    -> Redis is used normally; repeated outage errors trip it open.
+    open      -> Redis is skipped entirely until the backoff elapses.
+    half_open -> a single caller probes Redis; success closes the breaker,
+                 failure re-opens it with a doubled backoff.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, window: float, base_backoff: float, max_backoff: float):
+        self.threshold = threshold
+        self.window = window
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.backoff = self.base_backoff
+        self.retry_at = 0.0
+        self.last_failure_at = 0.0
+        self.last_error = None
+
+    def allow(self) -> bool:
+        """True if Redis may be used. Moves open -> half_open for exactly one caller."""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() >= self.retry_at:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.backoff = self.base_backoff
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self.last_error = str(error)
+            if now - self.last_failure_at > self.window:
+                self.failures = 0
+            self.last_failure_at = now
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                self._trip(now)
+
+    def trip(self, error: Exception) -> None:
+        """Open immediately (connect or probe failure)."""
+        with self._lock:
+            self.last_error = str(error)
+            self._trip(time.monotonic())
+
+    def _trip(self, now: float) -> None:
+        if self.state == self.OPEN:
+            return
+        if self.state == self.HALF_OPEN:
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+        self.state = self.OPEN
+        self.trips += 1
+        self.failures = 0
+        self.retry_at = now + self.backoff
+        logger.warning(f"Redis circuit open; retrying in {self.backoff:.0f}s ({self.last_error})")
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "backoff_seconds": self.backoff,
+            "retry_in_seconds": max(0.0, round(self.retry_at - time.monotonic(), 1)) if self.state == self.OPEN else 0.0,
+            "last_error": self.last_error,
+        }
+
+
+_breaker = CircuitBreaker(REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_WINDOW, REDIS_BACKOFF_BASE, REDIS_BACKOFF_MAX)
+
 # Redis connection pool (lazy initialization)
 _redis_pool = None
 _redis_client = None
 
-def get_redis_client():
-    """Get or create Redis client with connection pooling."""
+
+def _connect():
+    """Build the pool and ping once. Raises on failure."""
     global _redis_client, _redis_pool
-    if _redis_client is None:
+    import redis
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Create connection pool for better performance. Timeouts are short on
+    # purpose: a slow Redis should degrade to "no cache", not stall requests.
+    pool = redis.ConnectionPool.from_url(
+        redis_url,
+        max_connections=50,
+        decode_responses=False,  # values are binary (see the codec section); helpers decode text
+        socket_keepalive=True,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        retry_on_timeout=False
+    )
+    client = redis.Redis(connection_pool=pool)
+    client.ping()
+    _redis_pool, _redis_client = pool, client
+    logger.info("Redis connected successfully with connection pooling (max_connections=50)")
+    _start_invalidation_listener()
+
+
+def get_redis_client():
+    """
+    Get or create Redis client with connection pooling.
+
+    Returns None while the circuit breaker is open, so every cache helper
+    falls through immediately instead of waiting on a dead server.
+    """
+    if not _breaker.allow():
+        return None
+    if _breaker.state == CircuitBreaker.HALF_OPEN:
+        try:
+            if _redis_client is None:
+                _connect()
+            else:
+                _redis_client.ping()
+            _breaker.record_success()
+            logger.info("Redis circuit closed")
+        except Exception as e:
+            _breaker.trip(e)
+            return None
+    elif _redis_client is None:
         try:
-            import redis
-            redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-            
-            # Create connection pool for better performance
-            _redis_pool = redis.ConnectionPool.from_url(
-                redis_url,
-                max_connections=50,
-                decode_responses=True,
-                socket_keepalive=True,
-                socket_connect_timeout=5,
-                retry_on_timeout=True
-            )
-            _redis_client = redis.Redis(connection_pool=_redis_pool)
-            
-            # Test connection
-            _redis_client.ping()
-            logger.info("Redis connected successfully with connection pooling (max_connections=50)")
+            _connect()
         except Exception as e:
             logger.warning(f"Redis connection failed: {e}. Caching disabled.")
-            _redis_client = None
-            _redis_pool = None
+            _breaker.trip(e)
+            return None
     return _redis_client
 
 
+def _record_redis_error(e: Exception) -> None:
+    """Count connection-level errors towards tripping the breaker."""
+    try:
+        from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+    except ImportError:
+        return
+    if isinstance(e, (RedisConnectionError, RedisTimeoutError, OSError)):
+        _breaker.record_failure(e)
+
+
+def redis_status() -> dict:
+    """Circuit breaker state for health checks."""
+    return _breaker.snapshot()
+
+
+# ============== In-process (L1) tier ==============
+
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 2048))
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", 30))  # upper bound on L1 staleness if a message is lost
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class LocalCache:
+    """
+    Size- and TTL-bounded LRU kept in each worker process.
+    Cached values are shared between callers, so treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple:
+        """Return (hit, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        if ttl is not None and ttl <= 0:
+            self.discard(key)
+            return
+        ttl = min(ttl, self.ttl) if ttl is not None else self.ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CacheStats:
+    """Per-worker hit counters for each tier, grouped by key family ("coupons", "packages", ...)."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, outcome: str) -> None:
+        family = key.split(":", 1)[0]
+        with self._lock:
+            counts = self._counts.setdefault(family, {"local_hits": 0, "redis_hits": 0, "misses": 0})
+            counts[outcome] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for family, counts in self._counts.items():
+                total = sum(counts.values())
+                result[family] = {
+                    **counts,
+                    "local_hit_ratio": round(counts["local_hits"] / total, 4) if total else 0.0,
+                    "redis_hit_ratio": round(counts["redis_hits"] / total, 4) if total else 0.0,
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+_local_cache = LocalCache(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_TTL)
+_cache_stats = CacheStats()
+_local_tier_ready = False   # True only while subscribed to INVALIDATION_CHANNEL
+_invalidation_seq = 0       # Bumped on every invalidation; guards in-flight L1 fills
+_subscription_epoch = 0     # Bumped on every (re)subscribe: messages may have been missed before it
+_listener_thread = None
+_channel_handlers = {}      # Extra pub/sub channels -> handler(payload), see subscribe_channel()
+
+
+def _local_tier_active() -> bool:
+    # While the breaker is open our own writes can't be broadcast (or even
+    # dropped locally), so L1 must not be trusted.
+    return _local_tier_ready and _breaker.state == CircuitBreaker.CLOSED
+
+
+def local_tier_epoch() -> Optional[int]:
+    """
+    Current subscription epoch while this worker receives broadcasts, else
+    None. Per-worker state kept fresh by broadcasts (L1, the catalog index)
+    must be rebuilt whenever the epoch changes.
+    """
+    return _subscription_epoch if _local_tier_active() else None
+
+
+def subscribe_channel(channel: str, handler) -> None:
+    """
+    Have the listener thread call handler(payload) for messages on channel.
+    Register at import time: channels are subscribed when the listener
+    (re)connects.
+    """
+    _channel_handlers[channel] = handler
+
+
+def publish(channel: str, payload: str) -> bool:
+    """Broadcast payload to every worker subscribed to channel."""
+    client = get_redis_client()
+    if client is None:
+        return False
+    try:
+        client.publish(channel, payload)
+        return True
+    except Exception as e:
+        logger.warning(f"Cache publish error: {e}")
+        _record_redis_error(e)
+        return False
+
+
+def _drop_local(keys) -> None:
+    global _invalidation_seq
+    _invalidation_seq += 1
+    _local_cache.discard(*keys)
+
+
+def _fill_local(key: str, value: Any, seq: int) -> None:
+    """
+    Store a value fetched from Redis unless an invalidation raced with the
+    fetch. get_or_compute() entries are kept no longer than their own expiry,
+    so L1 never serves an entry Redis readers would already recompute.
+    """
+    if _local_tier_active() and seq == _invalidation_seq:
+        ttl = value["_x"] - time.time() if isinstance(value, dict) and "_x" in value else None
+        _local_cache.set(key, value, ttl)
+
+
+def _publish_invalidation(client, keys) -> None:
+    """Drop keys from this worker's L1 and tell every other worker to do the same."""
+    keys = list(keys)
+    if not keys:
+        return
+    _drop_local(keys)
+    client.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+
+
+def _apply_invalidation_message(payload: str) -> None:
+    try:
+        _drop_local(json.loads(payload))
+    except (TypeError, ValueError):
+        # Unknown payload: be safe and drop everything
+        _drop_local([])
+        _local_cache.clear()
+
+
+def _dispatch_message(message: dict) -> None:
+    channel = message.get("channel")
+    if isinstance(channel, bytes):
+        channel = channel.decode("utf-8")
+    if channel == INVALIDATION_CHANNEL:
+        _apply_invalidation_message(message["data"])
+        return
+    handler = _channel_handlers.get(channel)
+    if handler is not None:
+        try:
+            handler(message["data"])
+        except Exception as e:
+            logger.warning(f"Handler for channel {channel} failed: {e}")
+
+
+def _listen_for_invalidations() -> None:
+    """Background thread: keep this worker subscribed to the invalidation (and registered) channels."""
+    global _local_tier_ready, _subscription_epoch
+    backoff = 1
+    while True:
+        client = _redis_client
+        pubsub = None
+        if client is not None and _breaker.state == CircuitBreaker.CLOSED:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL, *_channel_handlers)
+                _local_cache.clear()
+                _subscription_epoch += 1
+                _local_tier_ready = True
+                backoff = 1
+                # Poll rather than block so we notice the breaker opening
+                while _breaker.state == CircuitBreaker.CLOSED:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        _dispatch_message(message)
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}. Local cache tier disabled.")
+            finally:
+                _local_tier_ready = False
+                _local_cache.clear()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 30)
+
+
+def _start_invalidation_listener() -> None:
+    global _listener_thread
+    if LOCAL_CACHE_MAX_ENTRIES <= 0:
+        return
+    if _listener_thread is not None and _listener_thread.is_alive():
+        return
+    _listener_thread = threading.Thread(
+        target=_listen_for_invalidations, name="cache-invalidation-listener", daemon=True
+    )
+    _listener_thread.start()
+
+
+def cache_stats() -> dict:
+    """Hit counters and ratios per tier for this worker."""
+    return {
+        "local_tier": "active" if _local_tier_active() else "disabled",
+        "local_entries": len(_local_cache),
+        "families": _cache_stats.snapshot(),
+    }
+
+
+# ============== Serialization codec ==============
+#
+# Stored values are one header byte followed by the payload. The high nibble
+# names the codec, bit 0 marks zlib compression. Anything without a known
+# header is a legacy plain-JSON entry written before the codec existed.
+
+CACHE_CODEC = os.getenv("CACHE_CODEC", "msgpack" if msgpack is not None else "json")
+CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", 4096))  # bytes; 0 disables
+CACHE_COMPRESS_LEVEL = 1   # cheap CPU, most of the win on repetitive JSON-like payloads
+
+_FLAG_COMPRESSED = 0x01
+
+# msgpack extension type codes
+_EXT_UUID = 1
+_EXT_DATETIME = 2
+_EXT_DATE = 3
+_EXT_DECIMAL = 4
+
+
+class JsonCodec:
+    """Text JSON. Lossy: UUID, datetime and Decimal come back as strings."""
+
+    codec_id = 0x10
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=str).encode("utf-8")
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """Binary msgpack; UUID, datetime, date and Decimal round-trip as themselves."""
+
+    codec_id = 0x20
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        if isinstance(obj, uuid.UUID):
+            return msgpack.ExtType(_EXT_UUID, obj.bytes)
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode("ascii"))
+        if isinstance(obj, date):
+            return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode("ascii"))
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(_EXT_DECIMAL, str(obj).encode("ascii"))
+        return str(obj)  # same fallback as the JSON codec
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == _EXT_UUID:
+            return uuid.UUID(bytes=data)
+        if code == _EXT_DATETIME:
+            return datetime.fromisoformat(data.decode("ascii"))
+        if code == _EXT_DATE:
+            return date.fromisoformat(data.decode("ascii"))
+        if code == _EXT_DECIMAL:
+            return Decimal(data.decode("ascii"))
+        return msgpack.ExtType(code, data)
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return msgpack.packb(value, default=MsgpackCodec._default, use_bin_type=True)
+
+    @staticmethod
+    def loads(data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=MsgpackCodec._ext_hook, raw=False, strict_map_key=False)
+
+
+CODECS = {"json": JsonCodec, "msgpack": MsgpackCodec}
+_CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+def encode_value(value: Any, codec: Optional[str] = None) -> bytes:
+    """Serialize a value for Redis with the configured codec, compressing large payloads."""
+    impl = CODECS[codec or CACHE_CODEC]
+    payload = impl.dumps(value)
+    header = impl.codec_id
+    if CACHE_COMPRESS_THRESHOLD and len(payload) > CACHE_COMPRESS_THRESHOLD:
+        payload = zlib.compress(payload, CACHE_COMPRESS_LEVEL)
+        header |= _FLAG_COMPRESSED
+    return bytes((header,)) + payload
+
+
+def decode_value(data: bytes) -> Any:
+    """Inverse of encode_value(); also reads legacy plain-JSON entries."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    impl = _CODECS_BY_ID.get(data[0] & ~_FLAG_COMPRESSED) if data else None
+    if impl is None:
+        return json.loads(data)
+    payload = data[1:]
+    if data[0] & _FLAG_COMPRESSED:
+        payload = zlib.decompress(payload)
+    return impl.loads(payload)
+
+
+def _text(value) -> Optional[str]:
+    """Decode a bytes reply from the binary-safe client."""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
 def get_cache(key: str) -> Optional[Any]:
-    """Get a value from cache."""
+    """Get a value from cache (in-process tier first, then Redis)."""
+    if _local_tier_active():
+        hit, value = _local_cache.get(key)
+        if hit:
+            _cache_stats.record(key, "local_hits")
+            return value
     client = get_redis_client()
     if client is None:
         return None
+    seq = _invalidation_seq
     try:
         value = client.get(key)
         if value:
-            return json.loads(value)
+            decoded = decode_value(value)
+            _cache_stats.record(key, "redis_hits")
+            _fill_local(key, decoded, seq)
+            return decoded
     except Exception as e:
         logger.warning(f"Cache get error: {e}")
+        _record_redis_error(e)
+    _cache_stats.record(key, "misses")
     return None
 
 
@@ -63,24 +579,145 @@ def set_cache(key: str, value: Any, ttl: int = 300) -> bool:
     if client is None:
         return False
     try:
-        client.setex(key, ttl, json.dumps(value, default=str))
+        client.setex(key, ttl, encode_value(value))
         return True
     except Exception as e:
         logger.warning(f"Cache set error: {e}")
+        _record_redis_error(e)
         return False
 
 
+def get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Get several keys at once: L1 first, then a single MGET for the rest.
+    Returns only the hits, keyed by cache key.
+    """
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    missing = keys
+    if _local_tier_active():
+        missing = []
+        for key in keys:
+            hit, value = _local_cache.get(key)
+            if hit:
+                _cache_stats.record(key, "local_hits")
+                found[key] = value
+            else:
+                missing.append(key)
+    if not missing:
+        return found
+    client = get_redis_client()
+    if client is None:
+        return found
+    seq = _invalidation_seq
+    try:
+        values = client.mget(missing)
+    except Exception as e:
+        logger.warning(f"Cache mget error: {e}")
+        _record_redis_error(e)
+        return found
+    for key, raw in zip(missing, values):
+        if not raw:
+            _cache_stats.record(key, "misses")
+            continue
+        try:
+            value = decode_value(raw)
+        except Exception as e:
+            logger.warning(f"Cache decode error for {key}: {e}")
+            continue
+        _cache_stats.record(key, "redis_hits")
+        _fill_local(key, value, seq)
+        found[key] = value
+    return found
+
+
+def set_many(mapping: Dict[str, Any], ttl: int = 300) -> bool:
+    """Set several keys with the same TTL in one pipelined round trip."""
+    if not mapping:
+        return True
+    client = get_redis_client()
+    if client is None:
+        return False
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.setex(key, ttl, encode_value(value))
+        pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Cache set_many error: {e}")
+        _record_redis_error(e)
+        return False
+
+
+@contextmanager
+def redis_pipeline(transaction: bool = False):
+    """
+    Queue Redis commands and send them in one round trip when the block exits.
+
+    Yields None when Redis is unavailable, so callers check before queueing.
+    The redis_* helpers below accept pipe= to queue onto it instead of running
+    immediately. Nothing is sent if the block raises.
+    """
+    client = get_redis_client()
+    if client is None:
+        yield None
+        return
+    pipe = client.pipeline(transaction=transaction)
+    yield pipe
+    try:
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Redis pipeline error: {e}")
+        _record_redis_error(e)
+
+
+def delete_cache(*keys: str) -> int:
+    """Delete exact cache keys (no pattern matching)."""
+    if not keys:
+        return 0
+    client = get_redis_client()
+    if client is None:
+        return 0
+    try:
+        deleted = client.delete(*keys)
+        _publish_invalidation(client, keys)
+        return deleted
+    except Exception as e:
+        logger.warning(f"Cache delete error: {e}")
+        _record_redis_error(e)
+    return 0
+
+
 def invalidate_cache(pattern: str) -> int:
-    """Invalidate cache keys matching a pattern."""
+    """
+    Invalidate cache keys matching a glob pattern.
+
+    Prefer invalidate_namespace() for key families and delete_cache() for
+    exact keys. This walks the keyspace incrementally with SCAN so it never
+    blocks Redis the way KEYS did, but it is still O(keyspace).
+    """
+    if not any(ch in pattern for ch in "*?["):
+        return delete_cache(pattern)
     client = get_redis_client()
     if client is None:
         return 0
     try:
-        keys = client.keys(pattern)
-        if keys:
-            return client.delete(*keys)
+        deleted = 0
+        batch = []
+        for key in client.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted += client.delete(*batch)
+                _publish_invalidation(client, batch)
+                batch = []
+        if batch:
+            deleted += client.delete(*batch)
+            _publish_invalidation(client, batch)
+        return deleted
     except Exception as e:
         logger.warning(f"Cache invalidation error: {e}")
+        _record_redis_error(e)
     return 0
 
 
@@ -89,27 +726,314 @@ def cache_key(*args) -> str:
     return ":".join(str(arg) for arg in args)
 
 
+# ============== Namespaced (generation-versioned) keys ==============
+#
+# Keys built with ns_cache_key() embed the current generation of their
+# namespace, e.g. "packages:g12:list:...". Invalidating a namespace is a single
+# INCR of its generation counter: every key built against the old generation
+# becomes unreachable at once and simply ages out through its own TTL.
+# Shared generation counters carry no TTL so volatile-* eviction policies leave
+# them alone. Per-user counters (cart:{id}, user:{id}) would otherwise leave one
+# permanent key per user, so each INCR refreshes a NS_USER_GENERATION_TTL
+# expiry. That outlives every entry built against the counter, so when an idle
+# user's counter expires and restarts at 0 no old entry can be read again.
+
+NS_GENERATION_PREFIX = "ns:gen"
+
+# Shared namespaces (per-user namespaces are built with the helpers below)
+NS_COUPONS_LIST = "coupons:list"
+NS_PACKAGES = "packages"
+NS_CATEGORIES = "categories"
+NS_REGIONS = "regions"
+NS_COUNTRIES = "countries"
+NS_ANALYTICS = "analytics"
+
+
+# Per-user namespace prefixes, whose generation counters expire
+USER_NAMESPACE_PREFIXES = ("cart:", "user:")
+
+
+def cart_namespace(user_id) -> str:
+    """Namespace holding all cached data for one user's cart."""
+    return cache_key("cart", user_id)
+
+
+def user_namespace(user_id) -> str:
+    """Namespace holding per-user cached data (wallet, orders)."""
+    return cache_key("user", user_id)
+
+
+def _generation_key(namespace: str) -> str:
+    return cache_key(NS_GENERATION_PREFIX, namespace)
+
+
+def _generation_ttl(namespace: str) -> Optional[int]:
+    """Expiry of a namespace's generation counter (None for shared namespaces)."""
+    return NS_USER_GENERATION_TTL if namespace.startswith(USER_NAMESPACE_PREFIXES) else None
+
+
+def get_namespace_generation(namespace: str) -> int:
+    """Current generation of a namespace (0 if never invalidated)."""
+    gen_key = _generation_key(namespace)
+    if _local_tier_active():
+        hit, generation = _local_cache.get(gen_key)
+        if hit:
+            _cache_stats.record(gen_key, "local_hits")
+            return generation
+    client = get_redis_client()
+    if client is None:
+        return 0
+    seq = _invalidation_seq
+    try:
+        value = client.get(gen_key)
+        generation = int(value) if value else 0
+        _cache_stats.record(gen_key, "redis_hits")
+        _fill_local(gen_key, generation, seq)
+        return generation
+    except Exception as e:
+        logger.warning(f"Cache generation get error: {e}")
+        _record_redis_error(e)
+        return 0
+
+
+def ns_cache_key(namespace: str, *args) -> str:
+    """Build a cache key scoped to the current generation of a namespace."""
+    return cache_key(namespace, f"g{get_namespace_generation(namespace)}", *args)
+
+
+def invalidate_namespace(*namespaces: str) -> bool:
+    """Invalidate every key of the given namespaces (one pipelined round trip of INCRs)."""
+    client = get_redis_client()
+    if client is None:
+        return False
+    gen_keys = [_generation_key(namespace) for namespace in namespaces]
+    try:
+        pipe = client.pipeline(transaction=False)
+        for namespace, gen_key in zip(namespaces, gen_keys):
+            pipe.incr(gen_key)
+            ttl = _generation_ttl(namespace)
+            if ttl:
+                pipe.expire(gen_key, ttl)
+        pipe.execute()
+        _publish_invalidation(client, gen_keys)
+        return True
+    except Exception as e:
+        logger.warning(f"Cache namespace invalidation error: {e}")
+        _record_redis_error(e)
+        return False
+
+
 # Cache TTL constants (in seconds)
 CACHE_TTL_SHORT = 60       # 1 minute
 CACHE_TTL_MEDIUM = 300     # 5 minutes
 CACHE_TTL_LONG = 3600      # 1 hour
 CACHE_TTL_DAY = 86400      # 24 hours
 
+# Longer than any entry cached under a per-user namespace
+NS_USER_GENERATION_TTL = CACHE_TTL_DAY
+
+
+# ============== Stampede-protected loads ==============
+#
+# get_or_compute() wraps the usual get -> compute -> set sequence with two
+# protections against many workers recomputing the same hot key at once:
+#   1. Single flight: on a miss only the worker holding a short Redis lock runs
+#      the loader; the others wait (bounded) for the winner's result.
+#   2. XFetch probabilistic early refresh: each read recomputes early with a
+#      probability that rises as expiry approaches, scaled by how long the
+#      loader took last time, so hot keys are refreshed before they expire.
+#   3. Stale-while-revalidate (opt-in via stale_ttl): entries outlive their TTL
+#      in Redis by stale_ttl seconds. A read in that window returns the stale
+#      value at once and refreshes it on a background thread, so TTL rollover
+#      never puts a query on the request path. Namespace invalidation changes
+#      the key itself, so stale values are never served across a write.
+
+LOCK_PREFIX = "lock"
+LOCK_TTL_MS = 10000          # Loader lock lifetime (safety net if a worker dies mid-compute)
+LOCK_WAIT_SECONDS = 2.0      # How long losers wait for the winner before computing themselves
+LOCK_POLL_SECONDS = 0.05
+XFETCH_BETA = 1.0            # >1 refreshes earlier, <1 later
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 60))  # SWR grace period for catalog reads
+CACHE_REFRESH_WORKERS = 4    # Background refresh threads per worker process
+
+# Compare-and-delete so a worker never releases a lock it no longer owns
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _should_refresh_early(entry: dict, beta: float) -> bool:
+    """XFetch: recompute when now - delta * beta * ln(rand) >= expiry."""
+    delta = entry.get("_d") or 0.0
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= entry["_x"]
+
+
+_refresh_executor = ThreadPoolExecutor(max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+
+def _compute_and_store(key: str, ttl: int, loader, stale_ttl: int = 0) -> Any:
+    seq = _invalidation_seq
+    started = time.time()
+    value = loader()
+    if value is not None:
+        elapsed = time.time() - started
+        entry = {"_v": value, "_d": elapsed, "_x": time.time() + ttl}
+        set_cache(key, entry, ttl + stale_ttl)
+        # Replace this worker's old copy so the next read doesn't see the expired entry
+        _local_cache.discard(key)
+        _fill_local(key, entry, seq)
+    return value
+
+
+def _acquire_lock(client, lock_key: str) -> Optional[str]:
+    """Take the loader lock for a key. Returns the owner token, or None if held elsewhere."""
+    token = uuid.uuid4().hex
+    try:
+        if client.set(lock_key, token, nx=True, px=LOCK_TTL_MS):
+            return token
+    except Exception as e:
+        logger.warning(f"Cache lock error: {e}")
+        _record_redis_error(e)
+    return None
+
+
+def _release_lock(client, lock_key: str, token: str) -> None:
+    try:
+        client.register_script(RELEASE_LOCK_SCRIPT)(keys=[lock_key], args=[token])
+    except Exception as e:
+        logger.warning(f"Cache lock release error: {e}")
+        _record_redis_error(e)
+
+
+def _refresh_in_background(client, key: str, ttl: int, stale_ttl: int, loader) -> None:
+    """Recompute a stale entry off the request path, unless another worker already is."""
+    lock_key = cache_key(LOCK_PREFIX, key)
+    token = _acquire_lock(client, lock_key)
+    if token is None:
+        return
+
+    def refresh():
+        try:
+            _compute_and_store(key, ttl, loader, stale_ttl)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {e}")
+        finally:
+            _release_lock(client, lock_key, token)
+
+    try:
+        _refresh_executor.submit(refresh)
+    except RuntimeError:  # executor shut down (interpreter exit)
+        _release_lock(client, lock_key, token)
+
+
+def get_or_compute(
+    key: str, ttl: int, loader, beta: float = XFETCH_BETA,
+    stale_ttl: int = 0, refresh_loader=None,
+) -> Any:
+    """
+    Return the cached value for key, or run loader() and cache its result.
+
+    Only one worker runs the loader for a given key at a time (cross-worker
+    lock with bounded wait), and hot keys are refreshed probabilistically
+    before they expire. A loader result of None is returned but not cached.
+    Without Redis the loader simply runs every time.
+
+    With stale_ttl > 0, an entry up to stale_ttl seconds past its TTL is
+    returned as-is while refresh_loader (default: loader) recomputes it on a
+    background thread. refresh_loader outlives the request, so it must not
+    use request-scoped state such as the request's DB session.
+    """
+    entry = get_cache(key)
+    fresh = isinstance(entry, dict) and "_x" in entry
+    if fresh and stale_ttl and time.time() >= entry["_x"]:
+        client = get_redis_client()
+        if client is not None:
+            _refresh_in_background(client, key, ttl, stale_ttl, refresh_loader or loader)
+        return entry["_v"]
+    if fresh and not _should_refresh_early(entry, beta):
+        return entry["_v"]
+
+    client = get_redis_client()
+    if client is None:
+        return loader()
+
+    lock_key = cache_key(LOCK_PREFIX, key)
+    token = _acquire_lock(client, lock_key)
+    if token is not None:
+        try:
+            return _compute_and_store(key, ttl, loader, stale_ttl)
+        finally:
+            _release_lock(client, lock_key, token)
+
+    if fresh:
+        # Another worker is already refreshing early; keep serving the current value
+        return entry["_v"]
+
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_SECONDS)
+        entry = get_cache(key)
+        if isinstance(entry, dict) and "_x" in entry:
+            return entry["_v"]
+
+    logger.warning(f"Timed out waiting for cache fill of {key}; computing locally")
+    return _compute_and_store(key, ttl, loader, stale_ttl)
+
+
+def get_or_compute_many(keys: Dict[Any, str], ttl: int, loader) -> Dict[Any, Any]:
+    """
+    Batch form of get_or_compute() for entity hydration.
+
+    keys maps ids to cache keys; loader(missing_ids) returns {id: value} for
+    the misses. Costs one MGET plus one pipelined write. There is no
+    single-flight lock here; entries are shared with get_or_compute() on the
+    same keys. Ids the loader omits (or maps to None) are absent from the result.
+    """
+    cached = get_many(keys.values())
+    found = {}
+    missing = []
+    for ident, key in keys.items():
+        entry = cached.get(key)
+        if isinstance(entry, dict) and "_x" in entry:
+            found[ident] = entry["_v"]
+        else:
+            missing.append(ident)
+    if not missing:
+        return found
+
+    started = time.time()
+    loaded = {ident: value for ident, value in loader(missing).items() if value is not None}
+    elapsed = time.time() - started
+    expires_at = time.time() + ttl
+    set_many({keys[ident]: {"_v": value, "_d": elapsed, "_x": expires_at} for ident, value in loaded.items()}, ttl)
+    found.update(loaded)
+    return found
+
 
 # ============== Redis Data Structure Helpers ==============
 
-def redis_zincrby(key: str, member: str, amount: float = 1.0, ttl: int = None) -> Optional[float]:
-    """Increment a member's score in a sorted set (for trending)."""
+def redis_zincrby(key: str, member: str, amount: float = 1.0, ttl: int = None, pipe=None) -> Optional[float]:
+    """Increment a member's score in a sorted set (for trending). One round trip."""
+    if pipe is not None:
+        pipe.zincrby(key, amount, member)
+        if ttl:
+            pipe.expire(key, ttl)
+        return None
     client = get_redis_client()
     if client is None:
         return None
     try:
-        score = client.zincrby(key, amount, member)
+        pipe = client.pipeline(transaction=False)
+        pipe.zincrby(key, amount, member)
         if ttl:
-            client.expire(key, ttl)
-        return score
+            pipe.expire(key, ttl)
+        return pipe.execute()[0]
     except Exception as e:
         logger.warning(f"Redis ZINCRBY error: {e}")
+        _record_redis_error(e)
         return None
 
 
@@ -119,41 +1043,210 @@ def redis_zrevrange(key: str, start: int = 0, stop: int = 9, withscores: bool =
     if client is None:
         return []
     try:
-        return client.zrevrange(key, start, stop, withscores=withscores)
+        members = client.zrevrange(key, start, stop, withscores=withscores)
+        if withscores:
+            return [(_text(member), score) for member, score in members]
+        return [_text(member) for member in members]
     except Exception as e:
         logger.warning(f"Redis ZREVRANGE error: {e}")
+        _record_redis_error(e)
+        return []
+
+
+def redis_zunionstore(dest: str, weights: Dict[str, float], ttl: int = None) -> int:
+    """
+    Store the weighted sum of sorted sets in dest (missing sources count as
+    empty) and return its size. dest is not created when that is 0. One round trip.
+    """
+    client = get_redis_client()
+    if client is None or not weights:
+        return 0
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.zunionstore(dest, weights, aggregate="SUM")
+        if ttl:
+            pipe.expire(dest, ttl)
+        return pipe.execute()[0]
+    except Exception as e:
+        logger.warning(f"Redis ZUNIONSTORE error: {e}")
+        _record_redis_error(e)
+        return 0
+
+
+def redis_zrangebyscore(key: str, min_score: float, max_score: float, limit: int = 100) -> list:
+    """Members scored within [min_score, max_score], lowest first, at most limit of them."""
+    client = get_redis_client()
+    if client is None:
+        return []
+    try:
+        return [_text(m) for m in client.zrangebyscore(key, min_score, max_score, start=0, num=limit)]
+    except Exception as e:
+        logger.warning(f"Redis ZRANGEBYSCORE error: {e}")
+        _record_redis_error(e)
         return []
 
 
-def redis_lpush_capped(key: str, value: str, max_length: int = 20, ttl: int = None) -> bool:
-    """Push to a list and trim to max length (for recently viewed)."""
+def redis_run_script(script: str, keys: list, args: list, default: Any = None, pipe=None) -> Any:
+    """
+    Run a Lua script (EVALSHA, loaded on first use) and return its reply, or
+    default when Redis is unavailable or the call fails. Queued on pipe if given.
+    """
+    client = get_redis_client()
+    if client is None:
+        return default
+    try:
+        return client.register_script(script)(keys=keys, args=args, client=pipe)
+    except Exception as e:
+        logger.warning(f"Redis script error: {e}")
+        _record_redis_error(e)
+        return default
+
+
+# Capped most-recently-used list: move (or add) ARGV[1] to the front, keep
+# ARGV[2] items, refresh the TTL (ARGV[3] seconds; 0 keeps it).
+MRU_PUSH_SCRIPT = """
+redis.call("lrem", KEYS[1], 0, ARGV[1])
+redis.call("lpush", KEYS[1], ARGV[1])
+redis.call("ltrim", KEYS[1], 0, tonumber(ARGV[2]) - 1)
+if tonumber(ARGV[3]) > 0 then
+    redis.call("expire", KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+# Move the items of the MRU list KEYS[2] to the front of KEYS[1] (in their
+# order, without duplicates), cap and refresh KEYS[1] as above, drop KEYS[2].
+MRU_MERGE_SCRIPT = """
+local incoming = redis.call("lrange", KEYS[2], 0, -1)
+if #incoming == 0 then
+    return 0
+end
+for i = #incoming, 1, -1 do
+    redis.call("lrem", KEYS[1], 0, incoming[i])
+    redis.call("lpush", KEYS[1], incoming[i])
+end
+redis.call("ltrim", KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if tonumber(ARGV[2]) > 0 then
+    redis.call("expire", KEYS[1], ARGV[2])
+end
+redis.call("del", KEYS[2])
+return #incoming
+"""
+
+
+def redis_lpush_capped(key: str, value: str, max_length: int = 20, ttl: int = None, pipe=None) -> bool:
+    """
+    Push to the front of a capped MRU list (for recently viewed), removing any
+    earlier occurrence. One atomic script call, queued on pipe if given.
+    """
     client = get_redis_client()
     if client is None:
         return False
     try:
-        # Remove existing occurrence to avoid duplicates
-        client.lrem(key, 0, value)
-        # Push to front
-        client.lpush(key, value)
-        # Trim to max length
-        client.ltrim(key, 0, max_length - 1)
-        if ttl:
-            client.expire(key, ttl)
+        client.register_script(MRU_PUSH_SCRIPT)(keys=[key], args=[value, max_length, ttl or 0], client=pipe)
         return True
     except Exception as e:
-        logger.warning(f"Redis LPUSH error: {e}")
+        logger.warning(f"Redis MRU push error: {e}")
+        _record_redis_error(e)
         return False
 
 
+def redis_merge_capped(dest: str, source: str, max_length: int = 20, ttl: int = None) -> int:
+    """Merge MRU list source into the front of dest and delete source. One atomic round trip."""
+    client = get_redis_client()
+    if client is None:
+        return 0
+    try:
+        return client.register_script(MRU_MERGE_SCRIPT)(keys=[dest, source], args=[max_length, ttl or 0])
+    except Exception as e:
+        logger.warning(f"Redis MRU merge error: {e}")
+        _record_redis_error(e)
+        return 0
+
+
+# HyperLogLog sketches: add ARGV[1] to every KEYS[i] and keep that sketch for
+# ARGV[i + 1] seconds (0 keeps its TTL).
+HLL_ADD_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    redis.call("pfadd", key, ARGV[1])
+    if tonumber(ARGV[i + 1]) > 0 then
+        redis.call("expire", key, ARGV[i + 1])
+    end
+end
+return 1
+"""
+
+# Estimated cardinality of the union of ARGV[1] sketches KEYS[2..] (merged
+# into KEYS[1] once, kept ARGV[2] seconds) and the remaining KEYS, which are
+# counted live.
+HLL_MERGED_COUNT_SCRIPT = """
+local merged = tonumber(ARGV[1])
+if redis.call("exists", KEYS[1]) == 0 then
+    redis.call("pfmerge", KEYS[1], unpack(KEYS, 2, merged + 1))
+    redis.call("expire", KEYS[1], ARGV[2])
+end
+return redis.call("pfcount", KEYS[1], unpack(KEYS, merged + 2))
+"""
+
+
+def redis_pfadd(member: str, ttls: Dict[str, int], pipe=None) -> bool:
+    """Add member to several HyperLogLog sketches, each with its own TTL, in one script call."""
+    if not ttls:
+        return False
+    reply = redis_run_script(HLL_ADD_SCRIPT, list(ttls), [member, *[ttl or 0 for ttl in ttls.values()]], pipe=pipe)
+    return reply is not None
+
+
+def redis_pfcount(*keys: str) -> Optional[int]:
+    """Estimated distinct members across the sketches (their union); None when Redis is unavailable."""
+    client = get_redis_client()
+    if client is None or not keys:
+        return None
+    try:
+        return client.pfcount(*keys)
+    except Exception as e:
+        logger.warning(f"Redis PFCOUNT error: {e}")
+        _record_redis_error(e)
+        return None
+
+
+def redis_pfcount_many(keys: List[str]) -> Optional[List[int]]:
+    """PFCOUNT each sketch separately, in one round trip."""
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.pfcount(key)
+        return pipe.execute()
+    except Exception as e:
+        logger.warning(f"Redis PFCOUNT error: {e}")
+        _record_redis_error(e)
+        return None
+
+
+def redis_pfcount_merged(dest: str, sources: List[str], live: List[str] = (), ttl: int = CACHE_TTL_DAY) -> Optional[int]:
+    """
+    Estimated distinct members across sources and live. sources are PFMERGEd
+    into dest on first use and dest is reused until it expires, so pass only
+    sketches that no longer change; live sketches are counted as they are.
+    """
+    if not sources:
+        return redis_pfcount(*live)
+    return redis_run_script(HLL_MERGED_COUNT_SCRIPT, [dest, *sources, *live], [len(sources), ttl])
+
+
 def redis_lrange(key: str, start: int = 0, stop: int = -1) -> list:
     """Get a range of items from a list."""
     client = get_redis_client()
     if client is None:
         return []
     try:
-        return client.lrange(key, start, stop)
+        return [_text(item) for item in client.lrange(key, start, stop)]
     except Exception as e:
         logger.warning(f"Redis LRANGE error: {e}")
+        _record_redis_error(e)
         return []
 
 
@@ -163,9 +1256,10 @@ def redis_hget(key: str, field: str) -> Optional[str]:
     if client is None:
         return None
     try:
-        return client.hget(key, field)
+        return _text(client.hget(key, field))
     except Exception as e:
         logger.warning(f"Redis HGET error: {e}")
+        _record_redis_error(e)
         return None
 
 
@@ -179,9 +1273,30 @@ def redis_hset(key: str, field: str, value: str) -> bool:
         return True
     except Exception as e:
         logger.warning(f"Redis HSET error: {e}")
+        _record_redis_error(e)
         return False
 
 
+def redis_hmget_many(fields_by_key: Dict[str, list]) -> Optional[Dict[str, list]]:
+    """
+    HMGET several hashes in one MULTI round trip, so the replies are one
+    consistent snapshot. Values decoded to text; None when Redis is unavailable.
+    """
+    client = get_redis_client()
+    if client is None:
+        return None
+    try:
+        pipe = client.pipeline(transaction=True)
+        for key, fields in fields_by_key.items():
+            pipe.hmget(key, fields)
+        replies = pipe.execute()
+        return {key: [_text(v) for v in reply] for key, reply in zip(fields_by_key, replies)}
+    except Exception as e:
+        logger.warning(f"Redis HMGET error: {e}")
+        _record_redis_error(e)
+        return None
+
+
 def redis_hincrby(key: str, field: str, amount: int = -1) -> Optional[int]:
     """Increment/decrement a hash field value (for stock tracking)."""
     client = get_redis_client()
@@ -191,4 +1306,5 @@ def redis_hincrby(key: str, field: str, amount: int = -1) -> Optional[int]:
         return client.hincrby(key, field, amount)
     except Exception as e:
         logger.warning(f"Redis HINCRBY error: {e}")
+        _record_redis_error(e)
         return None
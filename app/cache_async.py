@@ -0,0 +1,336 @@
+"""
+Async counterpart of app.cache for coroutine endpoints.
+
+Same key scheme, namespaces, TTL constants, codec and circuit breaker as the
+sync layer, backed by redis.asyncio with its own connection pool so cache calls
+never block the event loop. Entries written by either side are readable by the
+other, and every helper degrades to its "no cache" result when Redis is down.
+"""
+import os
+import asyncio
+import inspect
+import json
+import time
+import uuid
+from typing import Optional, Any, Dict, Iterable
+import logging
+
+from app import cache
+from app.cache import (  # noqa: F401 - key helpers, namespaces and TTLs re-exported for async callers
+    CircuitBreaker, cache_key, encode_value, decode_value,
+    LOCK_PREFIX, LOCK_TTL_MS, XFETCH_BETA, RELEASE_LOCK_SCRIPT,
+    NS_COUPONS_LIST, NS_PACKAGES, NS_CATEGORIES, NS_REGIONS, NS_COUNTRIES, NS_ANALYTICS,
+    cart_namespace, user_namespace,
+    CACHE_TTL_SHORT, CACHE_TTL_MEDIUM, CACHE_TTL_LONG, CACHE_TTL_DAY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Async connection pool (lazy initialization, bound to the loop that created it)
+_async_pool = None
+_async_client = None
+_client_loop = None
+
+
+async def _connect(loop) -> None:
+    global _async_pool, _async_client, _client_loop
+    import redis.asyncio as aioredis
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    pool = aioredis.ConnectionPool.from_url(
+        redis_url,
+        max_connections=50,
+        decode_responses=False,
+        socket_keepalive=True,
+        socket_connect_timeout=cache.REDIS_CONNECT_TIMEOUT,
+        socket_timeout=cache.REDIS_SOCKET_TIMEOUT,
+        retry_on_timeout=False
+    )
+    client = aioredis.Redis(connection_pool=pool)
+    await client.ping()
+    _async_pool, _async_client, _client_loop = pool, client, loop
+    logger.info("Async Redis connected successfully with connection pooling (max_connections=50)")
+
+
+async def get_async_redis_client():
+    """
+    Get or create the async Redis client.
+
+    Shares the sync layer's circuit breaker (one Redis server, one health
+    verdict): returns None while it is open.
+    """
+    global _async_client
+    breaker = cache._breaker
+    if not breaker.allow():
+        return None
+    loop = asyncio.get_running_loop()
+    if _async_client is not None and _client_loop is not loop:
+        # Pools can't be shared across event loops (e.g. between test clients)
+        _async_client = None
+    if breaker.state == CircuitBreaker.HALF_OPEN:
+        try:
+            if _async_client is None:
+                await _connect(loop)
+            else:
+                await _async_client.ping()
+            breaker.record_success()
+            logger.info("Redis circuit closed")
+        except Exception as e:
+            breaker.trip(e)
+            return None
+    elif _async_client is None:
+        try:
+            await _connect(loop)
+        except Exception as e:
+            logger.warning(f"Async Redis connection failed: {e}. Caching disabled.")
+            breaker.trip(e)
+            return None
+    return _async_client
+
+
+async def _publish_invalidation(client, keys) -> None:
+    keys = list(keys)
+    if not keys:
+        return
+    cache._drop_local(keys)
+    await client.publish(cache.INVALIDATION_CHANNEL, json.dumps(keys))
+
+
+async def get_cache(key: str) -> Optional[Any]:
+    """Get a value from cache (in-process tier first, then Redis)."""
+    if cache._local_tier_active():
+        hit, value = cache._local_cache.get(key)
+        if hit:
+            cache._cache_stats.record(key, "local_hits")
+            return value
+    client = await get_async_redis_client()
+    if client is None:
+        return None
+    seq = cache._invalidation_seq
+    try:
+        value = await client.get(key)
+        if value:
+            decoded = decode_value(value)
+            cache._cache_stats.record(key, "redis_hits")
+            cache._fill_local(key, decoded, seq)
+            return decoded
+    except Exception as e:
+        logger.warning(f"Async cache get error: {e}")
+        cache._record_redis_error(e)
+    cache._cache_stats.record(key, "misses")
+    return None
+
+
+async def set_cache(key: str, value: Any, ttl: int = 300) -> bool:
+    """Set a value in cache with TTL (default 5 minutes)."""
+    client = await get_async_redis_client()
+    if client is None:
+        return False
+    try:
+        await client.setex(key, ttl, encode_value(value))
+        return True
+    except Exception as e:
+        logger.warning(f"Async cache set error: {e}")
+        cache._record_redis_error(e)
+        return False
+
+
+async def get_many(keys: Iterable[str]) -> Dict[str, Any]:
+    """Get several keys at once (L1, then one MGET). Returns only the hits."""
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    missing = keys
+    if cache._local_tier_active():
+        missing = []
+        for key in keys:
+            hit, value = cache._local_cache.get(key)
+            if hit:
+                cache._cache_stats.record(key, "local_hits")
+                found[key] = value
+            else:
+                missing.append(key)
+    if not missing:
+        return found
+    client = await get_async_redis_client()
+    if client is None:
+        return found
+    seq = cache._invalidation_seq
+    try:
+        values = await client.mget(missing)
+    except Exception as e:
+        logger.warning(f"Async cache mget error: {e}")
+        cache._record_redis_error(e)
+        return found
+    for key, raw in zip(missing, values):
+        if not raw:
+            cache._cache_stats.record(key, "misses")
+            continue
+        try:
+            value = decode_value(raw)
+        except Exception as e:
+            logger.warning(f"Async cache decode error for {key}: {e}")
+            continue
+        cache._cache_stats.record(key, "redis_hits")
+        cache._fill_local(key, value, seq)
+        found[key] = value
+    return found
+
+
+async def set_many(mapping: Dict[str, Any], ttl: int = 300) -> bool:
+    """Set several keys with the same TTL in one pipelined round trip."""
+    if not mapping:
+        return True
+    client = await get_async_redis_client()
+    if client is None:
+        return False
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.setex(key, ttl, encode_value(value))
+        await pipe.execute()
+        return True
+    except Exception as e:
+        logger.warning(f"Async cache set_many error: {e}")
+        cache._record_redis_error(e)
+        return False
+
+
+async def delete_cache(*keys: str) -> int:
+    """Delete exact cache keys (no pattern matching)."""
+    if not keys:
+        return 0
+    client = await get_async_redis_client()
+    if client is None:
+        return 0
+    try:
+        deleted = await client.delete(*keys)
+        await _publish_invalidation(client, keys)
+        return deleted
+    except Exception as e:
+        logger.warning(f"Async cache delete error: {e}")
+        cache._record_redis_error(e)
+    return 0
+
+
+# ============== Namespaced (generation-versioned) keys ==============
+
+async def get_namespace_generation(namespace: str) -> int:
+    """Current generation of a namespace (0 if never invalidated)."""
+    gen_key = cache._generation_key(namespace)
+    if cache._local_tier_active():
+        hit, generation = cache._local_cache.get(gen_key)
+        if hit:
+            cache._cache_stats.record(gen_key, "local_hits")
+            return generation
+    client = await get_async_redis_client()
+    if client is None:
+        return 0
+    seq = cache._invalidation_seq
+    try:
+        value = await client.get(gen_key)
+        generation = int(value) if value else 0
+        cache._cache_stats.record(gen_key, "redis_hits")
+        cache._fill_local(gen_key, generation, seq)
+        return generation
+    except Exception as e:
+        logger.warning(f"Async cache generation get error: {e}")
+        cache._record_redis_error(e)
+        return 0
+
+
+async def ns_cache_key(namespace: str, *args) -> str:
+    """Build a cache key scoped to the current generation of a namespace."""
+    return cache_key(namespace, f"g{await get_namespace_generation(namespace)}", *args)
+
+
+async def invalidate_namespace(*namespaces: str) -> bool:
+    """Invalidate every key of the given namespaces (one pipelined round trip)."""
+    client = await get_async_redis_client()
+    if client is None:
+        return False
+    gen_keys = [cache._generation_key(namespace) for namespace in namespaces]
+    try:
+        pipe = client.pipeline(transaction=False)
+        for namespace, gen_key in zip(namespaces, gen_keys):
+            pipe.incr(gen_key)
+            ttl = cache._generation_ttl(namespace)
+            if ttl:
+                pipe.expire(gen_key, ttl)
+        await pipe.execute()
+        await _publish_invalidation(client, gen_keys)
+        return True
+    except Exception as e:
+        logger.warning(f"Async cache namespace invalidation error: {e}")
+        cache._record_redis_error(e)
+        return False
+
+
+# ============== Stampede-protected loading ==============
+
+async def _call(loader) -> Any:
+    result = loader()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+async def _compute_and_store(key: str, ttl: int, loader) -> Any:
+    seq = cache._invalidation_seq
+    started = time.time()
+    value = await _call(loader)
+    if value is not None:
+        elapsed = time.time() - started
+        entry = {"_v": value, "_d": elapsed, "_x": time.time() + ttl}
+        await set_cache(key, entry, ttl)
+        cache._local_cache.discard(key)
+        cache._fill_local(key, entry, seq)
+    return value
+
+
+async def get_or_compute(key: str, ttl: int, loader, beta: float = XFETCH_BETA) -> Any:
+    """
+    Async get_or_compute(): same lock, bounded wait and early refresh as the
+    sync version, with entries shared between the two. loader may be a plain
+    function or a coroutine function; waiting uses asyncio.sleep.
+    """
+    entry = await get_cache(key)
+    fresh = isinstance(entry, dict) and "_x" in entry
+    if fresh and not cache._should_refresh_early(entry, beta):
+        return entry["_v"]
+
+    client = await get_async_redis_client()
+    if client is None:
+        return await _call(loader)
+
+    lock_key = cache_key(LOCK_PREFIX, key)
+    token = uuid.uuid4().hex
+    try:
+        acquired = await client.set(lock_key, token, nx=True, px=LOCK_TTL_MS)
+    except Exception as e:
+        logger.warning(f"Async cache lock error: {e}")
+        cache._record_redis_error(e)
+        acquired = False
+
+    if acquired:
+        try:
+            return await _compute_and_store(key, ttl, loader)
+        finally:
+            try:
+                await client.register_script(RELEASE_LOCK_SCRIPT)(keys=[lock_key], args=[token])
+            except Exception as e:
+                logger.warning(f"Async cache lock release error: {e}")
+                cache._record_redis_error(e)
+
+    if fresh:
+        return entry["_v"]
+
+    deadline = time.monotonic() + cache.LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(cache.LOCK_POLL_SECONDS)
+        entry = await get_cache(key)
+        if isinstance(entry, dict) and "_x" in entry:
+            return entry["_v"]
+
+    logger.warning(f"Timed out waiting for cache fill of {key}; computing locally")
+    return await _compute_and_store(key, ttl, loader)
+
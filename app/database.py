@@ -27,4 +27,20 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def in_new_session(db, load):
+    """
+    Wrap load(session) as a zero-arg callable that runs in its own session on
+    db's engine. For work that outlives the request (background cache
+    refreshes), where the request's session will already be closed.
+    """
+    bind = db.get_bind()
+
+    def run():
+        session = SessionLocal(bind=bind)
+        try:
+            return load(session)
+        finally:
+            session.close()
+    return run
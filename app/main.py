@@ -6,6 +6,8 @@ from app.api.stripe import payments_router, webhooks_router
 from app.api.external.payment import router as external_payment_router
 from app.database import SessionLocal
 from app.middleware.rate_limit import setup_rate_limiting
+from app.middleware.etag import ETagMiddleware
+from app.middleware.response_cache import ResponseCacheMiddleware
 from sqlalchemy import text
 import os
 
@@ -46,9 +48,16 @@ allowed_origins = [
 # Setup rate limiting
 setup_rate_limiting(app)
 
+# ETag / If-None-Match for catalog and wallet reads (inside GZip, so it hashes the identity body
+# and the tag is weak: both encodings carry it)
+app.add_middleware(ETagMiddleware)
+
 # Add GZip compression for responses > 1KB
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Anonymous public GETs served from cached final bytes (outside GZip, so hits skip compression too)
+app.add_middleware(ResponseCacheMiddleware)
+
 # Cache-Control headers for public read-only endpoints
 PUBLIC_CACHEABLE_PREFIXES = ("/coupons", "/categories", "/countries", "/regions")
 
@@ -71,6 +80,9 @@ async def cache_control_middleware(request, call_next):
             and not has_auth
         ):
             response.headers["Cache-Control"] = "public, max-age=60, stale-while-revalidate=30"
+        elif "etag" in response.headers:
+            # Private but revalidatable (e.g. the wallet): clients may keep it and send If-None-Match
+            response.headers["Cache-Control"] = "private, no-cache"
         else:
             response.headers["Cache-Control"] = "no-cache, no-store"
 
@@ -89,6 +101,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
@@ -154,7 +167,11 @@ async def validation_exception_handler(request, exc):
 
 @app.get("/health")
 def detailed_health_check():
-    """Detailed health check with database connection status."""
+    """Detailed health check with database, Redis circuit breaker and cache hit ratios."""
+    from app.cache import cache_stats, get_cache, redis_status
+    from app.services.stock_service import RECONCILE_REPORT_KEY
+    from app.services.view_buffer import view_buffer
+
     status = {"status": "OK", "database": "unknown"}
     
     try:
@@ -165,5 +182,10 @@ def detailed_health_check():
     except Exception as e:
         status["status"] = "degraded"
         status["database"] = f"error: {str(e)}"
+
+    status["redis"] = redis_status()
+    status["cache"] = cache_stats()
+    status["stock_reconcile"] = get_cache(RECONCILE_REPORT_KEY)
+    status["view_buffer"] = view_buffer.stats()
     
     return status
\ No newline at end of file
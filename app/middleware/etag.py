@@ -0,0 +1,149 @@
+"""
+Conditional GET support (ETag / If-None-Match) for catalog and wallet reads.
+
+Every 200 GET under ETAG_PATHS gets an ETag hashed from its body, and a
+request whose If-None-Match matches gets an empty 304 instead of the body.
+The tag is weak: it is computed inside GZip, so the gzip and identity
+representations of a response share it, which only semantic equivalence
+(not byte equality) allows.
+
+Anonymous catalog reads also remember the ETag they produced under a
+validator key built from the path, the normalized query and the current
+generations of the cache namespaces the response is derived from. A
+revalidation whose ETag matches that entry is answered before routing, so it
+never touches the database or re-serializes anything. Any write that bumps one
+of those namespaces changes the validator key, so a stale ETag can't match.
+"""
+import hashlib
+import logging
+from typing import Optional
+from urllib.parse import urlencode
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import cache_async
+from app.cache import (
+    cache_key, NS_COUPONS_LIST, NS_PACKAGES, NS_CATEGORIES, NS_REGIONS, NS_COUNTRIES,
+    CACHE_TTL_MEDIUM,
+)
+
+logger = logging.getLogger(__name__)
+
+ETAG_PATHS = ("/coupons", "/packages", "/categories", "/regions", "/countries", "/user/wallet")
+
+# Namespaces whose generations version each public prefix (first match wins).
+# Coupon and package payloads embed category and coupon data, so they follow
+# those namespaces as well.
+VALIDATOR_NAMESPACES = (
+    ("/coupons", (NS_COUPONS_LIST, NS_CATEGORIES)),
+    ("/packages", (NS_PACKAGES, NS_COUPONS_LIST, NS_CATEGORIES)),
+    ("/categories", (NS_CATEGORIES, NS_COUPONS_LIST)),
+    ("/regions", (NS_REGIONS,)),
+    ("/countries", (NS_COUNTRIES,)),
+)
+
+# Fed from live Redis counters rather than namespaced caches: content hash only
+REALTIME_PATHS = ("/coupons/trending", "/coupons/recently-viewed")
+
+VALIDATOR_PREFIX = "http:etag"
+
+
+def _under(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix + "/")
+
+
+def make_etag(body: bytes) -> str:
+    """Weak ETag for a response body (shared by its gzip and identity encodings)."""
+    return 'W/"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+
+def normalized_query(request: Request) -> str:
+    return urlencode(sorted(request.query_params.multi_items()))
+
+
+def namespaces_for(request: Request) -> Optional[tuple]:
+    """Namespaces versioning an anonymous GET, or None if it isn't generation-versioned."""
+    path = request.url.path
+    if "authorization" in request.headers:
+        return None
+    if any(_under(path, p) for p in REALTIME_PATHS) or path.endswith("/stock"):
+        return None
+    for prefix, namespaces in VALIDATOR_NAMESPACES:
+        if _under(path, prefix):
+            return namespaces
+    return None
+
+
+async def generation_tag(namespaces: tuple) -> str:
+    """Current generations of the given namespaces, e.g. "g3.g0"."""
+    generations = [await cache_async.get_namespace_generation(ns) for ns in namespaces]
+    return ".".join(f"g{generation}" for generation in generations)
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+async def read_body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def rebuild(response, body: bytes) -> Response:
+    """A plain Response carrying an already-consumed streaming response's body and headers."""
+    rebuilt = Response(content=body, status_code=response.status_code, background=response.background)
+    rebuilt.raw_headers = list(response.raw_headers)
+    return rebuilt
+
+
+class ETagMiddleware(BaseHTTPMiddleware):
+    """Adds ETags to catalog/wallet GETs and answers matching revalidations with 304."""
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if request.method != "GET" or not any(_under(path, p) for p in ETAG_PATHS):
+            return await call_next(request)
+
+        if_none_match = request.headers.get("if-none-match")
+        validator_k = None
+        namespaces = namespaces_for(request)
+        if namespaces:
+            validator_k = cache_key(
+                VALIDATOR_PREFIX, await generation_tag(namespaces), path, normalized_query(request)
+            )
+            if if_none_match:
+                known = await cache_async.get_cache(validator_k)
+                if known and etag_matches(if_none_match, known):
+                    return not_modified(known)
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = await read_body(response)
+        etag = make_etag(body)
+        if validator_k:
+            await cache_async.set_cache(validator_k, etag, CACHE_TTL_MEDIUM)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        response = rebuild(response, body)
+        response.headers["ETag"] = etag
+        return response
@@ -0,0 +1,80 @@
+"""
+Full-response cache for anonymous public GETs.
+
+Sits outside GZip and stores the final bytes (already JSON-encoded and, when
+the client accepts it, compressed) together with their headers, keyed by the
+path, the normalized query, the content coding and the generations of the
+namespaces the response derives from (see app.middleware.etag). A hit is
+answered here without routing, dependency injection, validation, encoding or
+compression; writes invalidate by bumping a namespace, which changes the key.
+
+Hits are served ahead of the per-route rate limiter, the same way a CDN edge
+honouring our public Cache-Control header would serve them.
+"""
+import os
+import logging
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app import cache_async
+from app.cache import cache_key, CACHE_CODEC, CACHE_TTL_SHORT
+from app.middleware.etag import (
+    namespaces_for, generation_tag, normalized_query, etag_matches, not_modified, read_body, rebuild,
+)
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 262144))  # per response; 0 disables
+RESPONSE_CACHE_PREFIX = "http:resp"
+
+# Response headers that must not be replayed to other clients
+_UNCACHEABLE_HEADERS = (b"set-cookie",)
+
+
+def _enabled() -> bool:
+    # Bodies are stored as raw bytes, which only the msgpack codec round-trips
+    return RESPONSE_CACHE_MAX_BYTES > 0 and CACHE_CODEC == "msgpack"
+
+
+def _content_coding(request: Request) -> str:
+    return "gzip" if "gzip" in request.headers.get("accept-encoding", "") else "identity"
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Serves anonymous, generation-versioned GETs from cached response bytes."""
+
+    async def dispatch(self, request: Request, call_next):
+        namespaces = namespaces_for(request) if request.method == "GET" and _enabled() else None
+        if not namespaces:
+            return await call_next(request)
+
+        path = request.url.path
+        response_k = cache_key(
+            RESPONSE_CACHE_PREFIX, await generation_tag(namespaces),
+            path, normalized_query(request), _content_coding(request),
+        )
+        cached = await cache_async.get_cache(response_k)
+        if cached is not None:
+            etag = cached.get("etag")
+            if etag and etag_matches(request.headers.get("if-none-match"), etag):
+                return not_modified(etag)
+            response = Response(content=cached["body"], status_code=cached["status"])
+            response.raw_headers = [tuple(header) for header in cached["headers"]]
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        response = await call_next(request)
+        if response.status_code != 200 or any(name in _UNCACHEABLE_HEADERS for name, _ in response.raw_headers):
+            return response
+
+        body = await read_body(response)
+        if len(body) <= RESPONSE_CACHE_MAX_BYTES:
+            await cache_async.set_cache(response_k, {
+                "status": response.status_code,
+                "headers": [list(header) for header in response.raw_headers],
+                "body": body,
+                "etag": response.headers.get("etag"),
+            }, CACHE_TTL_SHORT)
+        return rebuild(response, body)
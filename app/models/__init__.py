@@ -1,6 +1,7 @@
 # Import all models to ensure they're registered with SQLAlchemy
 from app.models.user import User
 from app.models.coupon import Coupon
+from app.models.coupon_price import CouponPrice
 from app.models.user_coupon import UserCoupon
 from app.models.cart import CartItem
 from app.models.order import Order
@@ -10,12 +11,14 @@ from app.models.category import Category
 from app.models.region import Region
 from app.models.country import Country
 from app.models.coupon_view import CouponView
+from app.models.daily_stats import CouponDailyStats, CategoryDailyStats, CouponDailyViewer
 from app.models.package import Package
 from app.models.package_coupon import PackageCoupon
 
 __all__ = [
     "User",
     "Coupon",
+    "CouponPrice",
     "UserCoupon",
     "CartItem",
     "Order",
@@ -27,6 +30,9 @@ __all__ = [
     "Region",
     "Country",
     "CouponView",
+    "CouponDailyStats",
+    "CategoryDailyStats",
+    "CouponDailyViewer",
     "Package",
     "PackageCoupon",
 ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Index, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Index, JSON, DDL, Table, event
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -37,5 +37,69 @@ class Coupon(Base):
     __table_args__ = (
         Index('ix_coupons_active_featured', 'is_active', 'is_featured'),
         Index('ix_coupons_active_created', 'is_active', 'created_at'),
+        Index('ix_coupons_active_created_id', 'is_active', created_at.desc(), id.desc()),  # as migration 0002
     )
 
+
+# Countries a coupon is offered in (created by the baseline migration; no API writes it yet)
+coupon_countries = Table(
+    "coupon_countries",
+    Base.metadata,
+    Column("coupon_id", UUID(as_uuid=True), ForeignKey("coupons.id", ondelete="CASCADE"), primary_key=True),
+    Column("country_id", UUID(as_uuid=True), ForeignKey("countries.id", ondelete="CASCADE"), primary_key=True, index=True),
+    Column("created_at", DateTime, default=datetime.utcnow),
+)
+
+
+# ── Full-text search ─────────────────────────────────────────────
+# Neither structure below is mapped: the ORM never reads or writes them, and
+# app.services.search_service queries them. Postgres gets a generated
+# tsvector column (GIN) for ranked word/prefix matches plus a trigram GIN index
+# over SEARCH_TEXT_SQL for typo-tolerant and substring matches; SQLite (dev and
+# tests) gets an external-content FTS5 table kept in sync by triggers.
+# Migration 0003 creates the Postgres side on existing databases.
+
+# Must stay byte-identical to the ix_coupons_search_trgm index expression
+SEARCH_TEXT_SQL = "lower(coalesce(coupons.title, '') || ' ' || coalesce(coupons.brand, '') || ' ' || coupons.code)"
+
+_POSTGRES_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """ALTER TABLE coupons ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(brand, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(code, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_coupons_search_vector ON coupons USING gin (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_coupons_search_trgm ON coupons USING gin (({SEARCH_TEXT_SQL}) gin_trgm_ops)",
+)
+
+_SQLITE_FTS_COLUMNS = "title, brand, code, description"
+_SQLITE_SEARCH_DDL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS coupons_fts USING fts5(
+        {_SQLITE_FTS_COLUMNS}, content='coupons', content_rowid='rowid', prefix='2 3'
+    )""",
+    # Indexed vocabulary, used to correct misspelt query terms
+    "CREATE VIRTUAL TABLE IF NOT EXISTS coupons_fts_vocab USING fts5vocab(coupons_fts, 'row')",
+    f"""CREATE TRIGGER IF NOT EXISTS coupons_fts_ai AFTER INSERT ON coupons BEGIN
+        INSERT INTO coupons_fts(rowid, {_SQLITE_FTS_COLUMNS})
+        VALUES (new.rowid, new.title, new.brand, new.code, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS coupons_fts_ad AFTER DELETE ON coupons BEGIN
+        INSERT INTO coupons_fts(coupons_fts, rowid, {_SQLITE_FTS_COLUMNS})
+        VALUES ('delete', old.rowid, old.title, old.brand, old.code, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS coupons_fts_au AFTER UPDATE OF {_SQLITE_FTS_COLUMNS} ON coupons BEGIN
+        INSERT INTO coupons_fts(coupons_fts, rowid, {_SQLITE_FTS_COLUMNS})
+        VALUES ('delete', old.rowid, old.title, old.brand, old.code, old.description);
+        INSERT INTO coupons_fts(rowid, {_SQLITE_FTS_COLUMNS})
+        VALUES (new.rowid, new.title, new.brand, new.code, new.description);
+    END""",
+)
+
+for _statement in _POSTGRES_SEARCH_DDL:
+    event.listen(Coupon.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+for _statement in _SQLITE_SEARCH_DDL:
+    event.listen(Coupon.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in ("DROP TABLE IF EXISTS coupons_fts_vocab", "DROP TABLE IF EXISTS coupons_fts"):
+    event.listen(Coupon.__table__, "before_drop", DDL(_statement).execute_if(dialect="sqlite"))
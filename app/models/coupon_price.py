@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class CouponPrice(Base):
+    """
+    One row per (coupon, currency), normalized from Coupon.pricing so prices
+    can be filtered, sorted and summed in SQL. Amounts are integer minor units.
+    Written only by CouponService (sync_prices); Coupon.pricing stays the
+    source the admin API edits.
+    """
+    __tablename__ = "coupon_prices"
+
+    coupon_id = Column(UUID(as_uuid=True), ForeignKey("coupons.id", ondelete="CASCADE"), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    price_cents = Column(Integer, nullable=False)
+    discount_cents = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_coupon_prices_currency_price", "currency", "price_cents"),
+    )
@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class CouponDailyStats(Base):
+    """
+    Per-coupon, per-day (UTC) rollup of views and paid sales, so analytics
+    never scan coupon_views or order_items. Kept current by DailyStatsService:
+    views as the view buffer flushes, sales when an order is paid. sold and
+    revenue count order lines and their price, as the analytics always have.
+    Rebuild with scripts/backfill_daily_stats.py.
+    """
+    __tablename__ = "coupon_daily_stats"
+
+    coupon_id = Column(UUID(as_uuid=True), ForeignKey("coupons.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    unique_viewers = Column(Integer, nullable=False, default=0)
+    sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index("ix_coupon_daily_stats_day", "day"),
+    )
+
+
+class CategoryDailyStats(Base):
+    """Per-category, per-day rollup, attributed to the coupon's category at event time."""
+    __tablename__ = "category_daily_stats"
+
+    category_id = Column(UUID(as_uuid=True), ForeignKey("categories.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(Integer, nullable=False, default=0)
+    sold = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index("ix_category_daily_stats_day", "day"),
+    )
+
+
+class CouponDailyViewer(Base):
+    """
+    Viewers already counted in coupon_daily_stats.unique_viewers, one row per
+    (coupon, day, viewer), where viewer is "user:{id}" or "session:{id}". The
+    primary key deduplicates concurrent flushes. Only the last couple of days
+    are kept (DailyStatsService.VIEWER_RETENTION_DAYS).
+    """
+    __tablename__ = "coupon_daily_viewers"
+
+    coupon_id = Column(UUID(as_uuid=True), ForeignKey("coupons.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    viewer = Column(String(120), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_coupon_daily_viewers_day", "day"),
+    )
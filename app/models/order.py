@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,11 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order")
     payment = relationship("Payment", back_populates="order", uselist=False)
 
+    __table_args__ = (
+        Index('ix_orders_created_id', created_at.desc(), id.desc()),  # as migration 0002
+        Index('ix_orders_status_created_id', 'status', created_at.desc(), id.desc()),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
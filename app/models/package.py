@@ -33,4 +33,5 @@ class Package(Base):
 
     __table_args__ = (
         Index('ix_packages_active_featured', 'is_active', 'is_featured'),
+        Index('ix_packages_active_created_id', 'is_active', created_at.desc(), id.desc()),  # as migration 0002
     )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Date
+from sqlalchemy import Column, String, DateTime, Boolean, Date, Index
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -33,4 +33,8 @@ class User(Base):
     town = Column(String(100), nullable=True)
     state_province = Column(String(100), nullable=True)
     postal_code = Column(String(20), nullable=True)
-    address_country = Column(String(100), nullable=True)
\ No newline at end of file
+    address_country = Column(String(100), nullable=True)
+
+    __table_args__ = (
+        Index('ix_users_created_id', created_at.desc(), id.desc()),  # as migration 0002
+    )
@@ -0,0 +1,118 @@
+"""
+Read models: immutable, slotted snapshots of catalog entities.
+
+Everything that only displays a coupon (detail, listings, trending, recently
+viewed, package contents, the wallet) is handed one of these instead of an ORM
+object. They are plain Python objects: no SQLAlchemy instrumentation to pay
+for on construction or attribute access, no session to detach from, and no way
+to mutate them by accident (writes go through the services, against the
+database). Nested JSON values such as `pricing` are shared, not copied; treat
+them as read-only too.
+
+Cached form is a list of field values in __slots__ order (smaller than a dict
+and cheaper to encode). Changing the fields changes that format, so the cache
+key prefix must change with it (see CouponService.entity_key()).
+"""
+from typing import Any, Optional
+
+
+def sanitize(value):
+    """Text columns occasionally hold binary data; never let it reach the cache or a response."""
+    if isinstance(value, bytes):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+    return value
+
+
+class _ReadModel:
+    __slots__ = ()
+
+    def __init__(self, *values: Any):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and self.to_cache() == other.to_cache()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def to_cache(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+
+class CategoryDTO(_ReadModel):
+    __slots__ = ("id", "name", "slug")
+
+    @classmethod
+    def from_orm(cls, category) -> "CategoryDTO":
+        return cls(category.id, sanitize(category.name), sanitize(category.slug))
+
+    @classmethod
+    def from_cache(cls, values: Optional[list]) -> Optional["CategoryDTO"]:
+        return cls(*values) if values is not None else None
+
+
+class CouponDTO(_ReadModel):
+    __slots__ = (
+        "id", "code", "redeem_code", "brand", "title", "description",
+        "discount_type", "discount_amount", "max_uses", "current_uses",
+        "is_active", "stock", "is_featured", "is_package_coupon",
+        "created_at", "expiration_date", "category_id", "category",
+        "picture_url", "pricing",
+    )
+
+    @classmethod
+    def from_orm(cls, coupon) -> "CouponDTO":
+        """Snapshot of a Coupon (load its category eagerly to avoid a lazy load here)."""
+        return cls(
+            coupon.id,
+            sanitize(coupon.code),
+            sanitize(coupon.redeem_code),
+            sanitize(coupon.brand),
+            sanitize(coupon.title),
+            sanitize(coupon.description),
+            sanitize(coupon.discount_type),
+            coupon.discount_amount,
+            coupon.max_uses,
+            coupon.current_uses,
+            coupon.is_active,
+            coupon.stock,
+            coupon.is_featured,
+            coupon.is_package_coupon,
+            coupon.created_at,
+            coupon.expiration_date,
+            coupon.category_id,
+            CategoryDTO.from_orm(coupon.category) if coupon.category else None,
+            sanitize(coupon.picture_url),
+            coupon.pricing,
+        )
+
+    @classmethod
+    def from_cache(cls, values: list) -> "CouponDTO":
+        coupon = cls(*values)
+        object.__setattr__(coupon, "category", CategoryDTO.from_cache(coupon.category))
+        return coupon
+
+    def to_cache(self) -> list:
+        values = super().to_cache()
+        values[self.__slots__.index("category")] = self.category.to_cache() if self.category else None
+        return values
+
+    def as_dict(self) -> dict:
+        data = super().as_dict()
+        data["category"] = self.category.as_dict() if self.category else None
+        return data
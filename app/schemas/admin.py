@@ -42,6 +42,7 @@ class PaginatedUsersResponse(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
 
 
 class PaginatedOrdersResponse(BaseModel):
@@ -50,6 +51,7 @@ class PaginatedOrdersResponse(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
     # Order statistics
     total_revenue: float = 0.0
     completed_count: int = 0
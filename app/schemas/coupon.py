@@ -3,6 +3,20 @@ from datetime import datetime
 from typing import Optional, List, Any, Dict
 from uuid import UUID
 
+from app.utils.serialization import project
+
+
+def split_pricing(pricing: Any) -> tuple:
+    """Per-currency prices and discounts from a pricing JSON value"""
+    prices = {}
+    discounts = {}
+    if pricing and isinstance(pricing, dict):
+        for currency, values in pricing.items():
+            if isinstance(values, dict):
+                prices[currency] = values.get('price', 0.0)
+                discounts[currency] = values.get('discount_amount', 0.0)
+    return prices, discounts
+
 
 class CouponBasePublic(BaseModel):
     brand: Optional[str] = Field(default=None, max_length=100, description="Brand/company name")
@@ -71,26 +85,16 @@ class CouponResponseCommon(CouponBasePublic):
     @classmethod
     def compute_stock_sold(cls, data: Any) -> Any:
         """Set stock_sold to current_uses value and extract multi-currency pricing"""
+        if hasattr(data, 'as_dict'):
+            # Read model (app.read_models.CouponDTO)
+            data = data.as_dict()
+
         if isinstance(data, dict):
             # Already a dict, just add computed fields
             data['stock_sold'] = data.get('current_uses', 0)
             
-            # Extract multi-currency pricing from pricing JSON field
-            pricing = data.get('pricing', {})
-            if pricing and isinstance(pricing, dict):
-                prices = {}
-                discounts = {}
-                for currency, values in pricing.items():
-                    if isinstance(values, dict):
-                        prices[currency] = values.get('price', 0.0)
-                        discounts[currency] = values.get('discount_amount', 0.0)
-                data['prices'] = prices
-                data['discounts'] = discounts
-            else:
-                # Fallback to default USD pricing if no pricing JSON
-                data['prices'] = {} # No fallback to single price field
-                data['discounts'] = {}
-            
+            # Extract multi-currency pricing from pricing JSON field (no fallback to a single price field)
+            data['prices'], data['discounts'] = split_pricing(data.get('pricing'))
             return data
         
         # SQLAlchemy model - convert to dict with all attributes
@@ -111,23 +115,20 @@ class CouponResponseCommon(CouponBasePublic):
         data_dict['stock_sold'] = data_dict.get('current_uses', 0)
         
         # Extract multi-currency pricing
-        pricing = data_dict.get('pricing', {})
-        if pricing and isinstance(pricing, dict):
-            prices = {}
-            discounts = {}
-            for currency, values in pricing.items():
-                if isinstance(values, dict):
-                    prices[currency] = values.get('price', 0.0)
-                    discounts[currency] = values.get('discount_amount', 0.0)
-            data_dict['prices'] = prices
-            data_dict['discounts'] = discounts
-        else:
-            # Fallback to default pricing
-            data_dict['prices'] = {}
-            data_dict['discounts'] = {}
-        
+        data_dict['prices'], data_dict['discounts'] = split_pricing(data_dict.get('pricing'))
         return data_dict
 
+    @classmethod
+    def payload(cls, coupon) -> dict:
+        """
+        Response body for a CouponDTO built without validation, for
+        PrevalidatedJSONResponse (see app.utils.serialization)
+        """
+        data = coupon.as_dict()
+        data['stock_sold'] = data.get('current_uses', 0)
+        data['prices'], data['discounts'] = split_pricing(data.get('pricing'))
+        return project(cls, data)
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -161,6 +162,12 @@ CouponResponse.model_rebuild()
 CouponPublicResponse.model_rebuild()
 
 
+class CouponBatchResponse(BaseModel):
+    """GET /coupons/batch: coupons in request order, plus the ids that matched nothing"""
+    items: List[CouponPublicResponse]
+    missing: List[str] = Field(default_factory=list, description="Requested ids that are unknown or malformed")
+
+
 class CouponValidateRequest(BaseModel):
     """Request schema for coupon validation"""
     code: str = Field(..., min_length=1, max_length=50, description="Coupon code to validate")
@@ -0,0 +1,21 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List
+from uuid import UUID
+
+
+class CategoryFacet(BaseModel):
+    id: UUID
+    name: str
+    slug: str
+    count: int
+
+
+class FacetCounts(BaseModel):
+    """Matching rows per filter value for the current filter set."""
+    total: int
+    featured: int
+    categories: List[CategoryFacet] = Field(default_factory=list)
+    brands: Dict[str, int] = Field(default_factory=dict)
+    countries: Dict[str, int] = Field(default_factory=dict, description="Keyed by country code (coupons) or name (packages)")
+    currencies: Dict[str, int] = Field(default_factory=dict, description="Rows with a price in each currency")
+    discounts: Dict[str, int] = Field(default_factory=dict, description="Discount buckets: 0-10, 10-25, 25-50, 50-75, 75+")
@@ -4,6 +4,8 @@ from typing import Optional, List, Dict
 from uuid import UUID
 import re
 
+from app.utils.serialization import project
+
 
 class PackageBase(BaseModel):
     name: str = Field(..., min_length=2, max_length=200)
@@ -183,6 +185,12 @@ class PackageResponse(PackageBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PackageBatchResponse(BaseModel):
+    """GET /packages/batch: packages in request order, plus the ids that matched nothing"""
+    items: List[PackageResponse]
+    missing: List[str] = Field(default_factory=list, description="Requested ids that are unknown or malformed")
+
+
 class PackageListResponse(PackageBase):
     """Lighter response for list endpoints (no nested coupons)."""
     id: UUID
@@ -249,4 +257,9 @@ class PackageListResponse(PackageBase):
         
         return cls(**data)
 
+    @classmethod
+    def payload(cls, package: dict) -> dict:
+        """Response body for a PackageService.get_all() item built without validation (see app.utils.serialization)"""
+        return project(cls, package)
+
     model_config = ConfigDict(from_attributes=True)
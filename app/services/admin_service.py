@@ -12,9 +12,13 @@ from app.schemas.admin import (
     PaginatedOrdersResponse, DashboardResponse, TopCouponResponse,
     PerformanceResponse, PerformanceData, TopCategoryResponse
 )
-from app.models.coupon_view import CouponView
+from app.models.daily_stats import CouponDailyStats
 from app.models.category import Category
 from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_SHORT
+from app.utils.pagination import decode_cursor, keyset_after, next_cursor
+
+# Keyset sort key of the admin user and order lists: (created_at, id), newest first
+CURSOR_TYPES = (datetime.fromisoformat, UUID)
 
 
 class AdminService:
@@ -25,9 +29,11 @@ class AdminService:
         skip: int = 0, 
         limit: int = 20,
         active_only: bool = False,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
     ) -> PaginatedUsersResponse:
-        """Get all users with aggregated order stats"""
+        """Get all users with aggregated order stats (cursor replaces skip; raises InvalidCursor)"""
+        after = decode_cursor(cursor, CURSOR_TYPES) if cursor else None
         query = db.query(User)
         
         if active_only:
@@ -47,7 +53,10 @@ class AdminService:
         total = query.count()
         
         # Get users with pagination
-        users = query.order_by(desc(User.created_at)).offset(skip).limit(limit).all()
+        page = keyset_after(query, [User.created_at, User.id], after)
+        if after is None:
+            page = page.offset(skip)
+        users = page.limit(limit).all()
         
         # Build response with stats
         user_responses = []
@@ -77,7 +86,8 @@ class AdminService:
             items=user_responses,
             total=total,
             skip=skip,
-            limit=limit
+            limit=limit,
+            next_cursor=next_cursor(users, limit, lambda u: (u.created_at, u.id))
         )
     
     @staticmethod
@@ -116,9 +126,11 @@ class AdminService:
         user_id: Optional[UUID] = None,
         search: Optional[str] = None,
         date_from: Optional[datetime] = None,
-        date_to: Optional[datetime] = None
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None
     ) -> PaginatedOrdersResponse:
-        """Get all orders with filters and statistics"""
+        """Get all orders with filters and statistics (cursor replaces skip; raises InvalidCursor)"""
+        after = decode_cursor(cursor, CURSOR_TYPES) if cursor else None
         query = db.query(Order)
         
         # Apply filters
@@ -156,7 +168,10 @@ class AdminService:
             func.sum(case((Order.status == 'cancelled', 1), else_=0)).label('cancelled_count')
         ).first()
         
-        orders = query.order_by(desc(Order.created_at)).offset(skip).limit(limit).all()
+        page = keyset_after(query, [Order.created_at, Order.id], after)
+        if after is None:
+            page = page.offset(skip)
+        orders = page.limit(limit).all()
         
         order_responses = []
         for order in orders:
@@ -184,6 +199,7 @@ class AdminService:
             total=total,
             skip=skip,
             limit=limit,
+            next_cursor=next_cursor(orders, limit, lambda o: (o.created_at, o.id)),
             total_revenue=float(stats.total_revenue or 0),
             completed_count=int(stats.completed_count or 0),
             pending_count=int(stats.pending_count or 0),
@@ -334,13 +350,13 @@ class AdminService:
             
         start_date = now - timedelta(days=30)
         
-        # Views query (group by day)
+        # Views per day from the daily rollups
         views_query = db.query(
-            func.date(CouponView.viewed_at).label('day'),
-            func.count(CouponView.id).label('count')
+            CouponDailyStats.day.label('day'),
+            func.sum(CouponDailyStats.views).label('count')
         ).filter(
-            CouponView.viewed_at >= start_date
-        ).group_by('day').all()
+            CouponDailyStats.day >= start_date.date()
+        ).group_by(CouponDailyStats.day).all()
         
         for row in views_query:
             if row.day in days_map:
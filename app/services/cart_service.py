@@ -8,7 +8,7 @@ from app.models.cart import CartItem
 from app.models.coupon import Coupon
 from app.models.package import Package
 from app.models.package_coupon import PackageCoupon
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_SHORT
+from app.cache import get_cache, set_cache, ns_cache_key, invalidate_namespace, cart_namespace, CACHE_TTL_SHORT
 
 
 class CartService:
@@ -34,7 +34,7 @@ class CartService:
                 db.commit()
                 db.refresh(existing)  # Refresh to get updated data
                 # Invalidate cart cache
-                invalidate_cache(f"cart:{user_id}:*")
+                invalidate_namespace(cart_namespace(user_id))
                 return existing, "Quantity updated"
             except StaleDataError:
                 db.rollback()
@@ -50,7 +50,7 @@ class CartService:
             db.commit()
             db.refresh(cart_item)  # Refresh to get database-generated fields
             # Invalidate cart cache
-            invalidate_cache(f"cart:{user_id}:*")
+            invalidate_namespace(cart_namespace(user_id))
             return cart_item, "Added to cart"
         except IntegrityError:
             db.rollback()
@@ -62,7 +62,7 @@ class CartService:
                 existing.quantity += quantity
                 db.commit()
                 db.refresh(existing)  # Refresh to get updated data
-                invalidate_cache(f"cart:{user_id}:*")
+                invalidate_namespace(cart_namespace(user_id))
                 return existing, "Quantity updated"
             return None, "Failed to add to cart"
 
@@ -89,7 +89,7 @@ class CartService:
                 db.commit()
                 db.refresh(existing)  # Refresh to get updated data
                 # Invalidate cart cache
-                invalidate_cache(f"cart:{user_id}:*")
+                invalidate_namespace(cart_namespace(user_id))
                 return existing, "Quantity updated"
             except StaleDataError:
                 db.rollback()
@@ -105,7 +105,7 @@ class CartService:
             db.commit()
             db.refresh(cart_item)  # Refresh to get database-generated fields
             # Invalidate cart cache
-            invalidate_cache(f"cart:{user_id}:*")
+            invalidate_namespace(cart_namespace(user_id))
             return cart_item, "Added to cart"
         except IntegrityError:
             db.rollback()
@@ -117,14 +117,14 @@ class CartService:
                 existing.quantity += quantity
                 db.commit()
                 db.refresh(existing)  # Refresh to get updated data
-                invalidate_cache(f"cart:{user_id}:*")
+                invalidate_namespace(cart_namespace(user_id))
                 return existing, "Quantity updated"
             return None, "Failed to add to cart"
 
     @staticmethod
     def get_cart(db: Session, user_id: UUID) -> List[CartItem]:
         # Try cache first
-        cache_k = cache_key("cart", str(user_id), "items")
+        cache_k = ns_cache_key(cart_namespace(user_id), "items")
         cached = get_cache(cache_k)
         
         if cached is not None:
@@ -158,18 +158,42 @@ class CartService:
 
     @staticmethod
     def get_cart_total(db: Session, user_id: UUID, currency: str = "USD") -> float:
-        from app.services.coupon_service import CouponService
         items = CartService.get_cart(db, user_id)
-        total = 0.0
+        return CartService.total_cents(db, items, currency) / 100
+
+    @staticmethod
+    def total_cents(db: Session, items, currency: str = "USD") -> int:
+        """Total of cart (or order) items in minor units; see unit_prices_cents()."""
+        unit_prices = CartService.unit_prices_cents(db, items, currency)
+        return sum(unit * int(item.quantity) for unit, item in zip(unit_prices, items))
+
+    @staticmethod
+    def unit_prices_cents(db: Session, items, currency: str = "USD") -> List[int]:
+        """
+        Unit price of each cart (or order) item in minor units, as the payment
+        provider is charged. Every coupon price, including package members,
+        comes from one coupon_prices lookup.
+        """
+        from app.services.coupon_service import CouponService
+        from app.services.package_service import PackageService
+        coupon_ids = []
+        for item in items:
+            if item.coupon:
+                coupon_ids.append(item.coupon_id)
+            elif item.package:
+                coupon_ids.extend(c.coupon_id for c in item.package.coupon_associations)
+        prices = CouponService.get_price_cents(db, coupon_ids, currency)
+
+        unit_prices = []
         for item in items:
             if item.coupon:
-                total += CouponService.get_price(item.coupon, currency) * item.quantity
+                unit_prices.append(prices.get(item.coupon_id, 0))
             elif item.package:
-                base_sum = sum(CouponService.get_price(c.coupon, currency) for c in item.package.coupon_associations if c.coupon)
-                discount = item.package.discount or 0.0
-                pkg_price = base_sum * (1.0 - discount / 100.0)
-                total += pkg_price * item.quantity
-        return total
+                member_cents = sum(prices.get(c.coupon_id, 0) for c in item.package.coupon_associations)
+                unit_prices.append(PackageService.price_cents(member_cents, item.package.discount))
+            else:
+                unit_prices.append(0)
+        return unit_prices
 
     @staticmethod
     def remove_from_cart(db: Session, user_id: UUID, item_id: UUID) -> bool:
@@ -186,7 +210,7 @@ class CartService:
             db.delete(item)
             db.commit()
             # Invalidate cart cache
-            invalidate_cache(f"cart:{user_id}:*")
+            invalidate_namespace(cart_namespace(user_id))
             return True
         return False
 
@@ -195,5 +219,5 @@ class CartService:
         deleted = db.query(CartItem).filter(CartItem.user_id == user_id).delete()
         db.commit()
         # Invalidate cart cache
-        invalidate_cache(f"cart:{user_id}:*")
+        invalidate_namespace(cart_namespace(user_id))
         return deleted
@@ -0,0 +1,430 @@
+"""
+Per-worker in-memory filter index over the coupon catalog.
+
+Listing filters (is_active, category_id, is_featured, is_package_coupon,
+min_discount) and facet counts (category, brand, currency, country, discount
+bucket) are answered with bitsets instead of SQL. Each coupon owns a
+slot, and slots are assigned in listing order: (created_at, id) ascending, so
+the newest coupon has the highest slot. A bitset is a Python int with bit
+`slot` set for every member. A filter is a handful of ANDs. A page is the top
+set bits of the result (newest first). A facet count is
+`(result & facet).bit_count()`. min_discount thresholds come from a sorted
+(discount, slot) array and are memoized until the next change.
+
+Freshness: writers call publish_coupon_changes(ids) after committing. That
+marks the ids dirty in this worker and broadcasts them on CATALOG_CHANNEL.
+Before answering, a worker re-reads its dirty rows (one PK query) and patches
+their slots. The index is only trusted while this worker receives broadcasts
+(app.cache.local_tier_epoch()); a resubscription, which may have missed
+events, or CATALOG_INDEX_MAX_AGE forces a full rebuild. When it can't answer,
+callers fall back to SQL.
+
+Refreshes query the database without holding the index lock: one request
+thread reads rows and builds the new structures while the others fall back
+to SQL, then it swaps the result in under the lock. Dirty ids are only
+forgotten once their rows have been applied.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.cache import local_tier_epoch, publish, subscribe_channel
+from app.models.coupon import Coupon, coupon_countries
+from app.models.coupon_price import CouponPrice
+
+logger = logging.getLogger(__name__)
+
+CATALOG_INDEX_MAX_AGE = int(os.getenv("CATALOG_INDEX_MAX_AGE", 3600))  # full-rebuild bound; 0 disables the index
+CATALOG_CHANNEL = "catalog:coupons"
+
+_INDEXED_COLUMNS = (
+    Coupon.id, Coupon.created_at, Coupon.is_active, Coupon.is_featured,
+    Coupon.is_package_coupon, Coupon.category_id, Coupon.discount_amount,
+    Coupon.brand,
+)
+
+# Multi-valued attributes kept as value -> bitset, for facet counts
+FACETS = ("category", "brand", "currency", "country")
+
+# (label, low, high): low <= discount < high; None is open-ended
+DISCOUNT_BUCKETS = (
+    ("0-10", 0.0, 10.0),
+    ("10-25", 10.0, 25.0),
+    ("25-50", 25.0, 50.0),
+    ("50-75", 50.0, 75.0),
+    ("75+", 75.0, None),
+)
+
+
+# Attributes replaced as a whole when a rebuild is swapped in (see _reset)
+_STATE = (
+    "_ids", "_keys", "_slots", "_rows", "_live", "_active", "_featured", "_unfeatured",
+    "_unpackaged", "_facets", "_by_discount", "_discount_masks", "_built_at",
+)
+
+
+def _sort_key(row) -> tuple:
+    return (row.created_at or datetime.min, row.id)
+
+
+def _row_values(row, links) -> tuple:
+    """(discount, {facet: values}) for an indexed row and its _load_links() entry."""
+    return float(row.discount_amount or 0.0), {
+        "category": (row.category_id,),
+        "brand": (row.brand,) if row.brand else (),
+        "currency": tuple(links.get("currency", ())),
+        "country": tuple(links.get("country", ())),
+    }
+
+
+def _load_links(db: Session, coupon_ids=None) -> Dict[UUID, Dict[str, List]]:
+    """coupon id -> {"country": country ids, "currency": coupon_prices currencies}"""
+    links: Dict[UUID, Dict[str, List]] = {}
+    for facet, coupon_col, value_col in (
+        ("country", coupon_countries.c.coupon_id, coupon_countries.c.country_id),
+        ("currency", CouponPrice.coupon_id, CouponPrice.currency),
+    ):
+        query = db.query(coupon_col, value_col)
+        if coupon_ids is not None:
+            query = query.filter(coupon_col.in_(coupon_ids))
+        for coupon_id, value in query:
+            links.setdefault(coupon_id, {}).setdefault(facet, []).append(value)
+    return links
+
+
+def _bitset(slots: Iterable[int], size: int) -> int:
+    """Bitset of slots, built in a bytearray (OR-ing into a big int per slot is quadratic)."""
+    bitmap = bytearray((size + 7) // 8)
+    for slot in slots:
+        bitmap[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _top_slots(mask: int, skip: int, limit: int, chunk: int = 4096) -> List[int]:
+    """Highest set bits of mask, after skipping `skip` of them; scans down chunk bits at a time."""
+    slots = []
+    hi = mask.bit_length()
+    while hi > 0 and len(slots) < limit:
+        lo = max(hi - chunk, 0)
+        part = (mask >> lo) & ((1 << (hi - lo)) - 1)
+        hi = lo
+        if skip:
+            count = part.bit_count()
+            if count <= skip:
+                skip -= count
+                continue
+        bits = bin(part)
+        top = lo + len(bits) - 3  # slot of bits[2]
+        pos = bits.find("1", 2)
+        while pos != -1 and len(slots) < limit:
+            if skip:
+                skip -= 1
+            else:
+                slots.append(top - pos + 2)
+            pos = bits.find("1", pos + 1)
+    return slots
+
+
+class CouponCatalogIndex:
+    """Bitset index of coupon listing attributes. Thread-safe; one per worker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()          # guards the structures below; never held across a query
+        self._refresh_lock = threading.Lock()  # one thread queries the database for a refresh at a time
+        self._dirty: Dict[UUID, int] = {}      # coupon id -> mark sequence
+        self._marks = 0
+        self._epoch = None
+        self._built_at = 0.0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: List[UUID] = []          # slot -> coupon id
+        self._keys: List[tuple] = []        # slot -> (created_at, id), ascending
+        self._slots: Dict[UUID, int] = {}   # coupon id -> slot
+        self._rows: Dict[int, tuple] = {}   # slot -> (discount, {facet: values}) currently indexed
+        # Flag bitsets mirror SQL's "col == True" / "col == False" (NULLs match neither)
+        self._live = 0
+        self._active = 0
+        self._featured = 0
+        self._unfeatured = 0
+        self._unpackaged = 0
+        self._facets: Dict[str, Dict] = {facet: {} for facet in FACETS}  # facet -> value -> bitset
+        self._by_discount: List[tuple] = []  # sorted (discount, slot)
+        self._discount_masks: Dict[float, int] = {}
+
+    # ── Maintenance ──────────────────────────────────────────────
+
+    def mark_dirty(self, coupon_ids: Iterable) -> None:
+        with self._lock:
+            self._marks += 1
+            for cid in coupon_ids:
+                self._dirty[UUID(str(cid))] = self._marks
+
+    def invalidate(self) -> None:
+        """Force a full rebuild before the next query."""
+        with self._lock:
+            self._epoch = None
+
+    def _stale(self, epoch) -> bool:
+        return epoch != self._epoch or time.monotonic() - self._built_at > CATALOG_INDEX_MAX_AGE
+
+    def _forget(self, dirty: Dict[UUID, int]) -> None:
+        """Drop dirty marks that were applied (caller holds the lock); ids marked again since stay dirty."""
+        for coupon_id, mark in dirty.items():
+            if self._dirty.get(coupon_id) == mark:
+                del self._dirty[coupon_id]
+
+    def _fresh(self, db: Session) -> bool:
+        """Bring the index up to date. False if it can't be trusted right now (use SQL)."""
+        epoch = local_tier_epoch()
+        if CATALOG_INDEX_MAX_AGE <= 0 or epoch is None:
+            return False
+        with self._lock:
+            if not self._stale(epoch) and not self._dirty:
+                return True
+        if not self._refresh_lock.acquire(blocking=False):
+            return False  # another thread is refreshing
+        try:
+            with self._lock:
+                stale = self._stale(epoch)
+                dirty = dict(self._dirty)
+            if not stale and dirty:
+                rows = db.query(*_INDEXED_COLUMNS).filter(Coupon.id.in_(dirty)).all()
+                links = _load_links(db, list(dirty))
+                with self._lock:
+                    stale = not self._apply(dirty, rows, links)
+                    if not stale:
+                        self._forget(dirty)
+            if stale:
+                self._rebuild(db)
+                with self._lock:
+                    self._epoch = epoch
+                    self._forget(dirty)
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def _apply(self, dirty: Dict[UUID, int], rows, links) -> bool:
+        """Patch re-read rows in (caller holds the lock). False if only a rebuild keeps slot order."""
+        missing = set(dirty)
+        for row in rows:
+            if not self._patch(row, links.get(row.id, {})):
+                return False
+            missing.discard(row.id)
+        for coupon_id in missing:
+            self._clear(self._slots.get(coupon_id))
+        self._discount_masks.clear()
+        return True
+
+    def _rebuild(self, db: Session) -> None:
+        """Build every structure from the database into a new index, then swap it in under the lock."""
+        started = time.perf_counter()
+        rows = db.query(*_INDEXED_COLUMNS).order_by(Coupon.created_at.asc(), Coupon.id.asc()).all()
+        links = _load_links(db)
+        built = CouponCatalogIndex()
+        built._fill(rows, links)
+        with self._lock:
+            for name in _STATE:
+                setattr(self, name, getattr(built, name))
+        logger.info(f"Coupon catalog index rebuilt: {len(rows)} rows in {time.perf_counter() - started:.3f}s")
+
+    def _fill(self, rows, links) -> None:
+        members = {"active": [], "featured": [], "unfeatured": [], "unpackaged": []}
+        facet_members = {facet: {} for facet in FACETS}
+        for slot, row in enumerate(rows):
+            self._ids.append(row.id)
+            self._keys.append(_sort_key(row))
+            self._slots[row.id] = slot
+            discount, values = _row_values(row, links.get(row.id, {}))
+            self._rows[slot] = (discount, values)
+            self._by_discount.append((discount, slot))
+            for facet, facet_values in values.items():
+                for value in facet_values:
+                    facet_members[facet].setdefault(value, []).append(slot)
+            if row.is_active:
+                members["active"].append(slot)
+            if row.is_featured:
+                members["featured"].append(slot)
+            elif row.is_featured is not None:
+                members["unfeatured"].append(slot)
+            if row.is_package_coupon is not None and not row.is_package_coupon:
+                members["unpackaged"].append(slot)
+        size = len(rows)
+        self._live = (1 << size) - 1
+        self._active = _bitset(members["active"], size)
+        self._featured = _bitset(members["featured"], size)
+        self._unfeatured = _bitset(members["unfeatured"], size)
+        self._unpackaged = _bitset(members["unpackaged"], size)
+        self._facets = {
+            facet: {value: _bitset(slots, size) for value, slots in by_value.items()}
+            for facet, by_value in facet_members.items()
+        }
+        self._by_discount.sort()
+        self._built_at = time.monotonic()
+
+    def _append(self, row, links) -> None:
+        slot = len(self._ids)
+        self._ids.append(row.id)
+        self._keys.append(_sort_key(row))
+        self._slots[row.id] = slot
+        self._set(slot, row, links)
+
+    def _patch(self, row, links) -> bool:
+        slot = self._slots.get(row.id)
+        if slot is None:
+            if self._keys and _sort_key(row) < self._keys[-1]:
+                return False
+            self._append(row, links)
+            return True
+        if _sort_key(row) != self._keys[slot]:
+            return False
+        self._clear(slot)
+        self._set(slot, row, links)
+        return True
+
+    def _set(self, slot: int, row, links) -> None:
+        bit = 1 << slot
+        self._live |= bit
+        if row.is_active:
+            self._active |= bit
+        if row.is_featured:
+            self._featured |= bit
+        elif row.is_featured is not None:
+            self._unfeatured |= bit
+        if row.is_package_coupon is not None and not row.is_package_coupon:
+            self._unpackaged |= bit
+        discount, values = _row_values(row, links)
+        for facet, facet_values in values.items():
+            by_value = self._facets[facet]
+            for value in facet_values:
+                by_value[value] = by_value.get(value, 0) | bit
+        bisect.insort(self._by_discount, (discount, slot))
+        self._rows[slot] = (discount, values)
+
+    def _clear(self, slot: Optional[int]) -> None:
+        if slot is None or slot not in self._rows:
+            return
+        keep = ~(1 << slot)
+        self._live &= keep
+        self._active &= keep
+        self._featured &= keep
+        self._unfeatured &= keep
+        self._unpackaged &= keep
+        discount, values = self._rows.pop(slot)
+        for facet, facet_values in values.items():
+            by_value = self._facets[facet]
+            for value in facet_values:
+                by_value[value] &= keep
+        del self._by_discount[bisect.bisect_left(self._by_discount, (discount, slot))]
+
+    # ── Queries ──────────────────────────────────────────────────
+
+    def _discount_at_least(self, minimum: float) -> int:
+        mask = self._discount_masks.get(minimum)
+        if mask is None:
+            start = bisect.bisect_left(self._by_discount, (minimum, -1))
+            mask = _bitset((slot for _, slot in self._by_discount[start:]), len(self._ids))
+            self._discount_masks[minimum] = mask
+        return mask
+
+    def _filter(self, active_only, category_id, is_featured, min_discount, after) -> int:
+        # Package coupons are never listed on their own
+        mask = self._live & self._unpackaged
+        if active_only:
+            mask &= self._active
+        if category_id:
+            mask &= self._facets["category"].get(category_id, 0)
+        if is_featured is not None:
+            mask &= self._featured if is_featured else self._unfeatured
+        if min_discount is not None:
+            mask &= self._discount_at_least(float(min_discount))
+        if after is not None:
+            mask &= (1 << bisect.bisect_left(self._keys, tuple(after))) - 1
+        return mask
+
+    def page(
+        self,
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        active_only: bool = False,
+        category_id: Optional[UUID] = None,
+        is_featured: Optional[bool] = None,
+        min_discount: Optional[float] = None,
+        after: Optional[tuple] = None,
+    ) -> Optional[List[UUID]]:
+        """
+        Ids of one listing page, newest first, with CouponService.get_all()
+        semantics (after is a decoded (created_at, id) cursor). None when the
+        index can't be trusted; query SQL instead.
+        """
+        if not self._fresh(db):
+            return None
+        with self._lock:
+            mask = self._filter(active_only, category_id, is_featured, min_discount, after)
+            return [self._ids[slot] for slot in _top_slots(mask, skip, limit)]
+
+    def counts(
+        self,
+        db: Session,
+        active_only: bool = False,
+        category_id: Optional[UUID] = None,
+        is_featured: Optional[bool] = None,
+        min_discount: Optional[float] = None,
+    ) -> Optional[dict]:
+        """
+        Matches for a filter set: total, featured, per-value counts for each
+        of FACETS and per discount bucket (DISCOUNT_BUCKETS). None as for page().
+        """
+        if not self._fresh(db):
+            return None
+        with self._lock:
+            mask = self._filter(active_only, category_id, is_featured, min_discount, None)
+            result = {"total": mask.bit_count(), "featured": (mask & self._featured).bit_count()}
+            for facet, by_value in self._facets.items():
+                counts = {}
+                for value, members in by_value.items():
+                    count = (mask & members).bit_count()
+                    if count:
+                        counts[value] = count
+                result[facet] = counts
+            buckets = {}
+            for label, low, high in DISCOUNT_BUCKETS:
+                members = self._discount_at_least(low)
+                if high is not None:
+                    members &= ~self._discount_at_least(high)
+                count = (mask & members).bit_count()
+                if count:
+                    buckets[label] = count
+            result["discount"] = buckets
+            return result
+
+
+coupon_index = CouponCatalogIndex()
+
+
+def publish_coupon_changes(coupon_ids: Iterable) -> None:
+    """Call after committing changes to indexed coupon columns (or new coupons)."""
+    ids = [str(cid) for cid in coupon_ids]
+    if not ids:
+        return
+    coupon_index.mark_dirty(ids)
+    publish(CATALOG_CHANNEL, json.dumps(ids))
+
+
+def _on_catalog_message(payload) -> None:
+    try:
+        coupon_index.mark_dirty(json.loads(payload))
+    except (TypeError, ValueError):
+        coupon_index.invalidate()
+
+
+subscribe_channel(CATALOG_CHANNEL, _on_catalog_message)
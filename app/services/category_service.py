@@ -7,7 +7,8 @@ from datetime import datetime
 from app.models.category import Category
 from app.models.coupon import Coupon
 from app.schemas.category import CategoryCreate, CategoryUpdate
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_MEDIUM
+from app.database import in_new_session
+from app.cache import get_cache, set_cache, get_or_compute, ns_cache_key, invalidate_namespace, NS_CATEGORIES, CACHE_TTL_MEDIUM, CACHE_STALE_TTL
 
 
 class CategoryService:
@@ -27,46 +28,42 @@ class CategoryService:
         db.refresh(db_category)
         
         # Invalidate category list cache
-        invalidate_cache("categories:list:*")
-        invalidate_cache("categories:with-counts:*")
+        invalidate_namespace(NS_CATEGORIES)
         
         return db_category
 
     @staticmethod
-    def get_all(db: Session, active_only: bool = True) -> List[Category]:
-        """Get all categories (cached)"""
-        cache_k = cache_key("categories", "list", active_only)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        query = db.query(Category)
-        if active_only:
-            query = query.filter(Category.is_active == True)
-        categories = query.order_by(Category.display_order, Category.name).all()
-        
-        # Cache the result
-        cache_data = [
-            {
-                "id": str(c.id),
-                "name": c.name,
-                "slug": c.slug,
-                "description": c.description,
-                "icon": c.icon,
-                "display_order": c.display_order,
-                "is_active": c.is_active,
-                "created_at": str(c.created_at) if c.created_at else None,
-            }
-            for c in categories
-        ]
-        set_cache(cache_k, cache_data, CACHE_TTL_MEDIUM)
-        
-        return categories
+    def get_all(db: Session, active_only: bool = True) -> List[dict]:
+        """Get all categories (cached, stale-while-revalidate)"""
+        def load(session):
+            query = session.query(Category)
+            if active_only:
+                query = query.filter(Category.is_active == True)
+            categories = query.order_by(Category.display_order, Category.name).all()
+            return [
+                {
+                    "id": c.id,
+                    "name": c.name,
+                    "slug": c.slug,
+                    "description": c.description,
+                    "icon": c.icon,
+                    "display_order": c.display_order,
+                    "is_active": c.is_active,
+                    "created_at": c.created_at,
+                }
+                for c in categories
+            ]
+
+        cache_k = ns_cache_key(NS_CATEGORIES, "list", active_only)
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
 
     @staticmethod
     def get_by_id(db: Session, category_id: UUID) -> Optional[Category]:
         """Get a category by its ID (cached)"""
-        cache_k = cache_key("categories", "id", str(category_id))
+        cache_k = ns_cache_key(NS_CATEGORIES, "id", str(category_id))
         cached = get_cache(cache_k)
         if cached is not None:
             # Return cached dict as-is (API will handle serialization)
@@ -75,10 +72,10 @@ class CategoryService:
         category = db.query(Category).filter(Category.id == category_id).first()
         if category:
             cache_data = {
-                "id": str(category.id), "name": category.name, "slug": category.slug,
+                "id": category.id, "name": category.name, "slug": category.slug,
                 "description": category.description, "icon": category.icon,
                 "display_order": category.display_order, "is_active": category.is_active,
-                "created_at": str(category.created_at) if category.created_at else None,
+                "created_at": category.created_at,
             }
             set_cache(cache_k, cache_data, CACHE_TTL_MEDIUM)
         return category
@@ -86,7 +83,7 @@ class CategoryService:
     @staticmethod
     def get_by_slug(db: Session, slug: str) -> Optional[Category]:
         """Get a category by its slug (cached)"""
-        cache_k = cache_key("categories", "slug", slug)
+        cache_k = ns_cache_key(NS_CATEGORIES, "slug", slug)
         cached = get_cache(cache_k)
         if cached is not None:
             return cached
@@ -94,10 +91,10 @@ class CategoryService:
         category = db.query(Category).filter(Category.slug == slug).first()
         if category:
             set_cache(cache_k, {
-                "id": str(category.id), "name": category.name, "slug": category.slug,
+                "id": category.id, "name": category.name, "slug": category.slug,
                 "description": category.description, "icon": category.icon,
                 "display_order": category.display_order, "is_active": category.is_active,
-                "created_at": str(category.created_at) if category.created_at else None,
+                "created_at": category.created_at,
             }, CACHE_TTL_MEDIUM)
         return category
 
@@ -106,42 +103,41 @@ class CategoryService:
         """Get categories with active coupon counts (single query, cached)"""
         from sqlalchemy import func, case
 
-        cache_k = cache_key("categories", "with-counts", active_only)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        # Single query with LEFT JOIN instead of N+1
-        active_coupon_count = func.count(
-            case((Coupon.is_active == True, Coupon.id), else_=None)
-        ).label("coupon_count")
-
-        query = db.query(Category, active_coupon_count).outerjoin(
-            Coupon, Coupon.category_id == Category.id
-        ).group_by(Category.id)
-
-        if active_only:
-            query = query.filter(Category.is_active == True)
-
-        rows = query.order_by(Category.display_order, Category.name).all()
-
-        result = [
-            {
-                "id": cat.id,
-                "name": cat.name,
-                "slug": cat.slug,
-                "description": cat.description,
-                "icon": cat.icon,
-                "display_order": cat.display_order,
-                "is_active": cat.is_active,
-                "created_at": cat.created_at,
-                "coupon_count": count
-            }
-            for cat, count in rows
-        ]
-        
-        set_cache(cache_k, result, CACHE_TTL_MEDIUM)
-        return result
+        cache_k = ns_cache_key(NS_CATEGORIES, "with-counts", active_only)
+
+        def load():
+
+            # Single query with LEFT JOIN instead of N+1
+            active_coupon_count = func.count(
+                case((Coupon.is_active == True, Coupon.id), else_=None)
+            ).label("coupon_count")
+
+            query = db.query(Category, active_coupon_count).outerjoin(
+                Coupon, Coupon.category_id == Category.id
+            ).group_by(Category.id)
+
+            if active_only:
+                query = query.filter(Category.is_active == True)
+
+            rows = query.order_by(Category.display_order, Category.name).all()
+
+            result = [
+                {
+                    "id": cat.id,
+                    "name": cat.name,
+                    "slug": cat.slug,
+                    "description": cat.description,
+                    "icon": cat.icon,
+                    "display_order": cat.display_order,
+                    "is_active": cat.is_active,
+                    "created_at": cat.created_at,
+                    "coupon_count": count
+                }
+                for cat, count in rows
+            ]
+            return result
+
+        return get_or_compute(cache_k, CACHE_TTL_MEDIUM, load)
 
     @staticmethod
     def update(db: Session, category_id: UUID, category_data: CategoryUpdate) -> Optional[Category]:
@@ -158,10 +154,7 @@ class CategoryService:
         db.refresh(db_category)
         
         # Invalidate category caches
-        invalidate_cache("categories:list:*")
-        invalidate_cache("categories:with-counts:*")
-        invalidate_cache(f"categories:id:{category_id}")
-        invalidate_cache(f"categories:slug:*")
+        invalidate_namespace(NS_CATEGORIES)
         
         return db_category
 
@@ -176,8 +169,6 @@ class CategoryService:
         db.commit()
         
         # Invalidate category caches
-        invalidate_cache("categories:list:*")
-        invalidate_cache("categories:with-counts:*")
-        invalidate_cache(f"categories:id:{category_id}")
+        invalidate_namespace(NS_CATEGORIES)
         
         return True
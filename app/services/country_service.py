@@ -4,7 +4,7 @@ from typing import List, Optional
 
 from app.models.country import Country
 from app.schemas.country import CountryCreate, CountryUpdate
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_MEDIUM
+from app.cache import get_cache, set_cache, ns_cache_key, invalidate_namespace, NS_COUNTRIES, NS_REGIONS, CACHE_TTL_MEDIUM
 
 
 class CountryService:
@@ -23,15 +23,14 @@ class CountryService:
         db.refresh(db_country)
         
         # Invalidate country list cache
-        invalidate_cache("countries:list:*")
-        invalidate_cache("regions:list:*")  # Also invalidate regions cache
+        invalidate_namespace(NS_COUNTRIES, NS_REGIONS)  # Also invalidate regions cache
         
         return db_country
 
     @staticmethod
     def get_all(db: Session, region_id: Optional[UUID] = None, active_only: bool = True) -> List[Country]:
         """Get all countries, optionally filtered by region (cached)"""
-        cache_k = cache_key("countries", "list", str(region_id) if region_id else "all", active_only)
+        cache_k = ns_cache_key(NS_COUNTRIES, "list", str(region_id) if region_id else "all", active_only)
         cached = get_cache(cache_k)
         if cached is not None:
             return cached
@@ -95,10 +94,7 @@ class CountryService:
         db.refresh(db_country)
         
         # Invalidate country caches
-        invalidate_cache("countries:list:*")
-        invalidate_cache(f"countries:id:{country_id}")
-        invalidate_cache(f"countries:slug:*")
-        invalidate_cache("regions:list:*")
+        invalidate_namespace(NS_COUNTRIES, NS_REGIONS)
         
         return db_country
 
@@ -113,8 +109,6 @@ class CountryService:
         db.commit()
         
         # Invalidate country caches
-        invalidate_cache("countries:list:*")
-        invalidate_cache(f"countries:id:{country_id}")
-        invalidate_cache("regions:list:*")
+        invalidate_namespace(NS_COUNTRIES, NS_REGIONS)
         
         return True
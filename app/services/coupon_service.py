@@ -1,12 +1,31 @@
-from sqlalchemy import or_, func
+from sqlalchemy import and_
 from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 
+from app.database import in_new_session
+from app.utils.pagination import InvalidCursor, decode_cursor, keyset_after, next_cursor
 from app.models.coupon import Coupon
+from app.models.coupon_price import CouponPrice
+from app.read_models import CouponDTO
+from app.services.search_service import CouponSearch
+from app.services.catalog_index import coupon_index, publish_coupon_changes
 from app.schemas.coupon import CouponCreate, CouponUpdate
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_MEDIUM
+from app.cache import (
+    get_cache, set_cache, delete_cache, cache_key, get_or_compute, get_or_compute_many, ns_cache_key,
+    invalidate_namespace, NS_COUPONS_LIST, CACHE_TTL_MEDIUM, CACHE_STALE_TTL
+)
+
+
+def to_cents(amount) -> int:
+    """Major currency units to integer minor units, rounding half up."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _is_amount(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
 
 
 class CouponService:
@@ -35,12 +54,14 @@ class CouponService:
         )
         db.add(db_coupon)
         db.flush()  # Flush to get the coupon ID
-        
+        CouponService.sync_prices(db, db_coupon)
+
         db.commit()
         db.refresh(db_coupon)  # Refresh to get database-generated fields (created_at, etc.)
         
         # Invalidate coupon list cache
-        invalidate_cache("coupons:list:*")
+        invalidate_namespace(NS_COUPONS_LIST)
+        publish_coupon_changes([db_coupon.id])
         
         return db_coupon
 
@@ -55,132 +76,234 @@ class CouponService:
         search: Optional[str] = None,
         is_featured: Optional[bool] = None,
         min_discount: Optional[float] = None,
+        cursor: Optional[str] = None,
+        currency: str = "USD",
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
+    ) -> List[CouponDTO]:
+        """
+        Get all coupons with optional filtering, newest first (sort="price":
+        cheapest first in currency). Price filters and sorting only list
+        coupons priced in currency. Unsearched, unpriced listings are answered
+        by the in-memory catalog index when it is live (only the page is
+        hydrated), else by SQL with the first page cached
+        stale-while-revalidate. Pass cursor (from list_cursor()) for keyset
+        pagination; skip is the offset-based compatibility mode.
+        Raises InvalidCursor for a malformed cursor or one issued for another sort.
+        """
+        currency = currency.upper()
+        sort = "price" if sort == "price" else None
+        priced = sort is not None or min_price is not None or max_price is not None
+        after = CouponService._decode_cursor(cursor, sort, currency) if cursor else None
+        if not search and not priced:
+            ids = coupon_index.page(db, skip, limit, active_only, category_id, is_featured, min_discount, after)
+            if ids is not None:
+                return CouponService.get_many(db, ids)
+
+        price_args = dict(currency=currency, min_price=min_price, max_price=max_price, sort=sort)
+
+        def load(session):
+            return [
+                CouponDTO.from_orm(c).to_cache()
+                for c in CouponService._load_list(
+                    session, skip, limit, active_only, category_id, search, is_featured, min_discount, **price_args
+                )
+            ]
+
+        # Free-text searches and deep pages have too many variants to cache usefully
+        if skip != 0 or search or after:
+            return [
+                CouponDTO.from_orm(c)
+                for c in CouponService._load_list(
+                    db, skip, limit, active_only, category_id, search, is_featured, min_discount, after, **price_args
+                )
+            ]
+
+        cache_k = ns_cache_key(
+            NS_COUPONS_LIST, "page", active_only, category_id, is_featured, min_discount, limit,
+            *((currency, min_price, max_price, sort) if priced else ()),
+        )
+        rows = get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
+        return [CouponDTO.from_cache(row) for row in rows]
+
+    @staticmethod
+    def _load_list(
+        db: Session,
+        skip: int,
+        limit: int,
+        active_only: bool,
+        category_id: Optional[UUID],
+        search: Optional[str],
+        is_featured: Optional[bool],
+        min_discount: Optional[float],
+        after: Optional[tuple] = None,
+        currency: str = "USD",
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        sort: Optional[str] = None,
     ) -> List[Coupon]:
-        """Get all coupons with optional filtering"""
         # Query database with eager loading for relationships (avoid N+1)
         query = db.query(Coupon).options(
             joinedload(Coupon.category)
         )
-        
-        # Apply filters
+        query = CouponService.apply_filters(query, active_only, category_id, is_featured, min_discount)
+
+        # Price filters and the price sort (price_cents ASC) range-scan coupon_prices' (currency, price_cents) index
+        if sort == "price" or min_price is not None or max_price is not None:
+            query = query.join(CouponPrice, and_(CouponPrice.coupon_id == Coupon.id, CouponPrice.currency == currency))
+            if min_price is not None:
+                query = query.filter(CouponPrice.price_cents >= to_cents(min_price))
+            if max_price is not None:
+                query = query.filter(CouponPrice.price_cents <= to_cents(max_price))
+
+        # Full-text search over title, brand, code and description, best match first
+        if search:
+            query = CouponSearch.apply(query, search, ranked=sort is None)
+            if sort is None:
+                if after is not None:
+                    raise InvalidCursor("Ranked search results are paged with skip, not a cursor")
+                return query.offset(skip).limit(limit).all()
+
+        columns, directions = CouponService._sort_columns(sort)
+        query = keyset_after(query, columns, after, directions)
+        if after is None:
+            query = query.offset(skip)
+        return query.limit(limit).all()
+
+    @staticmethod
+    def apply_filters(
+        query,
+        active_only: bool,
+        category_id: Optional[UUID],
+        is_featured: Optional[bool],
+        min_discount: Optional[float],
+    ):
+        """Listing filters shared by get_all() and the facet counts."""
         if active_only:
             query = query.filter(Coupon.is_active == True)
-        
+
         # Exclude package coupons from regular listings
         query = query.filter(Coupon.is_package_coupon == False)
-        
+
         if category_id:
             query = query.filter(Coupon.category_id == category_id)
-        
+
         if is_featured is not None:
             query = query.filter(Coupon.is_featured == is_featured)
 
         if min_discount is not None:
             query = query.filter(Coupon.discount_amount >= min_discount)
-        
-        # Search by title or brand (case-insensitive)
+        return query
+
+    # Keyset sort key of coupon listings: (created_at, id), newest first
+    CURSOR_TYPES = (datetime.fromisoformat, UUID)
+    # sort="price": ("price", currency, price_cents, created_at, id), cheapest first
+    PRICE_CURSOR_TYPES = (str, str, int, datetime.fromisoformat, UUID)
+
+    @staticmethod
+    def _sort_columns(sort: Optional[str]) -> tuple:
+        """(columns, directions) for keyset_after()."""
+        columns, directions = [Coupon.created_at, Coupon.id], ["desc", "desc"]
+        if sort == "price":
+            # Cheapest first, newest first among equal prices
+            columns.insert(0, CouponPrice.price_cents)
+            directions.insert(0, "asc")
+        return columns, directions
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort: Optional[str], currency: str) -> tuple:
+        if sort != "price":
+            return decode_cursor(cursor, CouponService.CURSOR_TYPES)
+        tag, cursor_currency, price_cents, created_at, coupon_id = decode_cursor(
+            cursor, CouponService.PRICE_CURSOR_TYPES
+        )
+        if tag != "price" or cursor_currency != currency:
+            raise InvalidCursor("Cursor was issued for a different sort")
+        return (price_cents, created_at, coupon_id)
+
+    @staticmethod
+    def list_cursor(
+        coupons: List[CouponDTO],
+        limit: int,
+        search: Optional[str] = None,
+        sort: Optional[str] = None,
+        currency: str = "USD",
+    ) -> Optional[str]:
+        """Cursor for the page after a get_all() result, or None on the last page (or a ranked search)."""
+        if sort == "price":
+            currency = currency.upper()
+            cents = next((row["price_cents"] for row in CouponService.price_rows(coupons[-1].pricing)
+                          if row["currency"] == currency), None) if coupons else None
+            if cents is None:
+                # No price row for the last DTO (e.g. its cached pricing changed since the query)
+                return None
+            return next_cursor(coupons, limit, lambda c: ("price", currency, cents, c.created_at, c.id))
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                or_(
-                    func.lower(Coupon.title).like(func.lower(search_term)),
-                    func.lower(Coupon.brand).like(func.lower(search_term)),
-                    func.lower(Coupon.code).like(func.lower(search_term))
-                )
-            )
-        
-        coupons = query.offset(skip).limit(limit).all()
-        
-        return coupons
+            return None
+        return next_cursor(coupons, limit, lambda c: (c.created_at, c.id))
 
     @staticmethod
-    def get_by_id(db: Session, coupon_id: UUID) -> Optional[Coupon]:
-        """Get a coupon by its ID (cached)"""
-        # Helper for sanitization
-        def sanitize(val):
-            if isinstance(val, bytes):
-                try:
-                    return val.decode('utf-8')
-                except UnicodeDecodeError:
-                    return None
-            return val
-
-        from sqlalchemy.orm import joinedload
-        
-        cache_k = cache_key("coupons", "id", str(coupon_id))
-        cached = get_cache(cache_k)
-        if cached is not None:
-            # Reconstruct object
-            c_obj = Coupon(**{k: v for k, v in cached.items() if k not in ['category', 'pricing']})
-            c_obj.pricing = cached.get('pricing')
-            
-            if cached.get('category'):
-                from app.models.category import Category
-                c_obj.category = Category(**cached['category'])
-            
-            return c_obj
-        
-        coupon = db.query(Coupon).options(
-            joinedload(Coupon.category)
-        ).filter(Coupon.id == coupon_id).first()
-        
-        if coupon:
-            set_cache(cache_k, {
-                "id": str(coupon.id), 
-                "code": sanitize(coupon.code), 
-                "redeem_code": sanitize(coupon.redeem_code),
-                "brand": sanitize(coupon.brand), 
-                "title": sanitize(coupon.title), 
-                "description": sanitize(coupon.description),
-                "discount_type": sanitize(coupon.discount_type), 
-                "discount_amount": coupon.discount_amount,
-                "max_uses": coupon.max_uses,
-                "current_uses": coupon.current_uses, 
-                "is_active": coupon.is_active,
-                "stock": coupon.stock, 
-                "is_featured": coupon.is_featured,
-                "created_at": str(coupon.created_at) if coupon.created_at else None,
-                "expiration_date": str(coupon.expiration_date) if coupon.expiration_date else None,
-                "category_id": str(coupon.category_id) if coupon.category_id else None,
-                "category": {"id": str(coupon.category.id), "name": sanitize(coupon.category.name), "slug": sanitize(coupon.category.slug)} if coupon.category else None,
-                "picture_url": sanitize(coupon.picture_url),
-                "pricing": coupon.pricing,
-            }, CACHE_TTL_MEDIUM)
-            
-        return coupon
+    def entity_key(coupon_id) -> str:
+        """Cache key of a coupon's CouponDTO (bump "dto" if CouponDTO's fields change)."""
+        return cache_key("coupons", "dto", str(coupon_id))
 
     @staticmethod
-    def get_by_code(db: Session, code: str) -> Optional[Coupon]:
-        """Get a coupon by its code (cached)"""
-        # Helper for sanitization
-        def sanitize(val):
-            if isinstance(val, bytes):
-                try:
-                    return val.decode('utf-8')
-                except UnicodeDecodeError:
-                    return None
-            return val
-
-        upper_code = code.upper()
-        cache_k = cache_key("coupons", "code", upper_code)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            c_obj = Coupon(**{k: v for k, v in cached.items() if k not in ['pricing']})
-            c_obj.pricing = cached.get('pricing')
-            return c_obj
-        
-        coupon = db.query(Coupon).filter(Coupon.code == upper_code).first()
-        if coupon:
-            set_cache(cache_k, {
-                "id": str(coupon.id), 
-                "code": sanitize(coupon.code), 
-                "title": sanitize(coupon.title), 
-                "picture_url": sanitize(coupon.picture_url),
-                "pricing": coupon.pricing,
-                "discount_amount": coupon.discount_amount
-            }, CACHE_TTL_MEDIUM)
-            
-        return coupon
+    def get_by_id(db: Session, coupon_id: UUID) -> Optional[CouponDTO]:
+        """Get a coupon by its ID (cached; shares get_many()'s entries, with single-flight fills)"""
+        def load():
+            coupon = db.query(Coupon).options(
+                joinedload(Coupon.category)
+            ).filter(Coupon.id == coupon_id).first()
+            return CouponDTO.from_orm(coupon).to_cache() if coupon else None
+
+        cached = get_or_compute(CouponService.entity_key(coupon_id), CACHE_TTL_MEDIUM, load)
+        return CouponDTO.from_cache(cached) if cached is not None else None
+
+    @staticmethod
+    def get_many(db: Session, coupon_ids) -> List[CouponDTO]:
+        """
+        Coupons for ids (UUIDs or id strings), in the given order: one MGET
+        for the cached ones and one IN query for all misses. Unknown and
+        malformed ids are absent from the result.
+        """
+        wanted = []
+        for coupon_id in coupon_ids:
+            try:
+                wanted.append(coupon_id if isinstance(coupon_id, UUID) else UUID(str(coupon_id)))
+            except ValueError:
+                continue
+        if not wanted:
+            return []
+
+        def load(missing):
+            coupons = db.query(Coupon).options(
+                joinedload(Coupon.category)
+            ).filter(Coupon.id.in_(missing)).all()
+            return {c.id: CouponDTO.from_orm(c).to_cache() for c in coupons}
+
+        found = get_or_compute_many(
+            {cid: CouponService.entity_key(cid) for cid in dict.fromkeys(wanted)}, CACHE_TTL_MEDIUM, load
+        )
+        hydrated = {cid: CouponDTO.from_cache(values) for cid, values in found.items()}
+        return [hydrated[cid] for cid in wanted if cid in hydrated]
+
+    @staticmethod
+    def get_by_code(db: Session, code: str) -> Optional[CouponDTO]:
+        """Get a coupon by its code (cached as code -> id, then hydrated like get_by_id)"""
+        cache_k = cache_key("coupons", "code", code.upper())
+        cached_id = get_cache(cache_k)
+        if cached_id is not None:
+            return CouponService.get_by_id(db, UUID(cached_id))
+        coupon_id = db.query(Coupon.id).filter(Coupon.code == code.upper()).scalar()
+        if coupon_id is None:
+            return None
+        # Stored as text so every cache codec round-trips it
+        set_cache(cache_k, str(coupon_id), CACHE_TTL_MEDIUM)
+        return CouponService.get_by_id(db, coupon_id)
 
     @staticmethod
     def update(db: Session, coupon_id: UUID, coupon_data: CouponUpdate) -> Optional[Coupon]:
@@ -194,15 +317,21 @@ class CouponService:
         if "code" in update_data:
             update_data["code"] = update_data["code"].upper()
         
+        old_code = db_coupon.code
         for field, value in update_data.items():
             setattr(db_coupon, field, value)
-        
+        if "pricing" in update_data:
+            CouponService.sync_prices(db, db_coupon)
+
         db.commit()
         db.refresh(db_coupon)  # Refresh to get updated relationships
         
         # Invalidate coupon caches
-        invalidate_cache("coupons:list:*")
-        invalidate_cache(f"coupons:id:{coupon_id}")
+        CouponService.invalidate_cached(coupon_id, old_code, db_coupon.code)
+        publish_coupon_changes([coupon_id])
+        if "stock" in update_data:
+            from app.services.stock_service import StockService
+            StockService.seed({coupon_id: db_coupon.stock})
         
         return db_coupon
 
@@ -220,14 +349,68 @@ class CouponService:
         db.commit()
         
         # Invalidate coupon caches
-        invalidate_cache("coupons:list:*")
-        invalidate_cache(f"coupons:id:{coupon_id}")
+        CouponService.invalidate_cached(coupon_id, db_coupon.code)
+        publish_coupon_changes([coupon_id])
         
         return True
 
+    @staticmethod
+    def price_rows(pricing) -> List[dict]:
+        """
+        coupon_prices rows (less coupon_id) for a pricing JSON value, read the
+        way get_price() reads it. Keys that aren't upper-case 3-letter currency
+        codes (get_price() never finds "usd") and entries without a numeric
+        price have no row.
+        """
+        rows = []
+        if not isinstance(pricing, dict):
+            return rows
+        for currency, values in pricing.items():
+            if isinstance(values, dict):
+                price, discount = values.get("price"), values.get("discount_amount")
+            else:
+                price, discount = values, None
+            if len(currency) != 3 or currency != currency.upper() or not _is_amount(price):
+                continue
+            rows.append({
+                "currency": currency,
+                "price_cents": to_cents(price),
+                "discount_cents": to_cents(discount) if _is_amount(discount) else None,
+            })
+        return rows
+
+    @staticmethod
+    def sync_prices(db: Session, coupon: Coupon) -> None:
+        """Rewrite a coupon's coupon_prices rows from its pricing JSON (caller commits)."""
+        db.query(CouponPrice).filter(CouponPrice.coupon_id == coupon.id).delete(synchronize_session=False)
+        db.add_all(CouponPrice(coupon_id=coupon.id, **row) for row in CouponService.price_rows(coupon.pricing))
+
+    @staticmethod
+    def get_price_cents(db: Session, coupon_ids, currency: str = "USD") -> Dict[UUID, int]:
+        """
+        Prices in minor units for many coupons in one primary-key lookup, with
+        get_price()'s fallback to USD. Coupons priced in neither are absent.
+        """
+        ids = list(set(coupon_ids))
+        if not ids:
+            return {}
+        currency = currency.upper()
+        rows = db.query(CouponPrice.coupon_id, CouponPrice.currency, CouponPrice.price_cents).filter(
+            CouponPrice.coupon_id.in_(ids), CouponPrice.currency.in_({currency, "USD"})
+        ).all()
+        prices = {}
+        for coupon_id, row_currency, cents in rows:
+            if row_currency == currency or coupon_id not in prices:
+                prices[coupon_id] = cents
+        return prices
+
     @staticmethod
     def get_price(coupon: Coupon, currency: str = "USD") -> float:
-        """Get the price of a coupon for a specific currency from pricing JSON"""
+        """
+        Get the price of a coupon for a specific currency from pricing JSON.
+        For totals over several coupons use get_price_cents(), which reads the
+        normalized coupon_prices table in one query.
+        """
         if not coupon or not coupon.pricing:
             return 0.0
         
@@ -299,7 +482,14 @@ class CouponService:
         db.commit()
         
         # Invalidate cache
-        invalidate_cache(f"coupons:id:{coupon_id}")
-        invalidate_cache("coupons:list:*")
+        CouponService.invalidate_cached(coupon_id)
         
         return True
+
+    @staticmethod
+    def invalidate_cached(coupon_id: UUID, *codes: Optional[str]) -> None:
+        """Drop a coupon's entity cache entries and bump the list namespace."""
+        keys = [CouponService.entity_key(coupon_id)]
+        keys += [cache_key("coupons", "code", code.upper()) for code in set(codes) if code]
+        delete_cache(*keys)
+        invalidate_namespace(NS_COUPONS_LIST)
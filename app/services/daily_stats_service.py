@@ -0,0 +1,255 @@
+"""
+Incremental maintenance of the daily analytics rollups (app.models.daily_stats).
+
+Views are rolled up inside the view buffer's flush transaction, before the
+raw rows are inserted: one upsert per touched (coupon, day) and (category,
+day). A viewer (user_id, else session_id) counts towards unique_viewers the
+first time they show up for that coupon on that day. That is decided by the
+database, not by reading coupon_views: each flush inserts its viewers into
+coupon_daily_viewers with ON CONFLICT DO NOTHING and counts only the rows it
+inserted, so workers flushing the same viewer concurrently count them once.
+Paid orders add their coupon lines in the transaction that marks them paid.
+backfill() rebuilds a range from coupon_views and paid orders.
+"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from app.models.coupon import Coupon
+from app.models.coupon_view import CouponView
+from app.models.daily_stats import CouponDailyStats, CategoryDailyStats, CouponDailyViewer
+from app.models.order import Order, OrderItem
+
+COUPON_COUNTERS = ("views", "unique_viewers", "sold", "revenue")
+CATEGORY_COUNTERS = ("views", "sold", "revenue")
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _viewer(user_id, session_id) -> Optional[str]:
+    if user_id is not None:
+        return f"user:{user_id}"
+    if session_id:
+        return f"session:{session_id}"
+    return None
+
+
+def _insert(db: Session):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+_viewers_pruned_on: Optional[date] = None  # this worker prunes coupon_daily_viewers once a day
+
+
+class DailyStatsService:
+
+    # Days of coupon_daily_viewers kept: today, plus yesterday for late flushes
+    VIEWER_RETENTION_DAYS = 2
+
+    @staticmethod
+    def _bump(db: Session, model, key: Tuple[str, str], counters: Tuple[str, ...], increments: Dict[tuple, dict]) -> None:
+        """Add increments to rollup rows with one INSERT ... ON CONFLICT DO UPDATE."""
+        if not increments:
+            return
+        table = model.__table__
+        stmt = _insert(db)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+        )
+        # Key order keeps concurrent flushes from deadlocking on the same rows
+        rows = [
+            {key[0]: k[0], key[1]: k[1], **{name: values.get(name, 0) for name in counters}}
+            for k, values in sorted(increments.items(), key=lambda item: (str(item[0][0]), item[0][1]))
+        ]
+        db.execute(stmt, rows)
+
+    @staticmethod
+    def _categories(db: Session, coupon_ids: Iterable) -> dict:
+        ids = list(set(coupon_ids))
+        if not ids:
+            return {}
+        return dict(db.query(Coupon.id, Coupon.category_id).filter(Coupon.id.in_(ids)).all())
+
+    @staticmethod
+    def _claim_viewers(db: Session, viewers: set) -> Counter:
+        """
+        Insert (coupon_id, day, viewer) triples into coupon_daily_viewers,
+        skipping those already there. Returns (coupon_id, day) -> newly inserted.
+        """
+        if not viewers:
+            return Counter()
+        stmt = _insert(db)(CouponDailyViewer).on_conflict_do_nothing().returning(
+            CouponDailyViewer.coupon_id, CouponDailyViewer.day
+        )
+        rows = [
+            {"coupon_id": coupon_id, "day": day, "viewer": viewer}
+            for coupon_id, day, viewer in sorted(viewers, key=lambda v: (str(v[0]), v[1], v[2]))
+        ]
+        return Counter((row.coupon_id, row.day) for row in db.execute(stmt, rows))
+
+    @staticmethod
+    def _prune_viewers(db: Session) -> None:
+        global _viewers_pruned_on
+        today = datetime.utcnow().date()
+        if _viewers_pruned_on == today:
+            return
+        db.execute(delete(CouponDailyViewer).where(
+            CouponDailyViewer.day <= today - timedelta(days=DailyStatsService.VIEWER_RETENTION_DAYS)
+        ))
+        _viewers_pruned_on = today
+
+    @staticmethod
+    def record_views(db: Session, rows: List[dict]) -> None:
+        """
+        Roll up a batch of coupon_views rows that are about to be inserted in
+        the same transaction. The caller commits.
+        """
+        if not rows:
+            return
+        views = defaultdict(int)
+        viewers = set()
+        for row in rows:
+            k = (row["coupon_id"], row["viewed_at"].date())
+            views[k] += 1
+            viewer = _viewer(row.get("user_id"), row.get("session_id"))
+            if viewer is not None:
+                viewers.add((*k, viewer))
+
+        DailyStatsService._prune_viewers(db)
+        new_viewers = DailyStatsService._claim_viewers(db, viewers)
+        coupon_rows = {k: {"views": count, "unique_viewers": new_viewers[k]} for k, count in views.items()}
+
+        category_of = DailyStatsService._categories(db, [coupon_id for coupon_id, _ in views])
+        category_rows = defaultdict(lambda: {"views": 0})
+        for (coupon_id, day), count in views.items():
+            category_id = category_of.get(coupon_id)
+            if category_id is not None:
+                category_rows[(category_id, day)]["views"] += count
+
+        DailyStatsService._bump(db, CouponDailyStats, ("coupon_id", "day"), COUPON_COUNTERS, coupon_rows)
+        DailyStatsService._bump(db, CategoryDailyStats, ("category_id", "day"), CATEGORY_COUNTERS, category_rows)
+
+    @staticmethod
+    def record_order(db: Session, order: Order) -> None:
+        """
+        Add a newly paid order's coupon lines to the rollup of the day it was
+        placed on. Call in the transaction that sets the order to paid.
+        """
+        db.flush()  # sessions don't autoflush; the order's items may still be pending
+        lines = db.query(
+            OrderItem.coupon_id,
+            Coupon.category_id,
+            func.count(OrderItem.id).label("sold"),
+            func.coalesce(func.sum(OrderItem.price), 0.0).label("revenue"),
+        ).join(Coupon, Coupon.id == OrderItem.coupon_id).filter(
+            OrderItem.order_id == order.id
+        ).group_by(OrderItem.coupon_id, Coupon.category_id).all()
+        if not lines:
+            return
+
+        day = (order.created_at or datetime.utcnow()).date()
+        coupon_rows = {}
+        category_rows = defaultdict(lambda: {"sold": 0, "revenue": 0.0})
+        for line in lines:
+            coupon_rows[(line.coupon_id, day)] = {"sold": line.sold, "revenue": float(line.revenue)}
+            if line.category_id is not None:
+                category_rows[(line.category_id, day)]["sold"] += line.sold
+                category_rows[(line.category_id, day)]["revenue"] += float(line.revenue)
+
+        DailyStatsService._bump(db, CouponDailyStats, ("coupon_id", "day"), COUPON_COUNTERS, coupon_rows)
+        DailyStatsService._bump(db, CategoryDailyStats, ("category_id", "day"), CATEGORY_COUNTERS, category_rows)
+
+    @staticmethod
+    def backfill(db: Session, since: Optional[date] = None) -> dict:
+        """
+        Rebuild the rollups from coupon_views and paid orders, for every day
+        from since (all history when None), in one transaction. The retained
+        days of coupon_daily_viewers are rebuilt with them.
+        """
+        start = datetime.combine(since, datetime.min.time()) if since else None
+        coupon_rows = defaultdict(lambda: dict.fromkeys(COUPON_COUNTERS, 0))
+
+        view_day = func.date(CouponView.viewed_at).label("day")
+        views = db.query(CouponView.coupon_id, view_day, func.count(CouponView.id))
+        users = db.query(CouponView.coupon_id, view_day, func.count(func.distinct(CouponView.user_id))).filter(
+            CouponView.user_id.isnot(None)
+        )
+        sessions = db.query(CouponView.coupon_id, view_day, func.count(func.distinct(CouponView.session_id))).filter(
+            CouponView.user_id.is_(None), CouponView.session_id.isnot(None)
+        )
+        for column, query in (("views", views), ("unique_viewers", users), ("unique_viewers", sessions)):
+            if start:
+                query = query.filter(CouponView.viewed_at >= start)
+            for coupon_id, day, count in query.group_by(CouponView.coupon_id, view_day):
+                coupon_rows[(coupon_id, _as_date(day))][column] += count
+
+        order_day = func.date(Order.created_at).label("day")
+        sales = db.query(
+            OrderItem.coupon_id, order_day, func.count(OrderItem.id), func.coalesce(func.sum(OrderItem.price), 0.0)
+        ).join(Order, Order.id == OrderItem.order_id).filter(
+            Order.status == "paid", OrderItem.coupon_id.isnot(None)
+        )
+        if start:
+            sales = sales.filter(Order.created_at >= start)
+        for coupon_id, day, sold, revenue in sales.group_by(OrderItem.coupon_id, order_day):
+            row = coupon_rows[(coupon_id, _as_date(day))]
+            row["sold"] += sold
+            row["revenue"] += float(revenue)
+
+        category_of = DailyStatsService._categories(db, [coupon_id for coupon_id, _ in coupon_rows])
+        category_rows = defaultdict(lambda: dict.fromkeys(CATEGORY_COUNTERS, 0))
+        for (coupon_id, day), row in coupon_rows.items():
+            category_id = category_of.get(coupon_id)
+            if category_id is not None:
+                for name in CATEGORY_COUNTERS:
+                    category_rows[(category_id, day)][name] += row[name]
+
+        # The viewer ledger only covers the retained days
+        ledger_start = datetime.utcnow().date() - timedelta(days=DailyStatsService.VIEWER_RETENTION_DAYS - 1)
+        ledger_start = max(since, ledger_start) if since else ledger_start
+        ledger = db.query(
+            CouponView.coupon_id, func.date(CouponView.viewed_at), CouponView.user_id, CouponView.session_id
+        ).filter(
+            CouponView.viewed_at >= datetime.combine(ledger_start, datetime.min.time())
+        ).distinct()
+        viewer_rows = set()
+        for coupon_id, day, user_id, session_id in ledger:
+            viewer = _viewer(user_id, session_id)
+            if viewer is not None:
+                viewer_rows.add((coupon_id, _as_date(day), viewer))
+
+        for model in (CouponDailyStats, CategoryDailyStats):
+            stmt = delete(model)
+            if since:
+                stmt = stmt.where(model.day >= since)
+            db.execute(stmt)
+        db.execute(delete(CouponDailyViewer).where(CouponDailyViewer.day >= ledger_start) if since else delete(CouponDailyViewer))
+        if viewer_rows:
+            db.bulk_insert_mappings(CouponDailyViewer, [
+                {"coupon_id": coupon_id, "day": day, "viewer": viewer} for coupon_id, day, viewer in viewer_rows
+            ])
+        if coupon_rows:
+            db.bulk_insert_mappings(CouponDailyStats, [
+                {"coupon_id": coupon_id, "day": day, **row} for (coupon_id, day), row in coupon_rows.items()
+            ])
+        if category_rows:
+            db.bulk_insert_mappings(CategoryDailyStats, [
+                {"category_id": category_id, "day": day, **row} for (category_id, day), row in category_rows.items()
+            ])
+        db.commit()
+        return {"coupon_days": len(coupon_rows), "category_days": len(category_rows)}
@@ -0,0 +1,208 @@
+"""
+Facet counts for the coupon and package listings.
+
+For a filter set (the listing's own query parameters), count the matching rows
+per category, brand, country, discount bucket and currency, so a client can
+render its filter sidebar with one request. The filters a facet is counted
+under are the current ones, including that facet's own (drill-down, not
+multi-select).
+
+Unsearched coupon facets come from the in-memory catalog index when it is
+live. Every other case runs one narrow SQL pass over the filtered rows joined
+to their multi-valued attributes (coupon countries, coupon_prices currencies)
+and aggregates it, deduplicating per row. Results are cached per filter
+signature under generation-versioned keys of every namespace they derive from.
+"""
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.cache import (
+    get_or_compute, ns_cache_key, get_namespace_generation,
+    NS_COUPONS_LIST, NS_PACKAGES, NS_CATEGORIES, NS_COUNTRIES, CACHE_TTL_MEDIUM, CACHE_STALE_TTL,
+)
+from app.database import in_new_session
+from app.models.category import Category
+from app.models.country import Country
+from app.models.coupon import Coupon, coupon_countries
+from app.models.coupon_price import CouponPrice
+from app.models.package import Package
+from app.models.package_coupon import PackageCoupon
+from app.services.catalog_index import coupon_index, DISCOUNT_BUCKETS, FACETS
+from app.services.coupon_service import CouponService
+from app.services.package_service import PackageService
+from app.services.search_service import search_terms, CouponSearch
+
+
+def _bucket(discount: Optional[float]) -> Optional[str]:
+    if discount is None:
+        return None
+    for label, low, high in DISCOUNT_BUCKETS:
+        if discount >= low and (high is None or discount < high):
+            return label
+    return None
+
+
+def _ns_tag(*namespaces: str) -> str:
+    """Generations of the namespaces a cached result also derives from."""
+    return ".".join(f"g{get_namespace_generation(ns)}" for ns in namespaces)
+
+
+class _Tally:
+    """Per-facet counters that count each row once per value."""
+
+    def __init__(self):
+        self.rows = set()
+        self.counts: Dict[str, Dict] = {facet: {} for facet in FACETS}
+        self.counts["discount"] = {}
+        self.seen = set()
+
+    def add(self, row_id, facet: str, values: Iterable) -> None:
+        self.rows.add(row_id)
+        counts = self.counts[facet]
+        for value in values:
+            if value is None or (row_id, facet, value) in self.seen:
+                continue
+            self.seen.add((row_id, facet, value))
+            counts[value] = counts.get(value, 0) + 1
+
+
+class FacetService:
+
+    @staticmethod
+    def coupon_facets(
+        db: Session,
+        active_only: bool = False,
+        category_id: Optional[UUID] = None,
+        search: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        min_discount: Optional[float] = None,
+    ) -> dict:
+        """Facet counts for the coupons a get_all() with these filters lists."""
+        terms = " ".join(search_terms(search)) if search else None
+
+        def load(session):
+            counts = None
+            if not terms:
+                counts = coupon_index.counts(session, active_only, category_id, is_featured, min_discount)
+            if counts is None:
+                counts = FacetService._count_coupons(
+                    session, active_only, category_id, search, is_featured, min_discount
+                )
+            return FacetService._resolve(session, counts)
+
+        cache_k = ns_cache_key(
+            NS_COUPONS_LIST, "facets", _ns_tag(NS_CATEGORIES, NS_COUNTRIES),
+            active_only, category_id, is_featured, min_discount, terms,
+        )
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
+
+    @staticmethod
+    def _count_coupons(db, active_only, category_id, search, is_featured, min_discount) -> dict:
+        query = (
+            db.query(
+                Coupon.id, Coupon.category_id, Coupon.brand, Coupon.discount_amount,
+                CouponPrice.currency, Coupon.is_featured, coupon_countries.c.country_id,
+            )
+            .outerjoin(coupon_countries, coupon_countries.c.coupon_id == Coupon.id)
+            .outerjoin(CouponPrice, CouponPrice.coupon_id == Coupon.id)
+        )
+        query = CouponService.apply_filters(query, active_only, category_id, is_featured, min_discount)
+        if search:
+            query = CouponSearch.apply(query, search, ranked=False)
+
+        tally, featured = _Tally(), set()
+        for row in query:
+            tally.add(row.id, "category", (row.category_id,))
+            tally.add(row.id, "brand", (row.brand or None,))
+            tally.add(row.id, "currency", (row.currency,))
+            tally.add(row.id, "country", (row.country_id,))
+            tally.add(row.id, "discount", (_bucket(float(row.discount_amount or 0.0)),))
+            if row.is_featured:
+                featured.add(row.id)
+        return {"total": len(tally.rows), "featured": len(featured), **tally.counts}
+
+    @staticmethod
+    def package_facets(
+        db: Session,
+        category_id: Optional[UUID] = None,
+        is_active: Optional[bool] = None,
+        is_featured: Optional[bool] = None,
+        country: Optional[str] = None,
+        brands: Optional[List[str]] = None,
+    ) -> dict:
+        """
+        Facet counts for the packages a get_all() with these filters lists.
+        A package is available in the currencies its coupons are priced in;
+        its country is the package's own country field.
+        """
+        def load(session):
+            query = (
+                session.query(
+                    Package.id, Package.category_id, Package.brand, Package.discount,
+                    Package.country, Package.is_featured, CouponPrice.currency,
+                )
+                .outerjoin(PackageCoupon, PackageCoupon.package_id == Package.id)
+                .outerjoin(CouponPrice, CouponPrice.coupon_id == PackageCoupon.coupon_id)
+            )
+            query = PackageService.apply_filters(query, category_id, is_active, is_featured, None, country, brands)
+
+            tally, featured = _Tally(), set()
+            for row in query:
+                tally.add(row.id, "category", (row.category_id,))
+                tally.add(row.id, "brand", (row.brand or None,))
+                tally.add(row.id, "currency", (row.currency,))
+                tally.add(row.id, "country", (row.country or None,))
+                tally.add(row.id, "discount", (_bucket(row.discount),))
+                if row.is_featured:
+                    featured.add(row.id)
+            counts = {"total": len(tally.rows), "featured": len(featured), **tally.counts}
+            return FacetService._resolve(session, counts, country_ids=False)
+
+        brands_key = ",".join(sorted(brands)) if brands else None
+        cache_k = ns_cache_key(
+            NS_PACKAGES, "facets", _ns_tag(NS_COUPONS_LIST, NS_CATEGORIES),
+            category_id, is_active, is_featured, country, brands_key,
+        )
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
+
+    @staticmethod
+    def _resolve(db: Session, counts: dict, country_ids: bool = True) -> dict:
+        """
+        Response shape: categories as id/name/slug/count (largest first,
+        uncategorized rows only count toward total), and the other facets as
+        value -> count with countries by ISO code when they are country ids.
+        """
+        category_counts = {cid: n for cid, n in counts["category"].items() if cid is not None}
+        categories = []
+        if category_counts:
+            rows = db.query(Category.id, Category.name, Category.slug).filter(
+                Category.id.in_(list(category_counts))
+            ).all()
+            categories = sorted(
+                ({"id": c.id, "name": c.name, "slug": c.slug, "count": category_counts[c.id]} for c in rows),
+                key=lambda c: (-c["count"], c["name"]),
+            )
+
+        countries = {value: n for value, n in counts["country"].items() if value is not None}
+        if country_ids and countries:
+            codes = dict(db.query(Country.id, Country.country_code).filter(Country.id.in_(list(countries))).all())
+            countries = {codes[cid]: n for cid, n in countries.items() if cid in codes}
+
+        return {
+            "total": counts["total"],
+            "featured": counts["featured"],
+            "categories": categories,
+            "brands": {brand: n for brand, n in counts["brand"].items() if brand},
+            "countries": countries,
+            "currencies": dict(counts["currency"]),
+            "discounts": {label: counts["discount"][label] for label, _, _ in DISCOUNT_BUCKETS
+                          if label in counts["discount"]},
+        }
@@ -7,6 +7,7 @@ from app.models.cart import CartItem
 from app.models.coupon import Coupon
 from app.models.user_coupon import UserCoupon
 from app.services.cart_service import CartService
+from app.services.daily_stats_service import DailyStatsService
 from app.services.payment_service import process_payment, PaymentResult
 
 
@@ -20,8 +21,9 @@ class OrderService:
         if not cart_items:
             return None, "Cart is empty"
         
-        # Calculate total
-        total = CartService.get_cart_total(db, user_id, currency=currency)
+        # Calculate total (one price lookup for every coupon in the cart)
+        unit_prices = CartService.unit_prices_cents(db, cart_items, currency)
+        total = sum(unit * cart_item.quantity for unit, cart_item in zip(unit_prices, cart_items)) / 100
         if total <= 0:
             # Free coupons - skip payment
             order = Order(
@@ -60,25 +62,20 @@ class OrderService:
         db.add(order)
         db.flush()  # Get order ID
         # Create order items
-        for cart_item in cart_items:
+        for cart_item, unit_cents in zip(cart_items, unit_prices):
             # Figure out price and coupons to grant
-            from app.services.coupon_service import CouponService
             order_item = OrderItem(
                 order_id=order.id,
                 coupon_id=cart_item.coupon_id,
                 package_id=cart_item.package_id,
                 quantity=cart_item.quantity,
-                price=0.0
+                price=unit_cents / 100
             )
             
             coupons_to_grant = []
             if cart_item.coupon:
-                order_item.price = CouponService.get_price(cart_item.coupon, currency)
                 coupons_to_grant.append(cart_item.coupon_id)
             elif cart_item.package:
-                base_sum = sum(CouponService.get_price(c.coupon, currency) for c in cart_item.package.coupon_associations if c.coupon)
-                discount = cart_item.package.discount or 0.0
-                order_item.price = base_sum * (1.0 - discount / 100.0)
                 coupons_to_grant.extend([c.coupon_id for c in cart_item.package.coupon_associations])
 
             db.add(order_item)
@@ -98,6 +95,9 @@ class OrderService:
                         )
                         db.add(user_coupon)
         
+        if order.status == "paid":
+            DailyStatsService.record_order(db, order)
+
         # Clear cart
         CartService.clear_cart(db, user_id)
         
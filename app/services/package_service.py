@@ -6,8 +6,17 @@ from typing import List, Optional
 from app.models.package import Package
 from app.models.package_coupon import PackageCoupon
 from app.models.coupon import Coupon
+from app.models.coupon_price import CouponPrice
 from app.schemas.package import PackageCreate, PackageUpdate
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_MEDIUM
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from app.database import in_new_session
+from app.utils.pagination import InvalidCursor, decode_cursor, keyset_after, next_cursor
+from app.cache import get_or_compute, get_or_compute_many, cache_key, ns_cache_key, delete_cache, invalidate_namespace, NS_PACKAGES, NS_COUPONS_LIST, CACHE_TTL_MEDIUM, CACHE_STALE_TTL
+from app.services.catalog_index import publish_coupon_changes
+from app.services.coupon_service import CouponService
+from app.read_models import CouponDTO
 
 
 class PackageService:
@@ -43,7 +52,8 @@ class PackageService:
 
         db.commit()
         db.refresh(pkg)
-        invalidate_cache("packages:*")
+        invalidate_namespace(NS_PACKAGES)
+        PackageService._coupon_flags_changed(data.coupon_ids or [])
         return PackageService._load_full(db, pkg.id)
 
     @staticmethod
@@ -58,18 +68,47 @@ class PackageService:
         filter_by: Optional[str] = None,
         country: Optional[str] = None,
         brands: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
     ) -> List[dict]:
+        """
+        Package listing. Pass cursor (from list_cursor()) for keyset
+        pagination; skip is the offset-based compatibility mode. Raises
+        InvalidCursor for a malformed cursor or one issued for another sort.
+        """
+        after = PackageService._decode_cursor(cursor, filter_by) if cursor else None
+
+        def load(session):
+            return PackageService._load_list(
+                session, skip, limit, category_id, is_active, is_featured,
+                is_trending, filter_by, country, brands, after,
+            )
+
         # Simplified cache key for better hit rates
-        use_cache = (skip == 0 and limit <= 100)
+        use_cache = (skip == 0 and limit <= 100 and after is None)
+        if not use_cache:
+            return load(db)
+
         brands_key = ",".join(sorted(brands)) if brands else None
-        cache_k = None
-        
-        if use_cache:
-            cache_k = cache_key("packages", "list", category_id, is_active, is_featured, is_trending, filter_by, brands_key, country, limit)
-            cached = get_cache(cache_k)
-            if cached is not None:
-                return cached
+        cache_k = ns_cache_key(NS_PACKAGES, "list", category_id, is_active, is_featured, is_trending, filter_by, brands_key, country, limit)
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
 
+    @staticmethod
+    def _load_list(
+        db: Session,
+        skip: int,
+        limit: int,
+        category_id: Optional[UUID],
+        is_active: Optional[bool],
+        is_featured: Optional[bool],
+        is_trending: Optional[bool],
+        filter_by: Optional[str],
+        country: Optional[str],
+        brands: Optional[List[str]],
+        after: Optional[tuple] = None,
+    ) -> List[dict]:
         # Optimized query with eager loading
         coupon_count = func.count(PackageCoupon.id).label("coupon_count")
         query = (
@@ -77,33 +116,13 @@ class PackageService:
             .outerjoin(PackageCoupon, PackageCoupon.package_id == Package.id)
             .group_by(Package.id)
         )
+        query = PackageService.apply_filters(query, category_id, is_active, is_featured, is_trending, country, brands)
 
-        if is_active is not None:
-            query = query.filter(Package.is_active == is_active)
-        if is_featured is not None:
-            query = query.filter(Package.is_featured == is_featured)
-        if is_trending is not None:
-            query = query.filter(Package.is_trending == is_trending)
-        if category_id is not None:
-            query = query.filter(Package.category_id == category_id)
-        if country is not None:
-            query = query.filter(Package.country == country)
-        if brands:
-            query = query.filter(Package.brand.in_(brands))
-
-        # Apply filter-based ordering
-        if filter_by == "highest_saving":
-            query = query.order_by(Package.discount.desc().nullslast(), Package.created_at.desc())
-        elif filter_by == "avg_rating":
-            query = query.order_by(Package.avg_rating.desc(), Package.created_at.desc())
-        elif filter_by == "bundle_sold":
-            query = query.order_by(Package.total_sold.desc(), Package.created_at.desc())
-        else:
-            # Default and "newest" both sort by created_at desc
-            query = query.order_by(Package.created_at.desc())
-
-        query = query.offset(skip).limit(limit)
-        rows = query.all()
+        # Apply filter-based ordering (keyset-compatible: ties broken by created_at, then id)
+        query = keyset_after(query, PackageService._sort_columns(filter_by), after)
+        if after is None:
+            query = query.offset(skip)
+        rows = query.limit(limit).all()
 
         result = []
         # Batch load categories to avoid N+1
@@ -116,40 +135,12 @@ class PackageService:
             categories = db.query(Category).filter(Category.id.in_(category_ids)).all()
             categories_map = {cat.id: cat for cat in categories}
         
-        # Batch load package coupons
-        package_coupons = db.query(PackageCoupon).filter(
-            PackageCoupon.package_id.in_(package_ids)
-        ).all()
-        package_coupons_map = {}
-        all_coupon_ids = set()
-        for pc in package_coupons:
-            if pc.package_id not in package_coupons_map:
-                package_coupons_map[pc.package_id] = []
-            package_coupons_map[pc.package_id].append(pc.coupon_id)
-            all_coupon_ids.add(pc.coupon_id)
-            
-        coupons_map = {}
-        if all_coupon_ids:
-            all_coupons = db.query(Coupon.id, Coupon.pricing).filter(Coupon.id.in_(all_coupon_ids)).all()
-            coupons_map = {c.id: c for c in all_coupons}
-        
+        # Per-currency price sums of every listed package in one grouped query
+        pricing_map = PackageService._pricing_by_package(db, package_ids)
+
         for pkg, count in rows:
-            pkg_coupon_ids = package_coupons_map.get(pkg.id, [])
-            
-            pricing = {}
-            for cid in pkg_coupon_ids:
-                if cid in coupons_map:
-                    c = coupons_map[cid]
-                    if c.pricing:
-                        for currency, values in c.pricing.items():
-                            if currency not in pricing:
-                                pricing[currency] = {"price": 0.0}
-                            for k, v in values.items():
-                                pricing[currency][k] = pricing[currency].get(k, 0.0) + v
-                    else:
-                        pricing.setdefault("DEFAULT", {"price": 0.0})
-                        pricing["DEFAULT"]["price"] += 0.0
-            
+            pricing = pricing_map.get(pkg.id, {})
+
             prices = {}
             final_prices = {}
             for currency, values in pricing.items():
@@ -183,52 +174,106 @@ class PackageService:
                 "final_prices": final_prices,
             })
 
-        set_cache(cache_k, result, CACHE_TTL_MEDIUM)
         return result
 
+    @staticmethod
+    def apply_filters(
+        query,
+        category_id: Optional[UUID],
+        is_active: Optional[bool],
+        is_featured: Optional[bool],
+        is_trending: Optional[bool],
+        country: Optional[str],
+        brands: Optional[List[str]],
+    ):
+        """Listing filters shared by get_all() and the facet counts."""
+        if is_active is not None:
+            query = query.filter(Package.is_active == is_active)
+        if is_featured is not None:
+            query = query.filter(Package.is_featured == is_featured)
+        if is_trending is not None:
+            query = query.filter(Package.is_trending == is_trending)
+        if category_id is not None:
+            query = query.filter(Package.category_id == category_id)
+        if country is not None:
+            query = query.filter(Package.country == country)
+        if brands:
+            query = query.filter(Package.brand.in_(brands))
+        return query
+
+    # Sort value used ahead of (created_at, id) for each filter_by, with the value
+    # NULL ranks as (no discount sorts last; no rating/sales count as 0, as listed)
+    _SORT_KEYS = {
+        "highest_saving": ("discount", -1.0, float),
+        "avg_rating": ("avg_rating", 0.0, float),
+        "bundle_sold": ("total_sold", 0, int),
+    }
+
+    @staticmethod
+    def _sort_columns(filter_by: Optional[str]) -> list:
+        columns = [Package.created_at, Package.id]
+        if filter_by in PackageService._SORT_KEYS:
+            field, if_null, _ = PackageService._SORT_KEYS[filter_by]
+            columns.insert(0, func.coalesce(getattr(Package, field), if_null))
+        return columns
+
+    @staticmethod
+    def _decode_cursor(cursor: str, filter_by: Optional[str]) -> tuple:
+        sort = filter_by if filter_by in PackageService._SORT_KEYS else "newest"
+        types = [str, datetime.fromisoformat, UUID]
+        if sort in PackageService._SORT_KEYS:
+            types.insert(1, PackageService._SORT_KEYS[sort][2])
+        values = decode_cursor(cursor, types)
+        if values[0] != sort:
+            raise InvalidCursor("Cursor was issued for a different sort")
+        return values[1:]
+
+    @staticmethod
+    def list_cursor(packages: List[dict], limit: int, filter_by: Optional[str] = None) -> Optional[str]:
+        """Cursor for the page after a get_all() result, or None on the last page."""
+        def key(pkg):
+            if filter_by in PackageService._SORT_KEYS:
+                field, if_null, _ = PackageService._SORT_KEYS[filter_by]
+                value = pkg[field] if pkg[field] is not None else if_null
+                return (filter_by, value, pkg["created_at"], pkg["id"])
+            return ("newest", pkg["created_at"], pkg["id"])
+        return next_cursor(packages, limit, key)
+
     @staticmethod
     def get_by_id(db: Session, package_id: UUID) -> Optional[dict]:
-        # Try cache first
-        cache_k = cache_key("packages", "id", str(package_id))
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        result = PackageService._load_full(db, package_id)
-        
-        # Cache the result
-        if result:
-            set_cache(cache_k, result, CACHE_TTL_MEDIUM)
-        
-        return result
+        cache_k = ns_cache_key(NS_PACKAGES, "id", str(package_id))
+        return get_or_compute(cache_k, CACHE_TTL_MEDIUM, lambda: PackageService._load_full(db, package_id))
+
+    @staticmethod
+    def get_by_ids(db: Session, package_ids: List[UUID]) -> dict:
+        """
+        Package details by id, sharing get_by_id's cache entries: one MGET for
+        the batch and one _load_full_many() for the misses. Unknown ids are absent.
+        """
+        def load(missing):
+            return PackageService._load_full_many(db, missing)
+
+        base = ns_cache_key(NS_PACKAGES, "id")
+        keys = {package_id: cache_key(base, str(package_id)) for package_id in package_ids}
+        return get_or_compute_many(keys, CACHE_TTL_MEDIUM, load)
 
     @staticmethod
     def get_by_slug(db: Session, slug: str) -> Optional[dict]:
-        # Try cache first
-        cache_k = cache_key("packages", "slug", slug)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        pkg = db.query(Package).filter(Package.slug == slug).first()
-        if not pkg:
-            return None
-        
-        result = PackageService._load_full(db, pkg.id)
-        
-        # Cache the result
-        if result:
-            set_cache(cache_k, result, CACHE_TTL_MEDIUM)
-        
-        return result
+        def load():
+            pkg = db.query(Package).filter(Package.slug == slug).first()
+            if not pkg:
+                return None
+            return PackageService._load_full(db, pkg.id)
+
+        cache_k = ns_cache_key(NS_PACKAGES, "slug", slug)
+        return get_or_compute(cache_k, CACHE_TTL_MEDIUM, load)
 
     @staticmethod
-    def get_coupons(db: Session, package_id: UUID) -> List[Coupon]:
-        assocs = db.query(PackageCoupon).filter(PackageCoupon.package_id == package_id).all()
-        coupon_ids = [a.coupon_id for a in assocs]
-        if not coupon_ids:
-            return []
-        return db.query(Coupon).filter(Coupon.id.in_(coupon_ids)).all()
+    def get_coupons(db: Session, package_id: UUID) -> List[CouponDTO]:
+        coupon_ids = [
+            cid for (cid,) in db.query(PackageCoupon.coupon_id).filter(PackageCoupon.package_id == package_id)
+        ]
+        return CouponService.get_many(db, coupon_ids)
 
     @staticmethod
     def update(db: Session, package_id: UUID, data: PackageUpdate) -> Optional[dict]:
@@ -262,9 +307,9 @@ class PackageService:
 
         db.commit()
         db.refresh(pkg)
-        invalidate_cache("packages:*")
-        invalidate_cache(f"packages:id:{package_id}")
-        invalidate_cache(f"packages:slug:*")
+        invalidate_namespace(NS_PACKAGES)
+        if coupon_ids is not None:
+            PackageService._coupon_flags_changed(list(coupon_ids) + removed_ids)
         return PackageService._load_full(db, package_id)
 
     @staticmethod
@@ -279,9 +324,7 @@ class PackageService:
         pkg.is_featured = False
         db.commit()
         
-        invalidate_cache("packages:*")
-        invalidate_cache(f"packages:id:{package_id}")
-        invalidate_cache(f"packages:slug:*")
+        invalidate_namespace(NS_PACKAGES)
         return True
 
     @staticmethod
@@ -305,9 +348,8 @@ class PackageService:
             )
 
         db.commit()
-        invalidate_cache("packages:*")
-        invalidate_cache(f"packages:id:{package_id}")
-        invalidate_cache(f"packages:slug:*")
+        invalidate_namespace(NS_PACKAGES)
+        PackageService._coupon_flags_changed(new_ids)
         return PackageService._load_full(db, package_id)
 
     @staticmethod
@@ -328,11 +370,18 @@ class PackageService:
         PackageService._reset_orphaned_flags(db, [coupon_id])
 
         db.commit()
-        invalidate_cache("packages:*")
-        invalidate_cache(f"packages:id:{package_id}")
-        invalidate_cache(f"packages:slug:*")
+        invalidate_namespace(NS_PACKAGES)
+        PackageService._coupon_flags_changed([coupon_id])
         return PackageService._load_full(db, package_id)
 
+    @staticmethod
+    def _coupon_flags_changed(coupon_ids: List[UUID]) -> None:
+        """is_package_coupon changed for these coupons: they enter or leave coupon listings."""
+        if coupon_ids:
+            delete_cache(*[CouponService.entity_key(cid) for cid in coupon_ids])
+            invalidate_namespace(NS_COUPONS_LIST)
+            publish_coupon_changes(coupon_ids)
+
     @staticmethod
     def _reset_orphaned_flags(db: Session, coupon_ids: List[UUID]):
         """Reset is_package_coupon=False for coupons not in any other package."""
@@ -345,101 +394,155 @@ class PackageService:
 
     @staticmethod
     def _compute_pricing(db: Session, coupon_ids: List[UUID]) -> dict:
-        """Sum coupon prices per currency. Uses each coupon's `pricing` JSON
-        and falls back to the base `price` field under a 'DEFAULT' key."""
+        """Sum coupon prices per currency from coupon_prices. Coupons
+        without multi-currency pricing show up as a zero 'DEFAULT' entry."""
         if not coupon_ids:
             return {}
-        coupons = db.query(Coupon).filter(Coupon.id.in_(coupon_ids)).all()
-        totals: dict = {}
-        for c in coupons:
-            if c.pricing:
-                for currency, values in c.pricing.items():
-                    if currency not in totals:
-                        totals[currency] = {"price": 0.0}
-                    for k, v in values.items():
-                        totals[currency][k] = totals[currency].get(k, 0.0) + v
-            else:
-                # Coupon has no multi-currency pricing
-                totals.setdefault("DEFAULT", {"price": 0.0})
-                totals["DEFAULT"]["price"] += 0.0
+        sums = (
+            db.query(CouponPrice.currency, func.sum(CouponPrice.price_cents), func.sum(CouponPrice.discount_cents))
+            .select_from(Coupon)
+            .outerjoin(CouponPrice, CouponPrice.coupon_id == Coupon.id)
+            .filter(Coupon.id.in_(coupon_ids))
+            .group_by(CouponPrice.currency)
+            .all()
+        )
+        return PackageService._pricing_from_sums(sums)
+
+    @staticmethod
+    def _pricing_by_package(db: Session, package_ids: List[UUID]) -> dict:
+        """_compute_pricing() for many packages at once: {package_id: pricing}."""
+        if not package_ids:
+            return {}
+        sums = (
+            db.query(
+                PackageCoupon.package_id, CouponPrice.currency,
+                func.sum(CouponPrice.price_cents), func.sum(CouponPrice.discount_cents),
+            )
+            .outerjoin(CouponPrice, CouponPrice.coupon_id == PackageCoupon.coupon_id)
+            .filter(PackageCoupon.package_id.in_(package_ids))
+            .group_by(PackageCoupon.package_id, CouponPrice.currency)
+            .all()
+        )
+        grouped = {}
+        for package_id, *row in sums:
+            grouped.setdefault(package_id, []).append(row)
+        return {package_id: PackageService._pricing_from_sums(rows) for package_id, rows in grouped.items()}
+
+    @staticmethod
+    def _pricing_from_sums(sums) -> dict:
+        totals = {}
+        for currency, price_cents, discount_cents in sums:
+            if currency is None:
+                # Left-join miss: a coupon with no multi-currency pricing
+                totals["DEFAULT"] = {"price": 0.0}
+                continue
+            totals[currency] = {"price": price_cents / 100}
+            if discount_cents is not None:
+                totals[currency]["discount_amount"] = discount_cents / 100
         return totals
 
+    @staticmethod
+    def price_cents(member_cents: int, discount: Optional[float]) -> int:
+        """Unit price of a package in minor units: its coupons' sum less the package discount."""
+        multiplier = Decimal(1) - Decimal(str(discount or 0.0)) / Decimal(100)
+        return int((Decimal(member_cents) * multiplier).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
     @staticmethod
     def _load_full(db: Session, package_id: UUID) -> Optional[dict]:
-        pkg = db.query(Package).filter(Package.id == package_id).first()
-        if not pkg:
-            return None
+        return PackageService._load_full_many(db, [package_id]).get(package_id)
 
-        cat = None
-        if pkg.category_id:
-            from app.models.category import Category
-            cat_obj = db.get(Category, pkg.category_id)
-            if cat_obj:
-                cat = {"id": cat_obj.id, "name": cat_obj.name, "slug": cat_obj.slug}
+    @staticmethod
+    def _load_full_many(db: Session, package_ids: List[UUID]) -> dict:
+        """
+        Package details by id for all of package_ids that exist, in a fixed
+        number of queries: packages with their categories, their coupon ids,
+        the coupons (through CouponService.get_many()) and the summed pricing.
+        """
+        if not package_ids:
+            return {}
+        packages = db.query(Package).options(
+            joinedload(Package.category)
+        ).filter(Package.id.in_(package_ids)).all()
+        if not packages:
+            return {}
 
-        assocs = db.query(PackageCoupon).filter(PackageCoupon.package_id == package_id).all()
-        coupon_ids = [a.coupon_id for a in assocs]
-        coupons = []
-        if coupon_ids:
-            coupon_objs = db.query(Coupon).filter(Coupon.id.in_(coupon_ids)).all()
-            for c in coupon_objs:
-                c_pricing = {}
-                c_discounts = {}
-                if c.pricing and isinstance(c.pricing, dict):
-                    for currency, values in c.pricing.items():
-                        c_pricing[currency] = values.get('price', 0.0)
-                        c_discounts[currency] = values.get('discount_amount', 0.0)
+        coupon_ids_by_package = {}
+        for package_id, coupon_id in db.query(PackageCoupon.package_id, PackageCoupon.coupon_id).filter(
+            PackageCoupon.package_id.in_([pkg.id for pkg in packages])
+        ):
+            coupon_ids_by_package.setdefault(package_id, []).append(coupon_id)
+        all_coupon_ids = [cid for ids in coupon_ids_by_package.values() for cid in ids]
+        summaries = {c.id: PackageService._coupon_summary(c) for c in CouponService.get_many(db, all_coupon_ids)}
+        pricing_by_package = PackageService._pricing_by_package(db, [pkg.id for pkg in packages])
+
+        details = {}
+        for pkg in packages:
+            cat = None
+            if pkg.category:
+                cat = {"id": pkg.category.id, "name": pkg.category.name, "slug": pkg.category.slug}
+
+            coupons = [
+                summaries[cid] for cid in coupon_ids_by_package.get(pkg.id, []) if cid in summaries
+            ]
+
+            prices = {}
+            final_prices = {}
+            for currency, values in pricing_by_package.get(pkg.id, {}).items():
+                base_price = values.get("price", 0.0)
+                prices[currency] = base_price
+                if pkg.discount:
+                    final_prices[currency] = base_price * (1.0 - pkg.discount / 100.0)
                 else:
-                    c_pricing['USD'] = 0.0
-                    c_discounts['USD'] = c.discount_amount or 0.0
-                    
-                coupons.append({
-                    "id": c.id,
-                    "title": c.title,
-                    "brand": c.brand,
-                    "discount_type": c.discount_type,
-                    "discount_amount": c.discount_amount,
-                    "picture_url": c.picture_url,
-                    "pricing": c_pricing,
-                    "discounts": c_discounts,
-                    "is_active": c.is_active,
-                })
-
-        pricing_raw = PackageService._compute_pricing(db, coupon_ids)
-        
-        prices = {}
-        final_prices = {}
-        for currency, values in pricing_raw.items():
-            base_price = values.get("price", 0.0)
-            prices[currency] = base_price
-            if pkg.discount:
-                final_prices[currency] = base_price * (1.0 - pkg.discount / 100.0)
-            else:
-                final_prices[currency] = base_price
+                    final_prices[currency] = base_price
+
+            details[pkg.id] = {
+                "id": pkg.id,
+                "name": pkg.name,
+                "slug": pkg.slug,
+                "description": pkg.description,
+                "picture_url": pkg.picture_url,
+                "brand": pkg.brand,
+                "brand_url": getattr(pkg, 'brand_url', None),
+                "discount": pkg.discount,
+                "avg_rating": pkg.avg_rating or 0.0,
+                "total_sold": pkg.total_sold or 0,
+                "max_saving": pkg.discount or 0.0,
+                "pricing": prices,
+                "final_prices": final_prices,
+                "category_id": pkg.category_id,
+                "is_active": pkg.is_active,
+                "is_featured": pkg.is_featured,
+                "is_trending": getattr(pkg, 'is_trending', False),
+                "expiration_date": pkg.expiration_date,
+                "country": pkg.country,
+                "created_at": pkg.created_at,
+                "category": cat,
+                "coupons": coupons,
+            }
+        return details
+
+    @staticmethod
+    def _coupon_summary(c: CouponDTO) -> dict:
+        c_pricing = {}
+        c_discounts = {}
+        if c.pricing and isinstance(c.pricing, dict):
+            for currency, values in c.pricing.items():
+                c_pricing[currency] = values.get('price', 0.0)
+                c_discounts[currency] = values.get('discount_amount', 0.0)
+        else:
+            c_pricing['USD'] = 0.0
+            c_discounts['USD'] = c.discount_amount or 0.0
 
         return {
-            "id": pkg.id,
-            "name": pkg.name,
-            "slug": pkg.slug,
-            "description": pkg.description,
-            "picture_url": pkg.picture_url,
-            "brand": pkg.brand,
-            "brand_url": getattr(pkg, 'brand_url', None),
-            "discount": pkg.discount,
-            "avg_rating": pkg.avg_rating or 0.0,
-            "total_sold": pkg.total_sold or 0,
-            "max_saving": pkg.discount or 0.0,
-            "pricing": prices,
-            "final_prices": final_prices,
-            "category_id": pkg.category_id,
-            "is_active": pkg.is_active,
-            "is_featured": pkg.is_featured,
-            "is_trending": getattr(pkg, 'is_trending', False),
-            "expiration_date": pkg.expiration_date,
-            "country": pkg.country,
-            "created_at": pkg.created_at,
-            "category": cat,
-            "coupons": coupons,
+            "id": c.id,
+            "title": c.title,
+            "brand": c.brand,
+            "discount_type": c.discount_type,
+            "discount_amount": c.discount_amount,
+            "picture_url": c.picture_url,
+            "pricing": c_pricing,
+            "discounts": c_discounts,
+            "is_active": c.is_active,
         }
 
     @staticmethod
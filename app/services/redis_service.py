@@ -2,16 +2,20 @@
 Redis-powered frontend service for user experience features.
 Uses Redis data structures (sorted sets, lists, hashes) for real-time features.
 """
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
 from sqlalchemy.orm import Session
-from uuid import UUID
-from typing import List, Optional
 
 from app.models.coupon import Coupon
+from app.services.coupon_service import CouponService
 from app.cache import (
-    get_cache, set_cache, cache_key,
-    redis_zincrby, redis_zrevrange,
-    redis_lpush_capped, redis_lrange,
-    redis_hget, redis_hset, redis_hincrby,
+    get_or_compute, cache_key, ns_cache_key, NS_COUPONS_LIST,
+    redis_pipeline, redis_zincrby, redis_zrevrange, redis_zunionstore,
+    redis_lpush_capped, redis_merge_capped, redis_lrange,
+    redis_hget, redis_pfadd, redis_pfcount, redis_pfcount_many, redis_pfcount_merged,
     CACHE_TTL_SHORT, CACHE_TTL_MEDIUM, CACHE_TTL_DAY
 )
 
@@ -19,103 +23,209 @@ from app.cache import (
 class RedisService:
     
     # ============== Trending Coupons ==============
+    #
+    # Views land in hourly buckets (trending:coupons:h:{epoch hour}). A window
+    # is the weighted union of the buckets it spans, materialized under
+    # trending:coupons:top:{period} for TRENDING_REFRESH_SECONDS, so the union
+    # runs about once a minute per window however many reads there are. The
+    # oldest bucket counts for the part of its hour still inside the window,
+    # which makes the window slide instead of resetting on the hour. With
+    # TRENDING_HALF_LIFE_HOURS set, each bucket is further weighted by
+    # 0.5 ** (age / half-life) so recent views outrank older ones.
+    
+    TRENDING_BUCKET_PREFIX = "trending:coupons:h"
+    TRENDING_TOP_PREFIX = "trending:coupons:top"
+    TRENDING_WINDOWS = {"1h": 1, "24h": 24, "7d": 24 * 7}  # period -> hours
+    TRENDING_REFRESH_SECONDS = 60
+    TRENDING_OVERFETCH = 2  # ranked ids read per requested coupon, to make up for inactive ones
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 0))  # 0 disables decay
     
-    TRENDING_KEY_24H = "trending:coupons:24h"
-    TRENDING_KEY_7D = "trending:coupons:7d"
+    @staticmethod
+    def _bucket_key(hour: int) -> str:
+        return cache_key(RedisService.TRENDING_BUCKET_PREFIX, hour)
     
     @staticmethod
-    def record_trending_view(coupon_id: str):
-        """Increment trending score when a coupon is viewed."""
-        redis_zincrby(RedisService.TRENDING_KEY_24H, coupon_id, 1.0, ttl=CACHE_TTL_DAY)
-        redis_zincrby(RedisService.TRENDING_KEY_7D, coupon_id, 1.0, ttl=CACHE_TTL_DAY * 7)
+    def record_trending_view(coupon_id: str, pipe=None):
+        """Count a view in the current hour's bucket (ZINCRBY + EXPIRE; one round trip, or queued on pipe)."""
+        hour = int(time.time() // 3600)
+        ttl = (max(RedisService.TRENDING_WINDOWS.values()) + 2) * 3600
+        redis_zincrby(RedisService._bucket_key(hour), coupon_id, 1.0, ttl=ttl, pipe=pipe)
+    
+    @staticmethod
+    def _trending_weights(hours: int, now: float) -> Dict[str, float]:
+        """Bucket key -> weight for a window of hours ending at now."""
+        current = int(now // 3600)
+        elapsed = now / 3600 - current  # fraction of the current hour gone by
+        half_life = RedisService.TRENDING_HALF_LIFE_HOURS
+        weights = {}
+        for age in range(hours + 1):
+            weight = 1.0 - elapsed if age == hours else 1.0
+            if half_life > 0:
+                weight *= 0.5 ** (age / half_life)
+            if weight > 0:
+                weights[RedisService._bucket_key(current - age)] = weight
+        return weights
     
     @staticmethod
     def get_trending_coupons(db: Session, period: str = "24h", limit: int = 10) -> list:
-        """Get top trending coupons by view count."""
-        key = RedisService.TRENDING_KEY_24H if period == "24h" else RedisService.TRENDING_KEY_7D
-        
-        # Get top coupon IDs with scores from Redis sorted set
-        trending_data = redis_zrevrange(key, 0, limit - 1, withscores=True)
+        """Get top trending active coupons by (decayed) views in the period's sliding window."""
+        top_key = cache_key(RedisService.TRENDING_TOP_PREFIX, period)
+        # Over-fetch: deactivated coupons keep their views and are dropped below
+        fetch = limit * RedisService.TRENDING_OVERFETCH
+        coupon_ids = redis_zrevrange(top_key, 0, fetch - 1)
+        if not coupon_ids:
+            hours = RedisService.TRENDING_WINDOWS.get(period, 24)
+            weights = RedisService._trending_weights(hours, time.time())
+            if redis_zunionstore(top_key, weights, ttl=RedisService.TRENDING_REFRESH_SECONDS):
+                coupon_ids = redis_zrevrange(top_key, 0, fetch - 1)
         
-        if not trending_data:
+        coupons = [coupon for coupon in CouponService.get_many(db, coupon_ids) if coupon.is_active]
+        if not coupons:
             # Fallback: return most recently created active coupons
-            coupons = db.query(Coupon).filter(
+            coupon_ids = [cid for (cid,) in db.query(Coupon.id).filter(
                 Coupon.is_active == True
-            ).order_by(Coupon.created_at.desc()).limit(limit).all()
-            return [RedisService._coupon_to_dict(c, 0) for c in coupons]
-        
-        # Fetch full coupon details from DB for the trending IDs
-        result = []
-        for coupon_id_str, score in trending_data:
-            try:
-                coupon = db.query(Coupon).filter(Coupon.id == coupon_id_str).first()
-                if coupon and coupon.is_active:
-                    result.append(RedisService._coupon_to_dict(coupon, int(score)))
-            except Exception:
-                continue
-        
-        return result
+            ).order_by(Coupon.created_at.desc()).limit(limit)]
+            return CouponService.get_many(db, coupon_ids)
+        return coupons[:limit]
     
     # ============== Recently Viewed ==============
     
+    RECENTLY_VIEWED_MAX = 20
+    RECENTLY_VIEWED_TTL = CACHE_TTL_DAY * 30
+    # httpOnly cookie naming the session this client's anonymous views were recorded under
+    ANON_SESSION_COOKIE = "anon_session"
+    
     @staticmethod
-    def record_recently_viewed(session_id: str, coupon_id: str):
-        """Add a coupon to the user's recently viewed list."""
-        key = f"recently_viewed:{session_id}"
-        redis_lpush_capped(key, coupon_id, max_length=20, ttl=CACHE_TTL_DAY * 30)
+    def _recently_viewed_key(session_id: str) -> str:
+        return f"recently_viewed:{session_id}"
+    
+    @staticmethod
+    def record_recently_viewed(session_id: str, coupon_id: str, pipe=None):
+        """Move a coupon to the front of the session's recently viewed list (one atomic script call)."""
+        redis_lpush_capped(
+            RedisService._recently_viewed_key(session_id), coupon_id,
+            max_length=RedisService.RECENTLY_VIEWED_MAX, ttl=RedisService.RECENTLY_VIEWED_TTL, pipe=pipe,
+        )
     
     @staticmethod
     def get_recently_viewed(db: Session, session_id: str, limit: int = 20) -> list:
-        """Get recently viewed coupons for a session/user."""
-        key = f"recently_viewed:{session_id}"
-        coupon_ids = redis_lrange(key, 0, limit - 1)
+        """Recently viewed coupons for a session/user, most recent first (one LRANGE, then one batched hydration)."""
+        coupon_ids = redis_lrange(RedisService._recently_viewed_key(session_id), 0, limit - 1)
         
         if not coupon_ids:
             return []
         
-        # Fetch coupons in order
-        result = []
-        for coupon_id_str in coupon_ids:
-            try:
-                coupon = db.query(Coupon).filter(Coupon.id == coupon_id_str).first()
-                if coupon:
-                    result.append(RedisService._coupon_to_dict(coupon, 0))
-            except Exception:
-                continue
-        
-        return result
+        return CouponService.get_many(db, coupon_ids)
+    
+    @staticmethod
+    def merge_recently_viewed(anonymous_session_id: str, user_id: str) -> int:
+        """At login: put an anonymous session's views ahead of the user's own, in one round trip."""
+        if anonymous_session_id == user_id:
+            return 0
+        return redis_merge_capped(
+            RedisService._recently_viewed_key(user_id), RedisService._recently_viewed_key(anonymous_session_id),
+            max_length=RedisService.RECENTLY_VIEWED_MAX, ttl=RedisService.RECENTLY_VIEWED_TTL,
+        )
+    
+    # ============== Unique Viewers ==============
+    #
+    # HyperLogLog sketches of viewers (user_id, else session_id): per coupon
+    # and site-wide ("all"), one per UTC day plus a lifetime one, fed with the
+    # view in the same round trip. A range is the union of its day sketches:
+    # the closed days are PFMERGEd once into hll:viewers:range:{scope}:{from}:{to}
+    # and reused, and only today's sketch is counted live, so any count is a
+    # couple of PFCOUNTs however long the history. Estimates are within ~1%.
+    
+    UNIQUE_PREFIX = "hll:viewers"
+    UNIQUE_RETENTION_DAYS = int(os.getenv("UNIQUE_VIEWERS_RETENTION_DAYS", 400))
+    
+    @staticmethod
+    def viewer_member(user_id=None, session_id: Optional[str] = None) -> Optional[str]:
+        if user_id is not None:
+            return f"user:{user_id}"
+        if session_id:
+            return f"session:{session_id}"
+        return None
+    
+    @staticmethod
+    def _unique_key(scope: str, day: Optional[date] = None) -> str:
+        if day is None:
+            return f"{RedisService.UNIQUE_PREFIX}:{scope}"
+        return f"{RedisService.UNIQUE_PREFIX}:{scope}:{day:%Y%m%d}"
+    
+    @staticmethod
+    def record_unique_viewer(coupon_id: str, viewer: str, day: Optional[date] = None, pipe=None):
+        """Add a viewer to the coupon's and the site-wide sketches for day (default today, UTC)."""
+        day = day or datetime.utcnow().date()
+        ttl = RedisService.UNIQUE_RETENTION_DAYS * CACHE_TTL_DAY
+        redis_pfadd(viewer, {
+            RedisService._unique_key(str(coupon_id), day): ttl,
+            RedisService._unique_key(str(coupon_id)): ttl,
+            RedisService._unique_key("all", day): ttl,
+            RedisService._unique_key("all"): ttl,
+        }, pipe=pipe)
+    
+    @staticmethod
+    def count_unique_viewers(coupon_id=None, since: Optional[date] = None) -> Optional[int]:
+        """
+        Estimated distinct viewers of a coupon (site-wide when coupon_id is
+        None) from since through today, or ever when since is None. None when
+        Redis is unavailable.
+        """
+        scope = str(coupon_id) if coupon_id is not None else "all"
+        if since is None:
+            return redis_pfcount(RedisService._unique_key(scope))
+        today = datetime.utcnow().date()
+        closed = [RedisService._unique_key(scope, since + timedelta(days=i)) for i in range((today - since).days)]
+        dest = f"{RedisService.UNIQUE_PREFIX}:range:{scope}:{since:%Y%m%d}:{today - timedelta(days=1):%Y%m%d}"
+        return redis_pfcount_merged(dest, closed, [RedisService._unique_key(scope, today)])
+    
+    @staticmethod
+    def count_unique_viewers_many(coupon_ids: List) -> Optional[Dict]:
+        """Estimated lifetime distinct viewers per coupon, in one round trip."""
+        counts = redis_pfcount_many([RedisService._unique_key(str(cid)) for cid in coupon_ids])
+        if counts is None:
+            return None
+        return dict(zip(coupon_ids, counts))
+    
+    @staticmethod
+    def record_view(coupon_id: str, session_id: Optional[str] = None):
+        """Feed trending, recently viewed and the unique-viewer sketches for one view in a single round trip."""
+        with redis_pipeline() as pipe:
+            if pipe is None:
+                return
+            RedisService.record_trending_view(coupon_id, pipe=pipe)
+            if session_id:
+                RedisService.record_recently_viewed(session_id, coupon_id, pipe=pipe)
+                RedisService.record_unique_viewer(coupon_id, RedisService.viewer_member(session_id=session_id), pipe=pipe)
     
     # ============== Featured Coupons ==============
     
     @staticmethod
     def get_featured_coupons(db: Session, limit: int = 10) -> list:
-        """Get featured coupons (cached for fast homepage loading)."""
-        cache_k = cache_key("coupons", "featured", limit)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        coupons = db.query(Coupon).filter(
-            Coupon.is_featured == True,
-            Coupon.is_active == True
-        ).order_by(Coupon.created_at.desc()).limit(limit).all()
-        
-        result = [RedisService._coupon_to_dict(c, 0) for c in coupons]
-        set_cache(cache_k, result, CACHE_TTL_MEDIUM)
-        return result
+        """Get featured coupons (the id list is cached; coupons come from their entity cache)."""
+        def load():
+            return [cid for (cid,) in db.query(Coupon.id).filter(
+                Coupon.is_featured == True,
+                Coupon.is_active == True
+            ).order_by(Coupon.created_at.desc()).limit(limit)]
+
+        cache_k = ns_cache_key(NS_COUPONS_LIST, "featured_ids", limit)
+        return CouponService.get_many(db, get_or_compute(cache_k, CACHE_TTL_MEDIUM, load))
     
     # ============== Real-time Stock ==============
     
     STOCK_KEY = "coupon_stock"
     
     @staticmethod
-    def init_stock(coupon_id: str, stock: int):
-        """Initialize or update stock count in Redis."""
-        redis_hset(RedisService.STOCK_KEY, coupon_id, str(stock))
+    def init_stock(coupon_id: str, stock: Optional[int]):
+        """Initialize or update stock count in Redis (net of units held by unpaid orders)."""
+        from app.services.stock_service import StockService
+        StockService.seed({coupon_id: stock})
     
     @staticmethod
     def get_stock(db: Session, coupon_id: str) -> dict:
-        """Get real-time stock count (Redis first, DB fallback)."""
+        """Get real-time stock count (Redis first, DB fallback). Units held by unpaid orders are excluded."""
         # Try Redis first
         stock_str = redis_hget(RedisService.STOCK_KEY, coupon_id)
         if stock_str is not None:
@@ -127,50 +237,7 @@ class RedisService:
             return None
         
         stock = coupon.stock if coupon.stock is not None else -1  # -1 = unlimited
-        # Cache in Redis for next time
-        redis_hset(RedisService.STOCK_KEY, coupon_id, str(stock))
+        # Seed the reservation counter for next time
+        from app.services.stock_service import StockService
+        StockService.seed({coupon_id: coupon.stock}, only_missing=True)
         return {"coupon_id": coupon_id, "stock": stock, "source": "database"}
-    
-    @staticmethod
-    def decrement_stock(coupon_id: str) -> Optional[int]:
-        """Decrement stock by 1 (called on claim/purchase)."""
-        return redis_hincrby(RedisService.STOCK_KEY, coupon_id, -1)
-    
-    # ============== Helper ==============
-    
-    @staticmethod
-    def _coupon_to_dict(coupon: Coupon, trending_score: int) -> dict:
-        """Convert a Coupon model to a serializable dict."""
-        def sanitize(val):
-            if isinstance(val, bytes):
-                # If we find bytes, it's likely binary data mistakenly saved in a string column.
-                # In this case, we can't safely decode it as UTF-8 if it's an image (0x89PNG).
-                # Best safe bet: return None or a placeholder for now to prevent 500 API Crash.
-                try:
-                    return val.decode('utf-8')
-                except UnicodeDecodeError:
-                    return None # Or "Invalid Binary Data"
-            return val
-
-        return {
-            "id": str(coupon.id),
-            "brand": sanitize(coupon.brand),
-            "title": sanitize(coupon.title),
-            "description": sanitize(coupon.description),
-            "discount_type": sanitize(coupon.discount_type),
-            "discount_amount": coupon.discount_amount,
-            "max_uses": coupon.max_uses,
-            "current_uses": coupon.current_uses,
-            "stock_sold": coupon.current_uses,
-            "stock": coupon.stock,
-            "is_featured": coupon.is_featured,
-            "is_active": coupon.is_active,
-            "picture_url": sanitize(coupon.picture_url),
-            "expiration_date": str(coupon.expiration_date) if coupon.expiration_date else None,
-            "created_at": str(coupon.created_at) if coupon.created_at else None,
-            "category_id": str(coupon.category_id) if coupon.category_id else None,
-            "pricing": coupon.pricing,
-            "country_ids": [],
-            "category": None,
-            "countries": [],
-        }
@@ -5,7 +5,8 @@ from typing import List, Optional
 from app.models.region import Region
 from app.models.country import Country
 from app.schemas.region import RegionCreate, RegionUpdate
-from app.cache import get_cache, set_cache, invalidate_cache, cache_key, CACHE_TTL_MEDIUM
+from app.database import in_new_session
+from app.cache import get_cache, set_cache, get_or_compute, ns_cache_key, invalidate_namespace, NS_REGIONS, CACHE_TTL_MEDIUM, CACHE_STALE_TTL
 
 
 class RegionService:
@@ -24,52 +25,71 @@ class RegionService:
         db.refresh(db_region)
         
         # Invalidate region list cache
-        invalidate_cache("regions:list:*")
+        invalidate_namespace(NS_REGIONS)
         
         return db_region
 
     @staticmethod
-    def get_all(db: Session, active_only: bool = True) -> List[Region]:
-        """Get all regions (cached)"""
-        cache_k = cache_key("regions", "list", active_only)
-        cached = get_cache(cache_k)
-        if cached is not None:
-            return cached
-        
-        query = db.query(Region)
-        if active_only:
-            query = query.filter(Region.is_active == True)
-        regions = query.order_by(Region.display_order, Region.name).all()
-        
-        # Cache the result
-        cache_data = [
-            {
-                "id": str(r.id),
-                "name": r.name,
-                "slug": r.slug,
-                "description": r.description,
-                "display_order": r.display_order,
-                "is_active": r.is_active,
-                "created_at": str(r.created_at) if r.created_at else None,
-            }
-            for r in regions
-        ]
-        set_cache(cache_k, cache_data, CACHE_TTL_MEDIUM)
-        
-        return regions
+    def get_all(db: Session, active_only: bool = True) -> List[dict]:
+        """Get all regions (cached, stale-while-revalidate)"""
+        def load(session):
+            query = session.query(Region)
+            if active_only:
+                query = query.filter(Region.is_active == True)
+            regions = query.order_by(Region.display_order, Region.name).all()
+            return [RegionService._to_dict(r) for r in regions]
+
+        cache_k = ns_cache_key(NS_REGIONS, "list", active_only)
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
+
+    @staticmethod
+    def get_all_with_countries(db: Session, active_only: bool = True) -> List[dict]:
+        """Get all regions with their countries (cached, stale-while-revalidate)"""
+        def load(session):
+            query = session.query(Region).options(joinedload(Region.countries))
+            if active_only:
+                query = query.filter(Region.is_active == True)
+            regions = query.order_by(Region.display_order, Region.name).all()
+            return [
+                {
+                    **RegionService._to_dict(r),
+                    "countries": [
+                        {
+                            "id": c.id, "name": c.name, "slug": c.slug,
+                            "country_code": c.country_code, "is_active": c.is_active,
+                        }
+                        for c in r.countries
+                    ],
+                }
+                for r in regions
+            ]
+
+        # Country writes also invalidate NS_REGIONS, so the nested lists stay current
+        cache_k = ns_cache_key(NS_REGIONS, "with-countries", active_only)
+        return get_or_compute(
+            cache_k, CACHE_TTL_MEDIUM, lambda: load(db),
+            stale_ttl=CACHE_STALE_TTL, refresh_loader=in_new_session(db, load),
+        )
 
     @staticmethod
-    def get_all_with_countries(db: Session, active_only: bool = True) -> List[Region]:
-        """Get all regions with their countries (eagerly loaded)"""
-        query = db.query(Region).options(joinedload(Region.countries))
-        if active_only:
-            query = query.filter(Region.is_active == True)
-        return query.order_by(Region.display_order, Region.name).all()
+    def _to_dict(region: Region) -> dict:
+        return {
+            "id": region.id,
+            "name": region.name,
+            "slug": region.slug,
+            "description": region.description,
+            "display_order": region.display_order,
+            "is_active": region.is_active,
+            "created_at": region.created_at,
+        }
 
     @staticmethod
     def get_by_id(db: Session, region_id: UUID) -> Optional[Region]:
         """Get a region by its ID (cached)"""
-        cache_k = cache_key("regions", "id", str(region_id))
+        cache_k = ns_cache_key(NS_REGIONS, "id", str(region_id))
         cached = get_cache(cache_k)
         if cached is not None:
             return cached
@@ -88,7 +108,7 @@ class RegionService:
     @staticmethod
     def get_by_slug(db: Session, slug: str, with_countries: bool = False) -> Optional[Region]:
         """Get a region by its slug (cached)"""
-        cache_k = cache_key("regions", "slug", slug, with_countries)
+        cache_k = ns_cache_key(NS_REGIONS, "slug", slug, with_countries)
         cached = get_cache(cache_k)
         if cached is not None and not with_countries:
             return cached
@@ -124,9 +144,7 @@ class RegionService:
         db.refresh(db_region)
         
         # Invalidate region caches
-        invalidate_cache("regions:list:*")
-        invalidate_cache(f"regions:id:{region_id}")
-        invalidate_cache(f"regions:slug:*")
+        invalidate_namespace(NS_REGIONS)
         
         return db_region
 
@@ -141,7 +159,6 @@ class RegionService:
         db.commit()
         
         # Invalidate region caches
-        invalidate_cache("regions:list:*")
-        invalidate_cache(f"regions:id:{region_id}")
+        invalidate_namespace(NS_REGIONS)
         
         return True
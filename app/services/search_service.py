@@ -0,0 +1,116 @@
+"""
+Indexed, ranked and typo-tolerant coupon search.
+
+Postgres: a prefix tsquery against the weighted search_vector column (GIN),
+OR'd with trigram word similarity and substring matches on SEARCH_TEXT_SQL
+(trigram GIN), ranked by ts_rank_cd + word_similarity.
+
+SQLite: an FTS5 prefix MATCH ranked by bm25(). When nothing matches, each
+query term is widened with its closest terms in the indexed vocabulary and the
+MATCH is retried, which gives the same "forgive one typo" behaviour.
+
+See app.models.coupon for the underlying DDL.
+"""
+import difflib
+import re
+from typing import List
+
+from sqlalchemy import Float, Integer, func, literal, literal_column, or_, text
+from sqlalchemy.orm import Query
+
+from app.models.coupon import Coupon, SEARCH_TEXT_SQL
+
+# Terms shorter than this only match as prefixes, never as fuzzy candidates
+FUZZY_MIN_LENGTH = 4
+FUZZY_CUTOFF = 0.75
+FUZZY_CANDIDATES = 3
+
+# bm25() column weights: title, brand, code, description
+_BM25_WEIGHTS = "10.0, 10.0, 5.0, 1.0"
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(search: str) -> List[str]:
+    """Lower-cased word tokens of a query (punctuation can't reach a MATCH/tsquery)."""
+    return _TERM_RE.findall(search.lower())
+
+
+class CouponSearch:
+
+    @staticmethod
+    def apply(query: Query, search: str, ranked: bool = True) -> Query:
+        """
+        Restrict a Coupon query to rows matching search. With ranked, also
+        order by relevance (best first, newest first among ties); leave it off
+        for count queries or when the caller orders the rows itself.
+        """
+        terms = search_terms(search)
+        if not terms:
+            return query
+        if query.session.get_bind().dialect.name == "postgresql":
+            return CouponSearch._apply_postgres(query, search, terms, ranked)
+        return CouponSearch._apply_sqlite(query, terms, ranked)
+
+    @staticmethod
+    def _apply_postgres(query: Query, search: str, terms: List[str], ranked: bool) -> Query:
+        vector = literal_column("coupons.search_vector")
+        search_text = literal_column(SEARCH_TEXT_SQL)
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        phrase = " ".join(terms)
+        escaped = re.sub(r"([\\%_])", r"\\\1", search.lower().strip())
+
+        query = query.filter(or_(
+            vector.op("@@")(tsquery),
+            literal(phrase).op("<%")(search_text),  # word_similarity above pg_trgm's threshold
+            search_text.like(f"%{escaped}%"),
+        ))
+        if ranked:
+            score = func.ts_rank_cd(vector, tsquery) + func.word_similarity(phrase, search_text)
+            query = query.order_by(score.desc(), Coupon.created_at.desc(), Coupon.id.desc())
+        return query
+
+    @staticmethod
+    def _apply_sqlite(query: Query, terms: List[str], ranked: bool) -> Query:
+        session = query.session
+        match = " ".join(f'"{term}"*' for term in terms)
+        if session.execute(
+            text("SELECT 1 FROM coupons_fts WHERE coupons_fts MATCH :match LIMIT 1"), {"match": match}
+        ).first() is None:
+            match = CouponSearch._fuzzy_match(session, terms) or match
+
+        hits = text(
+            f"SELECT rowid, bm25(coupons_fts, {_BM25_WEIGHTS}) AS rank "
+            "FROM coupons_fts WHERE coupons_fts MATCH :match"
+        ).bindparams(match=match).columns(rowid=Integer, rank=Float).subquery("fts_hits")
+
+        query = query.join(hits, literal_column("coupons.rowid") == hits.c.rowid)
+        if ranked:
+            # bm25() is lower-is-better
+            query = query.order_by(hits.c.rank.asc(), Coupon.created_at.desc(), Coupon.id.desc())
+        return query
+
+    @staticmethod
+    def _fuzzy_match(session, terms: List[str]) -> str:
+        """
+        MATCH expression with each term OR'd with its closest indexed terms
+        ('' if none are close). Candidates share the term's first letter and
+        are within two characters of its length, which keeps the vocabulary
+        scan to a range read and matches how typos usually happen.
+        """
+        clauses, corrected = [], False
+        for term in terms:
+            options = [f'"{term}"*']
+            if len(term) >= FUZZY_MIN_LENGTH:
+                vocabulary = [row[0] for row in session.execute(
+                    text(
+                        "SELECT term FROM coupons_fts_vocab WHERE term >= :lo AND term < :hi "
+                        "AND length(term) BETWEEN :shortest AND :longest"
+                    ),
+                    {"lo": term[0], "hi": chr(ord(term[0]) + 1), "shortest": len(term) - 2, "longest": len(term) + 2},
+                )]
+                for candidate in difflib.get_close_matches(term, vocabulary, FUZZY_CANDIDATES, FUZZY_CUTOFF):
+                    options.append(f'"{candidate}"')
+                    corrected = True
+            clauses.append("(" + " OR ".join(options) + ")")
+        return " AND ".join(clauses) if corrected else ""
@@ -0,0 +1,354 @@
+"""
+Coupon stock reservations in Redis.
+
+coupon_stock (a hash, coupon id -> units) holds what can still be reserved:
+coupons.stock minus every unit held by an unpaid order, or -1 for unlimited
+coupons. /payments/init reserves all of an order's units with one Lua script
+that checks and decrements every coupon atomically, so concurrent checkouts of
+a hot coupon neither oversell it nor queue on its Postgres row. The units are
+recorded in a hold (stock:hold:{order_id}), summed per coupon in stock:held,
+and stock:holds indexes open holds by deadline.
+
+- payment_intent.succeeded: the webhook decrements coupons.stock, then
+  commits the hold (drops it without returning the units).
+- payment failed / cancelled: the hold is released and its units return.
+- expiry: holds past their deadline are released by release_expired(), which
+  reserve() runs on the way in and scripts/stock_maintenance.py runs
+  periodically along with reconcile().
+
+Because available = coupons.stock - held, seed() can re-derive a counter from
+the database at any time (first use, admin edits), and reconcile() can check
+every counter against it. While Redis is down reserve() returns None and
+checkout falls back to the database check.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.models.coupon import Coupon
+from app.services.redis_service import RedisService
+from app.cache import (
+    set_cache, redis_pipeline, redis_run_script, redis_zrangebyscore, redis_hmget_many, CACHE_TTL_DAY
+)
+
+logger = logging.getLogger(__name__)
+
+STOCK_HOLD_SECONDS = int(os.getenv("STOCK_HOLD_SECONDS", 900))
+HOLD_KEY_GRACE = CACHE_TTL_DAY  # hold keys outlive their deadline so a late sweep can still release them
+SWEEP_BATCH = 100
+RECONCILE_BATCH = 500
+RECONCILE_REPORT_KEY = "stock:reconcile:last"
+
+# KEYS: coupon_stock, stock:held, stock:hold:{order}, stock:holds
+# ARGV: order id, deadline, hold key TTL, then coupon id / units pairs.
+# {1} reserved (or an existing hold extended), {0, coupon, available} short,
+# {-1, coupon...} counters not seeded yet.
+RESERVE_SCRIPT = """
+if redis.call("exists", KEYS[3]) == 1 then
+    redis.call("expire", KEYS[3], ARGV[3])
+    redis.call("zadd", KEYS[4], ARGV[2], ARGV[1])
+    return {1}
+end
+local missing = {}
+for i = 4, #ARGV, 2 do
+    local available = redis.call("hget", KEYS[1], ARGV[i])
+    if not available then
+        missing[#missing + 1] = ARGV[i]
+    elseif tonumber(available) >= 0 and tonumber(available) < tonumber(ARGV[i + 1]) then
+        return {0, ARGV[i], tonumber(available)}
+    end
+end
+if #missing > 0 then
+    return {-1, unpack(missing)}
+end
+for i = 4, #ARGV, 2 do
+    if tonumber(redis.call("hget", KEYS[1], ARGV[i])) >= 0 then
+        redis.call("hincrby", KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+        redis.call("hincrby", KEYS[2], ARGV[i], ARGV[i + 1])
+        redis.call("hset", KEYS[3], ARGV[i], ARGV[i + 1])
+    end
+end
+if redis.call("exists", KEYS[3]) == 1 then
+    redis.call("expire", KEYS[3], ARGV[3])
+    redis.call("zadd", KEYS[4], ARGV[2], ARGV[1])
+end
+return {1}
+"""
+
+# KEYS as above. ARGV: order id. Returns the units to coupon_stock and drops
+# the hold; replies with the number of coupons it held.
+RELEASE_SCRIPT = """
+local held = redis.call("hgetall", KEYS[3])
+for i = 1, #held, 2 do
+    if redis.call("hincrby", KEYS[2], held[i], -tonumber(held[i + 1])) <= 0 then
+        redis.call("hdel", KEYS[2], held[i])
+    end
+    local available = redis.call("hget", KEYS[1], held[i])
+    if available and tonumber(available) >= 0 then
+        redis.call("hincrby", KEYS[1], held[i], held[i + 1])
+    end
+end
+redis.call("del", KEYS[3])
+redis.call("zrem", KEYS[4], ARGV[1])
+return #held / 2
+"""
+
+# KEYS as above. ARGV: order id, then coupon id / units pairs. {1}: the hold
+# is dropped, its units stay sold. {0, coupon...}: the hold had already been
+# released, so the units are taken now; listed coupons ran short (oversold).
+COMMIT_SCRIPT = """
+if redis.call("exists", KEYS[3]) == 1 then
+    local held = redis.call("hgetall", KEYS[3])
+    for i = 1, #held, 2 do
+        if redis.call("hincrby", KEYS[2], held[i], -tonumber(held[i + 1])) <= 0 then
+            redis.call("hdel", KEYS[2], held[i])
+        end
+    end
+    redis.call("del", KEYS[3])
+    redis.call("zrem", KEYS[4], ARGV[1])
+    return {1}
+end
+local short = {}
+for i = 2, #ARGV, 2 do
+    local available = redis.call("hget", KEYS[1], ARGV[i])
+    if available and tonumber(available) >= 0 then
+        if redis.call("hincrby", KEYS[1], ARGV[i], -tonumber(ARGV[i + 1])) < 0 then
+            redis.call("hset", KEYS[1], ARGV[i], 0)
+            short[#short + 1] = ARGV[i]
+        end
+    end
+end
+redis.call("zrem", KEYS[4], ARGV[1])
+return {0, unpack(short)}
+"""
+
+# KEYS: coupon_stock, stock:held. ARGV: "1" to only fill missing counters,
+# then coupon id / database stock (-1 unlimited) pairs. Sets each counter to
+# max(stock - held, 0) and replies with the resulting counters.
+SEED_SCRIPT = """
+local counters = {}
+for i = 2, #ARGV, 2 do
+    local current = redis.call("hget", KEYS[1], ARGV[i])
+    if ARGV[1] == "1" and current then
+        counters[#counters + 1] = tonumber(current)
+    else
+        local available = tonumber(ARGV[i + 1])
+        if available >= 0 then
+            available = math.max(available - tonumber(redis.call("hget", KEYS[2], ARGV[i]) or 0), 0)
+        end
+        redis.call("hset", KEYS[1], ARGV[i], available)
+        counters[#counters + 1] = available
+    end
+end
+return counters
+"""
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+@dataclass
+class Reservation:
+    reserved: bool
+    coupon_id: Optional[str] = None  # first coupon short of stock
+    requested: int = 0
+    available: int = 0
+
+
+class StockService:
+
+    STOCK_KEY = RedisService.STOCK_KEY
+    HELD_KEY = "stock:held"
+    HOLD_PREFIX = "stock:hold"
+    HOLDS_INDEX = "stock:holds"
+
+    @staticmethod
+    def _keys(order_id) -> list:
+        return [StockService.STOCK_KEY, StockService.HELD_KEY, f"{StockService.HOLD_PREFIX}:{order_id}", StockService.HOLDS_INDEX]
+
+    @staticmethod
+    def _pairs(quantities: Dict) -> list:
+        args = []
+        for coupon_id, units in quantities.items():
+            args += [str(coupon_id), units]
+        return args
+
+    @staticmethod
+    def order_quantities(items) -> Dict[UUID, int]:
+        """
+        Units per coupon id across order items (whole units; order_items.quantity
+        is a float column). A package takes one of each of its coupons per unit.
+        """
+        quantities = {}
+        for item in items:
+            if item.coupon_id:
+                coupon_ids = [item.coupon_id]
+            elif item.package_id and item.package:
+                coupon_ids = [assoc.coupon_id for assoc in item.package.coupon_associations]
+            else:
+                continue
+            for coupon_id in coupon_ids:
+                quantities[coupon_id] = quantities.get(coupon_id, 0) + int(item.quantity)
+        return quantities
+
+    @staticmethod
+    def reserve(db: Session, order_id, quantities: Dict) -> Optional[Reservation]:
+        """
+        Hold quantities (coupon id -> units) for an order, all or nothing, for
+        STOCK_HOLD_SECONDS. Reserving an order that already holds stock extends
+        its hold. None when Redis is unavailable.
+        """
+        if not quantities:
+            return Reservation(True)
+        StockService.release_expired()
+        requested = {str(coupon_id): units for coupon_id, units in quantities.items()}
+        args = [str(order_id), time.time() + STOCK_HOLD_SECONDS, STOCK_HOLD_SECONDS + HOLD_KEY_GRACE]
+        args += StockService._pairs(requested)
+        for attempt in range(2):
+            reply = redis_run_script(RESERVE_SCRIPT, StockService._keys(order_id), args)
+            if reply is None:
+                return None
+            status = int(reply[0])
+            if status == 1:
+                return Reservation(True)
+            if status == 0:
+                coupon_id = _text(reply[1])
+                return Reservation(False, coupon_id, requested[coupon_id], int(reply[2]))
+            if attempt == 0:
+                StockService.sync(db, [_text(c) for c in reply[1:]], only_missing=True)
+        logger.warning(f"Stock counters could not be seeded for order {order_id}")
+        return None
+
+    @staticmethod
+    def commit(order_id, quantities: Dict) -> bool:
+        """
+        Settle a paid order's hold after coupons.stock has been decremented.
+        False when the hold had already expired; the units are then taken
+        from the counters directly.
+        """
+        if not quantities:
+            return True
+        reply = redis_run_script(
+            COMMIT_SCRIPT, StockService._keys(order_id), [str(order_id)] + StockService._pairs(quantities)
+        )
+        if reply is None:
+            return False
+        if int(reply[0]) == 1:
+            return True
+        short = [_text(c) for c in reply[1:]]
+        if short:
+            logger.error(f"Order {order_id} was paid after its stock hold expired; oversold coupons: {short}")
+        return False
+
+    @staticmethod
+    def release(order_id, pipe=None) -> int:
+        """Return an unpaid order's held units to stock. Number of coupons released."""
+        released = redis_run_script(RELEASE_SCRIPT, StockService._keys(order_id), [str(order_id)], default=0, pipe=pipe)
+        return 0 if pipe is not None else int(released)
+
+    @staticmethod
+    def release_expired(limit: int = SWEEP_BATCH) -> int:
+        """Release up to limit holds past their deadline, in one round trip. Returns how many."""
+        order_ids = redis_zrangebyscore(StockService.HOLDS_INDEX, 0, time.time(), limit)
+        if not order_ids:
+            return 0
+        with redis_pipeline() as pipe:
+            if pipe is None:
+                return 0
+            for order_id in order_ids:
+                StockService.release(order_id, pipe=pipe)
+        logger.info(f"Released {len(order_ids)} expired stock holds")
+        return len(order_ids)
+
+    @staticmethod
+    def seed(stocks: Dict, only_missing: bool = False) -> Dict[str, int]:
+        """
+        Set counters from database stock (coupon id -> coupons.stock, None for
+        unlimited), net of outstanding holds. With only_missing, existing
+        counters are kept. Returns the resulting counters.
+        """
+        if not stocks:
+            return {}
+        stocks = {str(coupon_id): -1 if stock is None else stock for coupon_id, stock in stocks.items()}
+        reply = redis_run_script(
+            SEED_SCRIPT, [StockService.STOCK_KEY, StockService.HELD_KEY],
+            ["1" if only_missing else "0"] + StockService._pairs(stocks),
+        )
+        if reply is None:
+            return {}
+        return {coupon_id: int(counter) for coupon_id, counter in zip(stocks, reply)}
+
+    @staticmethod
+    def sync(db: Session, coupon_ids: Iterable, only_missing: bool = False) -> Dict[str, int]:
+        """seed() the given coupons from the coupons table (one query)."""
+        ids = [coupon_id if isinstance(coupon_id, UUID) else UUID(str(coupon_id)) for coupon_id in coupon_ids]
+        if not ids:
+            return {}
+        rows = db.query(Coupon.id, Coupon.stock).filter(Coupon.id.in_(ids)).all()
+        return StockService.seed({coupon_id: stock for coupon_id, stock in rows}, only_missing=only_missing)
+
+    @staticmethod
+    def reconcile(db: Session, batch_size: int = RECONCILE_BATCH) -> dict:
+        """
+        Check every coupon_stock counter against coupons.stock minus held units
+        and reseed the ones that drifted. Walks the coupons table by primary key
+        (keyset batches, no OFFSET); each batch costs one query, one MULTI'd
+        HMGET of counters and held units, and at most one seed script call.
+        Counters that were never seeded are left for first use.
+
+        A sale the webhook has written to the database but not yet committed in
+        Redis shows up as drift and is reseeded low by its units; the next run
+        puts it back. Returns drift metrics, also logged and stored under
+        RECONCILE_REPORT_KEY.
+        """
+        started = time.monotonic()
+        report = {"coupons": 0, "counters": 0, "drifted": 0, "overcounted": 0, "units_drift": 0, "max_drift": 0}
+        last_id = None
+        while True:
+            query = db.query(Coupon.id, Coupon.stock).order_by(Coupon.id)
+            if last_id is not None:
+                query = query.filter(Coupon.id > last_id)
+            rows = query.limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            report["coupons"] += len(rows)
+
+            fields = [str(coupon_id) for coupon_id, _ in rows]
+            snapshot = redis_hmget_many({StockService.STOCK_KEY: fields, StockService.HELD_KEY: fields})
+            if snapshot is None:
+                report["error"] = "redis unavailable"
+                break
+            drifted = {}
+            for (coupon_id, stock), counter, held in zip(rows, snapshot[StockService.STOCK_KEY], snapshot[StockService.HELD_KEY]):
+                if counter is None:
+                    continue
+                report["counters"] += 1
+                counter = int(counter)
+                expected = -1 if stock is None else max(stock - int(held or 0), 0)
+                if counter == expected:
+                    continue
+                drifted[coupon_id] = stock
+                # Counting more than the database has is the direction that oversells
+                if expected >= 0 and (counter < 0 or counter > expected):
+                    report["overcounted"] += 1
+                if counter >= 0 and expected >= 0:
+                    report["units_drift"] += abs(counter - expected)
+                    report["max_drift"] = max(report["max_drift"], abs(counter - expected))
+            if drifted:
+                report["drifted"] += len(drifted)
+                StockService.seed(drifted)
+            if len(rows) < batch_size:
+                break
+
+        report["duration_ms"] = round((time.monotonic() - started) * 1000, 1)
+        log = logger.warning if report["drifted"] else logger.info
+        log(f"Stock reconcile: {report}")
+        set_cache(RECONCILE_REPORT_KEY, {**report, "finished_at": time.time()}, ttl=CACHE_TTL_DAY)
+        return report
@@ -147,6 +147,9 @@ class StripePaymentService:
                 payment.status = PaymentStatus.CANCELLED.value
                 self.db.commit()
                 
+                from app.services.stock_service import StockService
+                StockService.release(payment.order_id)
+                
             return True
         except Exception as e:
             logger.error(f"Failed to cancel PaymentIntent {payment_intent_id}: {e}")
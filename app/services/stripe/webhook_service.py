@@ -112,21 +112,10 @@ class StripeWebhookService:
             
             # Collect all coupons to grant and stock to decrement
             from app.models.user_coupon import UserCoupon
-            from app.models.order import OrderItem
+            from app.services.stock_service import StockService
             
-            coupons_to_grant = []
-            coupons_to_decrement = {}  # coupon_id -> quantity
-            
-            # Get all order items with their coupons/packages
-            for item in order.items:
-                if item.coupon_id:
-                    coupons_to_grant.append(item.coupon_id)
-                    coupons_to_decrement[item.coupon_id] = coupons_to_decrement.get(item.coupon_id, 0) + item.quantity
-                elif item.package_id and item.package:
-                    # Grant all coupons in the package
-                    for assoc in item.package.coupon_associations:
-                        coupons_to_grant.append(assoc.coupon_id)
-                        coupons_to_decrement[assoc.coupon_id] = coupons_to_decrement.get(assoc.coupon_id, 0) + item.quantity
+            coupons_to_decrement = StockService.order_quantities(order.items)  # coupon_id -> quantity
+            coupons_to_grant = list(coupons_to_decrement)
             
             # Batch insert user coupons (avoid N+1)
             if coupons_to_grant:
@@ -140,42 +129,40 @@ class StripeWebhookService:
                 # Add only new coupons
                 new_user_coupons = [
                     UserCoupon(user_id=order.user_id, coupon_id=coupon_id)
-                    for coupon_id in set(coupons_to_grant)
+                    for coupon_id in coupons_to_grant
                     if coupon_id not in existing_coupon_ids
                 ]
                 if new_user_coupons:
                     self.db.bulk_save_objects(new_user_coupons)
                     logger.info(f"Added {len(new_user_coupons)} coupons to user {order.user_id} wallet")
             
-            # Batch decrement stock/usage (optimized)
-            from app.services.coupon_service import CouponService
-            if coupons_to_decrement:
-                for coupon_id, quantity in coupons_to_decrement.items():
-                    # Use atomic update to avoid race conditions
-                    from app.models.coupon import Coupon
-                    self.db.query(Coupon).filter(Coupon.id == coupon_id).update(
-                        {
-                            Coupon.stock: Coupon.stock - quantity,
-                            Coupon.current_uses: Coupon.current_uses + quantity
-                        },
-                        synchronize_session=False
-                    )
-                
-            for item in order.items:
-                if item.coupon_id:
-                     success = CouponService.increment_usage(self.db, item.coupon_id, item.quantity)
-                     if not success:
-                         logger.error(f"Failed to increment usage for coupon {item.coupon_id} on order {order.id} - Possible overselling")
-                         # Note: Payment already succeeded, so we can't rollback payment easily here.
-                         # We just log it. The user gets the coupon anyway. 
-                         # The pre-check in /init should prevent this 99% of time.
+            # Decrement stock/usage with one atomic UPDATE per coupon. The units
+            # were reserved in Redis at /payments/init, so this never has to
+            # lock the row to check availability first.
+            from app.models.coupon import Coupon
+            for coupon_id, quantity in coupons_to_decrement.items():
+                self.db.query(Coupon).filter(Coupon.id == coupon_id).update(
+                    {
+                        Coupon.stock: Coupon.stock - quantity,
+                        Coupon.current_uses: Coupon.current_uses + quantity
+                    },
+                    synchronize_session=False
+                )
+
+            from app.services.daily_stats_service import DailyStatsService
+            DailyStatsService.record_order(self.db, order)
         
         self.db.commit()
         
         # Invalidate relevant caches
-        from app.cache import invalidate_cache
-        invalidate_cache(f"user:{order.user_id}:*")
-        invalidate_cache("coupons:*")
+        from app.cache import delete_cache, invalidate_namespace, user_namespace, NS_COUPONS_LIST
+        from app.services.coupon_service import CouponService
+        if order:
+            # After the database commit: dropping the hold first would let a
+            # resync count these units as available again
+            StockService.commit(order.id, coupons_to_decrement)
+            delete_cache(*[CouponService.entity_key(cid) for cid in coupons_to_decrement])
+            invalidate_namespace(NS_COUPONS_LIST, user_namespace(order.user_id))
         
         logger.info(f"Payment {payment.id} marked as succeeded")
         
@@ -220,6 +207,7 @@ class StripeWebhookService:
             order.payment_state = "payment_failed"
         
         self.db.commit()
+        self._release_stock(payment.order_id)
         
         logger.info(f"Payment {payment.id} marked as failed: {failure_reason}")
         
@@ -253,6 +241,7 @@ class StripeWebhookService:
             order.payment_state = "payment_cancelled"
         
         self.db.commit()
+        self._release_stock(payment.order_id)
         
         return {"status": "success", "payment_id": str(payment.id)}
 
@@ -327,6 +316,11 @@ class StripeWebhookService:
         except Exception as e:
             logger.error(f"Failed to send outbound webhook: {e}")
 
+    def _release_stock(self, order_id):
+        """Return the units an unpaid order held since /payments/init."""
+        from app.services.stock_service import StockService
+        StockService.release(order_id)
+
     def _get_payment_by_intent(self, payment_intent_id: str):
         """Get payment by Stripe PaymentIntent ID"""
         return self.db.query(Payment).filter(
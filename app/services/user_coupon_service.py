@@ -1,10 +1,11 @@
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 from uuid import UUID
 from typing import List, Optional
 from datetime import datetime, timezone
 
 from app.models.user_coupon import UserCoupon
 from app.models.coupon import Coupon
+from app.read_models import CouponDTO
 from app.services.coupon_service import CouponService
 
 
@@ -38,11 +39,14 @@ class UserCouponService:
         )
         db.add(user_coupon)
         
-        # Increment usage count
-        coupon.current_uses += 1
+        # Increment usage count in the database (coupon is a read-only snapshot)
+        db.query(Coupon).filter(Coupon.id == coupon_id).update(
+            {Coupon.current_uses: Coupon.current_uses + 1}, synchronize_session=False
+        )
         
         db.commit()
         db.refresh(user_coupon)
+        CouponService.invalidate_cached(coupon_id)
         return user_coupon, "Coupon claimed successfully"
 
     @staticmethod
@@ -61,13 +65,12 @@ class UserCouponService:
     # ---- Wallet Methods ----
 
     @staticmethod
-    def _coupon_status(user_coupon: UserCoupon) -> str:
+    def _coupon_status(user_coupon: UserCoupon, coupon: CouponDTO) -> str:
         """Determine the status of a user coupon: used, expired, or active"""
         # Priority: used > expired > active
         if user_coupon.used_at is not None:
             return "used"
         
-        coupon = user_coupon.coupon
         now = datetime.now(timezone.utc)
         if not coupon.is_active:
             return "expired"
@@ -80,14 +83,18 @@ class UserCouponService:
                 return "expired"
         return "active"
 
+    @staticmethod
+    def _coupons_for(db: Session, user_coupons: List[UserCoupon]) -> dict:
+        """The claimed coupons of these wallet rows by id, hydrated in one batch."""
+        return {c.id: c for c in CouponService.get_many(db, [uc.coupon_id for uc in user_coupons])}
+
     @staticmethod
     def get_wallet_summary(db: Session, user_id: UUID) -> dict:
         """Get wallet summary counts: total, active, used, expired"""
         user_coupons = db.query(UserCoupon).filter(
             UserCoupon.user_id == user_id
-        ).options(
-            joinedload(UserCoupon.coupon)
         ).all()
+        coupons = UserCouponService._coupons_for(db, user_coupons)
 
         total = len(user_coupons)
         active = 0
@@ -95,8 +102,9 @@ class UserCouponService:
         expired = 0
 
         for uc in user_coupons:
-            if uc.coupon:
-                status = UserCouponService._coupon_status(uc)
+            coupon = coupons.get(uc.coupon_id)
+            if coupon:
+                status = UserCouponService._coupon_status(uc, coupon)
                 if status == "active":
                     active += 1
                 elif status == "used":
@@ -116,13 +124,12 @@ class UserCouponService:
         """Get all wallet coupons with rich details"""
         user_coupons = db.query(UserCoupon).filter(
             UserCoupon.user_id == user_id
-        ).options(
-            joinedload(UserCoupon.coupon).joinedload(Coupon.category)
         ).order_by(UserCoupon.claimed_at.desc()).all()
+        coupons = UserCouponService._coupons_for(db, user_coupons)
 
         results = []
         for uc in user_coupons:
-            coupon = uc.coupon
+            coupon = coupons.get(uc.coupon_id)
             if not coupon:
                 continue
 
@@ -142,7 +149,7 @@ class UserCouponService:
                 "is_active": coupon.is_active,
                 "purchased_date": uc.claimed_at,
                 "expires_date": coupon.expiration_date,
-                "status": UserCouponService._coupon_status(uc),
+                "status": UserCouponService._coupon_status(uc, coupon),
             })
 
         return results
@@ -153,14 +160,12 @@ class UserCouponService:
         uc = db.query(UserCoupon).filter(
             UserCoupon.user_id == user_id,
             UserCoupon.coupon_id == coupon_id
-        ).options(
-            joinedload(UserCoupon.coupon).joinedload(Coupon.category)
         ).first()
+        coupon = CouponService.get_by_id(db, coupon_id) if uc else None
 
-        if not uc or not uc.coupon:
+        if not uc or not coupon:
             return None
 
-        coupon = uc.coupon
         category_data = None
         if coupon.category:
             category_data = {"id": coupon.category.id, "name": coupon.category.name}
@@ -179,7 +184,7 @@ class UserCouponService:
             "is_active": coupon.is_active,
             "purchased_date": uc.claimed_at,
             "expires_date": coupon.expiration_date,
-            "status": UserCouponService._coupon_status(uc),
+            "status": UserCouponService._coupon_status(uc, coupon),
         }
 
     @staticmethod
@@ -188,8 +193,6 @@ class UserCouponService:
         uc = db.query(UserCoupon).filter(
             UserCoupon.user_id == user_id,
             UserCoupon.coupon_id == coupon_id
-        ).options(
-            joinedload(UserCoupon.coupon).joinedload(Coupon.category)
         ).first()
 
         if not uc:
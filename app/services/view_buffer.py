@@ -0,0 +1,149 @@
+"""
+Per-worker write-behind buffer for coupon view rows.
+
+POST /coupons/{id}/view is the highest-volume write. Instead of an INSERT and
+COMMIT per request, track_view() appends the row (viewed_at stamped at
+request time) to this worker's buffer. A daemon thread writes the buffer out
+as multi-row INSERTs in one transaction every VIEW_FLUSH_MS, or as soon as
+VIEW_FLUSH_ROWS rows are waiting.
+
+Flushes do not invalidate the analytics namespace: at up to four flushes a
+second per worker that would keep every analytics cache permanently cold.
+New views show up in analytics once the cached aggregates expire
+(CACHE_TTL_SHORT for quick stats, CACHE_TTL_MEDIUM for the rest), the same
+as new orders.
+
+Bounds:
+- Loss: a crashed worker loses what it had not flushed, at most
+  VIEW_FLUSH_MS of views and never more than VIEW_BUFFER_MAX rows. A clean
+  shutdown flushes at exit.
+- Memory / backpressure: a request that finds VIEW_BUFFER_MAX rows waiting
+  drains the buffer itself before returning, so producers slow down to the
+  database's pace instead of growing the buffer. If the database is down,
+  rows beyond VIEW_BUFFER_MAX are dropped (counted in stats()).
+
+VIEW_FLUSH_MS=0 turns buffering off: each view is written by the request.
+"""
+import atexit
+import logging
+import os
+import threading
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.coupon_view import CouponView
+from app.services.daily_stats_service import DailyStatsService
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_MS = int(os.getenv("VIEW_FLUSH_MS", 250))
+VIEW_FLUSH_ROWS = int(os.getenv("VIEW_FLUSH_ROWS", 500))
+VIEW_BUFFER_MAX = int(os.getenv("VIEW_BUFFER_MAX", 10000))
+
+
+def write_views(session: Session, rows: List[dict]) -> None:
+    """
+    Roll the rows up into the daily stats, insert them in multi-row INSERTs of
+    at most VIEW_FLUSH_ROWS, then commit both together.
+    """
+    DailyStatsService.record_views(session, rows)
+    for start in range(0, len(rows), VIEW_FLUSH_ROWS):
+        session.execute(insert(CouponView), rows[start:start + VIEW_FLUSH_ROWS])
+    session.commit()
+
+
+class ViewBuffer:
+
+    def __init__(self, flush_ms: int = VIEW_FLUSH_MS, flush_rows: int = VIEW_FLUSH_ROWS, max_rows: int = VIEW_BUFFER_MAX):
+        self.flush_interval = flush_ms / 1000.0
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self._rows: List[dict] = []
+        self._bind = None
+        self._lock = threading.Lock()        # guards _rows/_bind
+        self._flush_lock = threading.Lock()  # one writer at a time
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"flushed": 0, "flushes": 0, "request_flushes": 0, "failed_flushes": 0, "dropped": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval > 0
+
+    def add(self, db: Session, row: dict) -> None:
+        """Queue one coupon_views row; written by the request itself when buffering is off."""
+        if not self.enabled:
+            write_views(db, [row])
+            return
+        with self._lock:
+            self._bind = db.get_bind()
+            self._rows.append(row)
+            pending = len(self._rows)
+        self._ensure_flusher()
+        if pending >= self.max_rows:
+            self._stats["request_flushes"] += 1
+            self.flush()
+        elif pending >= self.flush_rows:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write out everything buffered so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                bind = self._bind
+            if not rows:
+                return 0
+            session = SessionLocal(bind=bind)
+            try:
+                write_views(session, rows)
+            except Exception as e:
+                session.rollback()
+                self._requeue(rows)
+                self._stats["failed_flushes"] += 1
+                logger.error(f"View buffer flush of {len(rows)} rows failed: {e}")
+                return 0
+            finally:
+                session.close()
+            self._stats["flushed"] += len(rows)
+            self._stats["flushes"] += 1
+        return len(rows)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "pending": self.pending(), **self._stats}
+
+    def _requeue(self, rows: List[dict]) -> None:
+        # Put failed rows back in front of newer ones, keeping the buffer bounded
+        with self._lock:
+            room = max(self.max_rows - len(self._rows), 0)
+            self._stats["dropped"] += max(len(rows) - room, 0)
+            self._rows[:0] = rows[max(len(rows) - room, 0):]
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="view-buffer-flusher", daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("View buffer flusher error")
+
+
+view_buffer = ViewBuffer()
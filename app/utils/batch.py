@@ -0,0 +1,42 @@
+"""
+Id lists for batch lookup endpoints (GET /coupons/batch, /packages/batch).
+
+Ids arrive as ?ids=a,b,c (repeating ?ids= works too). They are resolved in
+one cache multi-get plus one IN query for the misses, so the list is capped
+to keep both bounded.
+"""
+from typing import List, Tuple
+from uuid import UUID
+
+MAX_BATCH_IDS = 100
+
+
+class TooManyIds(ValueError):
+    """Raised when a batch asks for more than MAX_BATCH_IDS ids."""
+
+
+def parse_ids(values: List[str], max_ids: int = MAX_BATCH_IDS) -> Tuple[List[UUID], List[str]]:
+    """
+    Split ids query values into (ids, malformed), both in request order with
+    duplicates dropped. Malformed values are returned as sent, so the caller
+    can report them with the ids that weren't found.
+    """
+    ids, malformed, seen = [], [], set()
+    for value in values:
+        for raw in value.split(","):
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                parsed = UUID(raw)
+            except ValueError:
+                if raw not in seen:
+                    seen.add(raw)
+                    malformed.append(raw)
+                continue
+            if parsed not in seen:
+                seen.add(parsed)
+                ids.append(parsed)
+    if len(ids) + len(malformed) > max_ids:
+        raise TooManyIds(f"At most {max_ids} ids per batch")
+    return ids, malformed
@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, serialized to an opaque
+URL-safe token. The next page is "rows whose sort key sorts after the
+cursor", which a composite index answers with one range scan however deep the
+page is, and which doesn't shift when rows are inserted ahead of it.
+
+Keys sort DESC unless the caller says otherwise, column by column, and end
+with the primary key, so they are unique.
+"""
+import base64
+import json
+from datetime import datetime
+from itertools import groupby
+from typing import Any, Callable, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import and_, or_, tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we didn't issue (or for another sort)."""
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque token for a sort key (datetime/UUID/number/str values)."""
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> tuple:
+    """Inverse of encode_cursor(); types convert each value back (e.g. datetime.fromisoformat, UUID)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursor("Invalid cursor")
+        return tuple(None if v is None else convert(v) for convert, v in zip(types, values))
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def _after(columns: Sequence, values: Sequence, directions: Sequence[str]):
+    """Row filter for "sorts after values"; runs of one direction compare as a single row value."""
+    runs = [list(run) for _, run in groupby(zip(columns, values, directions), key=lambda item: item[2])]
+    condition = None
+    for run in reversed(runs):
+        cols = [column for column, _, _ in run]
+        vals = tuple(value for _, value, _ in run)
+        beyond = tuple_(*cols) > vals if run[0][2] == "asc" else tuple_(*cols) < vals
+        if condition is not None:
+            beyond = or_(beyond, and_(*[column == value for column, value in zip(cols, vals)], condition))
+        condition = beyond
+    return condition
+
+
+def keyset_after(query, columns: Sequence, cursor_values: Optional[tuple], directions: Optional[Sequence[str]] = None):
+    """
+    Order query by columns and, given a cursor, keep only the rows after it.
+    directions gives "asc" or "desc" per column (default: all DESC). Nullable
+    columns should be wrapped in coalesce() by the caller so the row
+    comparison stays total.
+    """
+    directions = list(directions or ["desc"] * len(columns))
+    if cursor_values is not None:
+        query = query.filter(_after(columns, cursor_values, directions))
+    return query.order_by(*[
+        column.asc() if direction == "asc" else column.desc() for column, direction in zip(columns, directions)
+    ])
+
+
+def next_cursor(rows: list, limit: int, key: Callable[[Any], tuple]) -> Optional[str]:
+    """Cursor for the page after rows, or None when this was the last page."""
+    if len(rows) < limit or not rows:
+        return None
+    return encode_cursor(*key(rows[-1]))
@@ -8,7 +8,7 @@ from typing import Optional
 from app.config import JWT_SECRET, JWT_ALGORITHM
 from app.database import get_db
 from app.models.user import User
-from app.cache import get_cache, set_cache, cache_key, invalidate_cache, CACHE_TTL_SHORT
+from app.cache import get_cache, set_cache, cache_key, delete_cache, CACHE_TTL_SHORT
 
 pwd_context = CryptContext(
     schemes=["argon2"],
@@ -31,7 +31,7 @@ def get_password_hash(password):
 
 def invalidate_user_cache(user_id: str):
     """Call this when user profile is updated."""
-    invalidate_cache(f"user:auth:{user_id}")
+    delete_cache(cache_key("user", "auth", user_id))
 
 
 def get_current_user(
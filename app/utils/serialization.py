@@ -0,0 +1,57 @@
+"""
+Fast JSON responses for payloads the services already built.
+
+A route with response_model=... validates whatever it returns against the
+model field by field, serializes the validated copy and then json.dumps() it.
+For list endpoints fed from the entity cache that is most of the request's
+CPU. Those routes instead project each item onto the response model's fields
+with project() (the schema's payload() classmethod adds its computed fields)
+and return PrevalidatedJSONResponse, which FastAPI passes through untouched
+and which encodes with pydantic-core's Rust encoder. Routes keep
+response_model, so the OpenAPI schema is unchanged.
+
+Only use this for values built by our own code: nothing is validated or
+coerced, so a payload must already hold exactly what the model would emit.
+tests/test_serialization.py checks both paths produce the same JSON.
+"""
+from functools import lru_cache
+from typing import Any, Tuple
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import Response
+
+
+class PrevalidatedJSONResponse(Response):
+    """JSON response for payloads built with project() (or already-encoded bytes)."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return to_json(content)
+
+
+@lru_cache(maxsize=None)
+def _fields(model: type) -> Tuple[tuple, ...]:
+    return tuple(
+        (name, info.is_required(), info.default_factory, info.default)
+        for name, info in model.model_fields.items()
+    )
+
+
+def project(model: type[BaseModel], data: dict) -> dict:
+    """
+    data restricted to model's fields, with the model's defaults for absent
+    ones. Nested values are passed through as they are. Raises KeyError for a
+    missing required field.
+    """
+    payload = {}
+    for name, required, default_factory, default in _fields(model):
+        if name in data:
+            payload[name] = data[name]
+        elif required:
+            raise KeyError(f"{model.__name__}.{name}")
+        else:
+            payload[name] = default_factory() if default_factory is not None else default
+    return payload
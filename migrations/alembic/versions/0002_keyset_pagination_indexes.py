@@ -0,0 +1,40 @@
+"""Composite indexes backing keyset (cursor) pagination.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+
+Each index matches a listing's sort key, (created_at, id) newest first,
+behind its equality filter, so a cursor page is a single index range scan.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ("ix_coupons_active_created_id", "coupons(is_active, created_at DESC, id DESC)"),
+    ("ix_packages_active_created_id", "packages(is_active, created_at DESC, id DESC)"),
+    ("ix_orders_created_id", "orders(created_at DESC, id DESC)"),
+    ("ix_orders_status_created_id", "orders(status, created_at DESC, id DESC)"),
+    ("ix_users_created_id", "users(created_at DESC, id DESC)"),
+)
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    for name, target in INDEXES:
+        conn.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    for name, _ in INDEXES:
+        conn.execute(sa.text(f"DROP INDEX IF EXISTS {name}"))
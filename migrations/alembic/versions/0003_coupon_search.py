@@ -0,0 +1,53 @@
+"""Indexed full-text and trigram search over coupons.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+
+Adds the generated, weighted ``search_vector`` tsvector column with a GIN
+index, and a pg_trgm GIN index over the lower-cased title/brand/code text
+(typo-tolerant and substring matches). Both replace sequential
+``lower(col) LIKE '%term%'`` scans; see app.services.search_service.
+The expressions must match app.models.coupon exactly.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    def run(sql: str) -> None:
+        conn.execute(sa.text(sql))
+
+    run("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    run("""
+        ALTER TABLE coupons ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(brand, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(code, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+        ) STORED
+    """)
+    run("CREATE INDEX IF NOT EXISTS ix_coupons_search_vector ON coupons USING gin (search_vector)")
+    run("""
+        CREATE INDEX IF NOT EXISTS ix_coupons_search_trgm ON coupons USING gin ((
+            lower(coalesce(coupons.title, '') || ' ' || coalesce(coupons.brand, '') || ' ' || coupons.code)
+        ) gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("DROP INDEX IF EXISTS ix_coupons_search_trgm"))
+    conn.execute(sa.text("DROP INDEX IF EXISTS ix_coupons_search_vector"))
+    conn.execute(sa.text("ALTER TABLE coupons DROP COLUMN IF EXISTS search_vector"))
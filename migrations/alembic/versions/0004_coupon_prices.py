@@ -0,0 +1,60 @@
+"""Normalized per-currency coupon prices.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+
+Adds ``coupon_prices`` (one row per coupon and currency, amounts in integer
+minor units) with a (currency, price_cents) index for price filters and
+sorting, and backfills it from ``coupons.pricing``. CouponService keeps it in
+sync from then on; see app.models.coupon_price.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    def run(sql: str) -> None:
+        conn.execute(sa.text(sql))
+
+    run("""
+        CREATE TABLE IF NOT EXISTS coupon_prices (
+            coupon_id UUID NOT NULL REFERENCES coupons(id) ON DELETE CASCADE,
+            currency VARCHAR(3) NOT NULL,
+            price_cents INTEGER NOT NULL,
+            discount_cents INTEGER,
+            PRIMARY KEY (coupon_id, currency)
+        )
+    """)
+    run("CREATE INDEX IF NOT EXISTS ix_coupon_prices_currency_price ON coupon_prices (currency, price_cents)")
+    # Same reading as CouponService.price_rows(): {"USD": {"price": 1.99, ...}} or {"USD": 1.99}
+    run("""
+        INSERT INTO coupon_prices (coupon_id, currency, price_cents, discount_cents)
+        SELECT c.id, upper(p.key),
+               round(CASE jsonb_typeof(p.value)
+                     WHEN 'object' THEN (p.value ->> 'price')::numeric
+                     ELSE (p.value #>> '{}')::numeric END * 100)::integer,
+               CASE WHEN jsonb_typeof(p.value -> 'discount_amount') = 'number'
+                    THEN round((p.value ->> 'discount_amount')::numeric * 100)::integer END
+        FROM coupons c, jsonb_each(c.pricing::jsonb) p
+        WHERE jsonb_typeof(c.pricing::jsonb) = 'object'
+          AND length(p.key) = 3
+          AND (jsonb_typeof(p.value) = 'number' OR jsonb_typeof(p.value -> 'price') = 'number')
+        ON CONFLICT (coupon_id, currency) DO NOTHING
+    """)
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("DROP TABLE IF EXISTS coupon_prices"))
@@ -0,0 +1,60 @@
+"""Daily analytics rollups.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16
+
+Adds ``coupon_daily_stats`` and ``category_daily_stats``: per-day views,
+unique viewers, paid order lines and revenue, which the admin analytics read
+instead of scanning ``coupon_views`` and ``order_items``. The tables start
+empty; run ``python scripts/backfill_daily_stats.py`` once after upgrading.
+DailyStatsService keeps them current from then on; see app.models.daily_stats.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    def run(sql: str) -> None:
+        conn.execute(sa.text(sql))
+
+    run("""
+        CREATE TABLE IF NOT EXISTS coupon_daily_stats (
+            coupon_id UUID NOT NULL REFERENCES coupons(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            unique_viewers INTEGER NOT NULL DEFAULT 0,
+            sold INTEGER NOT NULL DEFAULT 0,
+            revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (coupon_id, day)
+        )
+    """)
+    run("CREATE INDEX IF NOT EXISTS ix_coupon_daily_stats_day ON coupon_daily_stats (day)")
+    run("""
+        CREATE TABLE IF NOT EXISTS category_daily_stats (
+            category_id UUID NOT NULL REFERENCES categories(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            views INTEGER NOT NULL DEFAULT 0,
+            sold INTEGER NOT NULL DEFAULT 0,
+            revenue DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (category_id, day)
+        )
+    """)
+    run("CREATE INDEX IF NOT EXISTS ix_category_daily_stats_day ON category_daily_stats (day)")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("DROP TABLE IF EXISTS category_daily_stats"))
+    conn.execute(sa.text("DROP TABLE IF EXISTS coupon_daily_stats"))
@@ -0,0 +1,42 @@
+"""Per-day viewer ledger for the unique-viewer rollup.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+Adds ``coupon_daily_viewers``: the (coupon, day, viewer) triples already
+counted in ``coupon_daily_stats.unique_viewers``. Flushes insert into it with
+ON CONFLICT DO NOTHING and count only the rows they inserted, so two workers
+flushing the same viewer at once count them once. Run
+``python scripts/backfill_daily_stats.py`` with yesterday's date after
+upgrading to seed it and correct any double counts; see app.models.daily_stats.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("""
+        CREATE TABLE IF NOT EXISTS coupon_daily_viewers (
+            coupon_id UUID NOT NULL REFERENCES coupons(id) ON DELETE CASCADE,
+            day DATE NOT NULL,
+            viewer VARCHAR(120) NOT NULL,
+            PRIMARY KEY (coupon_id, day, viewer)
+        )
+    """))
+    conn.execute(sa.text("CREATE INDEX IF NOT EXISTS ix_coupon_daily_viewers_day ON coupon_daily_viewers (day)"))
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("DROP TABLE IF EXISTS coupon_daily_viewers"))
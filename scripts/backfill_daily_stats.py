@@ -0,0 +1,93 @@
+"""
+Rebuild the daily analytics rollups (coupon_daily_stats, category_daily_stats)
+from coupon_views and paid orders, along with the last two days of the
+coupon_daily_viewers ledger. Run once after migration 0005 (and again after
+0006 to seed the ledger). Afterwards,
+run it for a range to repair one (e.g. after editing orders by hand). The view
+buffer and the payment paths keep the tables current on their own.
+
+It also replays the same views into the Redis unique-viewer sketches (see
+RedisService, "Unique Viewers"). PFADD is idempotent, so replaying twice is
+harmless. Views older than UNIQUE_VIEWERS_RETENTION_DAYS are skipped.
+
+Usage:
+    python scripts/backfill_daily_stats.py              # all history
+    python scripts/backfill_daily_stats.py 2026-09-01   # that day onwards
+"""
+import logging
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.cache import invalidate_cache, invalidate_namespace, redis_pipeline, NS_ANALYTICS
+from app.database import SessionLocal
+from app.models.coupon_view import CouponView
+from app.services.daily_stats_service import DailyStatsService
+from app.services.redis_service import RedisService
+
+SKETCH_BATCH = 1000
+
+logger = logging.getLogger("backfill_daily_stats")
+
+
+def replay_sketches(db, since) -> int:
+    """PFADD every view since the given day into its sketches, SKETCH_BATCH views per round trip."""
+    oldest = datetime.utcnow().date() - timedelta(days=RedisService.UNIQUE_RETENTION_DAYS - 1)
+    start = max(since or oldest, oldest)
+    views = db.query(CouponView.coupon_id, CouponView.viewed_at, CouponView.user_id, CouponView.session_id).filter(
+        CouponView.viewed_at >= datetime.combine(start, datetime.min.time())
+    ).yield_per(SKETCH_BATCH)
+
+    replayed = 0
+    batch = []
+    for view in views:
+        member = RedisService.viewer_member(view.user_id, view.session_id)
+        if member:
+            batch.append((str(view.coupon_id), member, view.viewed_at.date()))
+        if len(batch) >= SKETCH_BATCH:
+            replayed += _add_sketches(batch)
+            batch = []
+    replayed += _add_sketches(batch)
+    # Merged ranges were built from the old sketches
+    invalidate_cache(f"{RedisService.UNIQUE_PREFIX}:range:*")
+    return replayed
+
+
+def _add_sketches(batch) -> int:
+    with redis_pipeline() as pipe:
+        if pipe is None:
+            return 0
+        for coupon_id, member, day in batch:
+            RedisService.record_unique_viewer(coupon_id, member, day=day, pipe=pipe)
+    return len(batch)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    since = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        report = DailyStatsService.backfill(db, since)
+        replayed = replay_sketches(db, since)
+    finally:
+        db.close()
+    invalidate_namespace(NS_ANALYTICS)
+
+    logger.info(
+        f"Rebuilt {report['coupon_days']} coupon-days and {report['category_days']} category-days "
+        f"from {since or 'the beginning'}, replayed {replayed} views into the unique-viewer sketches, "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: cache serialization codecs on real package and coupon payloads.
+
+Builds the same payloads the services cache (package list, package detail,
+coupon entries) from the configured database and compares the legacy JSON path
+with the msgpack codec, with and without compression. No Redis needed.
+
+Usage:
+    python scripts/benchmark_cache_codec.py [iterations]
+"""
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy.orm import joinedload
+
+import app.cache as cache
+from app.database import SessionLocal
+from app.models.coupon import Coupon
+from app.read_models import CouponDTO
+from app.services.package_service import PackageService
+
+
+def legacy_dumps(value):
+    return json.dumps(value, default=str)
+
+
+def legacy_loads(data):
+    return json.loads(data)
+
+
+def time_per_op(fn, arg, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - started) / iterations * 1e6  # microseconds
+
+
+def codec_fns(codec, threshold):
+    def dumps(value):
+        cache.CACHE_COMPRESS_THRESHOLD = threshold
+        return cache.encode_value(value, codec=codec)
+    return dumps, cache.decode_value
+
+
+def load_payloads(db):
+    payloads = {}
+    packages = PackageService._load_list(db, 0, 100, None, None, None, None, None, None, None)
+    if packages:
+        payloads[f"package list ({len(packages)})"] = packages
+        payloads["package detail"] = PackageService._load_full(db, packages[0]["id"])
+    coupons = db.query(Coupon).options(joinedload(Coupon.category)).limit(100).all()
+    if coupons:
+        payloads[f"coupon list ({len(coupons)})"] = [CouponDTO.from_orm(c).to_cache() for c in coupons]
+    return payloads
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threshold = int(os.getenv("CACHE_COMPRESS_THRESHOLD", 4096))
+
+    db = SessionLocal()
+    try:
+        payloads = load_payloads(db)
+    finally:
+        db.close()
+
+    if not payloads:
+        print("No packages or coupons found in DATABASE_URL; seed some data first.")
+        return
+
+    variants = [
+        ("json (legacy)", legacy_dumps, legacy_loads),
+        ("msgpack", *codec_fns("msgpack", 0)),
+        (f"msgpack+zlib >{threshold}B", *codec_fns("msgpack", threshold)),
+        (f"json+zlib >{threshold}B", *codec_fns("json", threshold)),
+    ]
+
+    print(f"{'payload':<22} {'codec':<24} {'bytes':>9} {'encode us':>10} {'decode us':>10}")
+    for name, value in payloads.items():
+        for label, dumps, loads in variants:
+            blob = dumps(value)
+            size = len(blob.encode("utf-8") if isinstance(blob, str) else blob)
+            enc = time_per_op(dumps, value, iterations)
+            dec = time_per_op(loads, blob, iterations)
+            print(f"{name:<22} {label:<24} {size:>9} {enc:>10.1f} {dec:>10.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: response encoding of 100-item coupon and package listings.
+
+Compares FastAPI's response_model path (validate every item against the
+model, serialize the validated copy, json.dumps it) with the prevalidated
+path the list routes use (project onto the model's fields, encode with
+pydantic-core). Payloads come from the configured database, or are
+synthesized when it has fewer than 100 rows. No Redis needed.
+
+Usage:
+    python scripts/benchmark_response_encoding.py [iterations]
+"""
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy.orm import joinedload
+
+from app.database import SessionLocal
+from app.models.coupon import Coupon
+from app.read_models import CategoryDTO, CouponDTO
+from app.schemas.coupon import CouponPublicResponse
+from app.schemas.package import PackageListResponse
+from app.services.package_service import PackageService
+from app.utils.serialization import PrevalidatedJSONResponse
+
+ITEMS = 100
+
+
+def synthetic_coupons():
+    category = CategoryDTO(uuid.uuid4(), "Dining", "dining")
+    now = datetime(2026, 1, 1)
+    return [
+        CouponDTO(
+            uuid.uuid4(), f"CODE{i}", f"REDEEM{i}", "Brand", f"Coupon number {i}", "A description " * 8,
+            "percentage", 15.0, 500, i, True, 100, i % 5 == 0, False, now - timedelta(hours=i),
+            now + timedelta(days=30), category.id, category, "https://cdn.example.com/c.png",
+            {"USD": {"price": 4.99, "discount_amount": 1.0}, "AED": {"price": 18.0, "discount_amount": 3.5}},
+        )
+        for i in range(ITEMS)
+    ]
+
+
+def synthetic_packages():
+    now = datetime(2026, 1, 1)
+    return [
+        {
+            "id": uuid.uuid4(), "name": f"Bundle {i}", "slug": f"bundle-{i}", "description": "Bundle " * 10,
+            "picture_url": None, "brand": "Brand", "brand_url": None, "discount": 10.0, "avg_rating": 4.5,
+            "total_sold": i, "category_id": None, "is_active": True, "is_featured": False, "is_trending": False,
+            "expiration_date": None, "country": "UAE", "created_at": now - timedelta(hours=i),
+            "coupon_count": 3, "pricing": {"USD": 15.0, "AED": 55.0}, "final_prices": {"USD": 13.5, "AED": 49.5},
+        }
+        for i in range(ITEMS)
+    ]
+
+
+def load_payloads():
+    db = SessionLocal()
+    try:
+        coupons = [
+            CouponDTO.from_orm(c)
+            for c in db.query(Coupon).options(joinedload(Coupon.category)).limit(ITEMS)
+        ]
+        packages = PackageService._load_list(db, 0, ITEMS, None, None, None, None, None, None, None)
+    except Exception as e:
+        print(f"Database unavailable ({e.__class__.__name__}); using synthetic payloads.")
+        coupons, packages = [], []
+    finally:
+        db.close()
+    return {
+        f"coupon list ({ITEMS})": (CouponPublicResponse, coupons if len(coupons) >= ITEMS else synthetic_coupons()),
+        f"package list ({ITEMS})": (PackageListResponse, packages if len(packages) >= ITEMS else synthetic_packages()),
+    }
+
+
+def response_model_path(model):
+    field = create_model_field(name="Response", type_=List[model], mode="serialization")
+
+    def render(items):
+        content = asyncio.run(serialize_response(field=field, response_content=items, is_coroutine=False))
+        return JSONResponse(content).body
+    return render
+
+
+def prevalidated_path(model):
+    def render(items):
+        return PrevalidatedJSONResponse([model.payload(item) for item in items]).body
+    return render
+
+
+def cpu_per_op(fn, arg, iterations):
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.process_time() - started) / iterations * 1e3  # milliseconds
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    payloads = load_payloads()
+    print(f"{'payload':<22} {'path':<16} {'bytes':>8} {'cpu ms':>8}")
+    for name, (model, items) in payloads.items():
+        for label, factory in (("response_model", response_model_path), ("prevalidated", prevalidated_path)):
+            render = factory(model)
+            size = len(render(items))
+            print(f"{name:<22} {label:<16} {size:>8} {cpu_per_op(render, items, iterations):>8.2f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: indexed coupon search vs the legacy lower(col) LIKE '%term%' scan.
+
+Creates the schema in a scratch database, bulk-loads synthetic coupons and
+times both filters over a mix of word, prefix, code and misspelt queries.
+Without BENCH_DATABASE_URL it uses a temporary SQLite file (FTS5 path); point
+it at an empty Postgres database to measure the tsvector/trigram path.
+The scratch schema is dropped at the end.
+
+Usage:
+    python scripts/benchmark_search.py [coupons] [iterations]
+    BENCH_DATABASE_URL=postgresql://.../search_bench python scripts/benchmark_search.py 100000
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # app.database needs one; the benchmark uses its own engine
+
+from sqlalchemy import create_engine, func, insert, or_
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.database import Base
+from app.models.coupon import Coupon
+from app.services.search_service import CouponSearch
+
+BRANDS = ["Amazon", "Noon", "Carrefour", "Starbucks", "Netflix", "Spotify", "Uber", "Adidas",
+          "Nike", "Zara", "Talabat", "Deliveroo", "Booking", "Agoda", "Apple", "Samsung"]
+NOUNS = ["gift card", "voucher", "discount", "cashback", "subscription", "bundle", "holiday",
+         "delivery", "coffee", "streaming", "fashion", "electronics", "travel", "groceries"]
+QUERIES = ["starbucks", "gift card", "netf", "holiday voucher", "CODE0042", "electornics", "sptify"]
+
+
+def seed(session, count):
+    rng = random.Random(42)
+    started = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        brand, noun = rng.choice(BRANDS), rng.choice(NOUNS)
+        batch.append({
+            "id": uuid.uuid4(), "code": f"CODE{i:06d}", "brand": brand,
+            "title": f"{brand} {noun} {rng.randint(5, 90)}% off",
+            "description": f"Save on {noun} with {brand}. " + " ".join(rng.sample(NOUNS, 3)),
+            "discount_type": "percentage", "discount_amount": float(rng.randint(5, 90)),
+            "is_active": True, "is_package_coupon": False, "created_at": started - timedelta(seconds=i),
+        })
+        if len(batch) == 5000:
+            session.execute(insert(Coupon.__table__), batch)
+            batch = []
+    if batch:
+        session.execute(insert(Coupon.__table__), batch)
+    session.commit()
+    if session.get_bind().dialect.name == "postgresql":
+        session.connection().exec_driver_sql("ANALYZE coupons")
+        session.commit()
+
+
+def legacy(query, term):
+    pattern = f"%{term}%"
+    return query.filter(or_(
+        func.lower(Coupon.title).like(func.lower(pattern)),
+        func.lower(Coupon.brand).like(func.lower(pattern)),
+        func.lower(Coupon.code).like(func.lower(pattern)),
+    ))
+
+
+def indexed(query, term):
+    return CouponSearch.apply(query, term)
+
+
+def timings(session, apply, term, iterations):
+    samples, hits = [], 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        hits = len(apply(session.query(Coupon), term).limit(20).all())
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1], hits
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    scratch = None
+    if not url:
+        scratch = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        url = f"sqlite:///{scratch.name}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        t0 = time.perf_counter()
+        seed(session, count)
+        print(f"Seeded {count} coupons on {engine.dialect.name} in {time.perf_counter() - t0:.1f}s\n")
+
+        print(f"{'query':<18} {'filter':<10} {'p50 ms':>8} {'p95 ms':>8} {'hits':>5}")
+        for term in QUERIES:
+            for label, apply in (("like", legacy), ("indexed", indexed)):
+                p50, p95, hits = timings(session, apply, term, iterations)
+                print(f"{term:<18} {label:<10} {p50:>8.2f} {p95:>8.2f} {hits:>5}")
+            print()
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        if scratch:
+            os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: coupon view ingestion throughput per worker.
+
+Compares the old per-view path (db.add, COMMIT, refresh for every view) with
+the write-behind buffer (app/services/view_buffer.py), which writes the same
+rows as multi-row INSERTs in one transaction per flush. Runs against a scratch
+SQLite file by default; pass a DATABASE_URL to measure Postgres instead.
+
+Usage:
+    python scripts/benchmark_view_ingestion.py [views] [database_url]
+"""
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.database import Base
+from app.models.coupon import Coupon
+from app.models.coupon_view import CouponView
+from app.services.view_buffer import ViewBuffer, VIEW_FLUSH_ROWS
+
+
+def per_view(Session, coupon_id, views):
+    db = Session()
+    try:
+        for _ in range(views):
+            view = CouponView(coupon_id=coupon_id, session_id="bench", viewed_at=datetime.utcnow())
+            db.add(view)
+            db.commit()
+            db.refresh(view)
+    finally:
+        db.close()
+
+
+def buffered(Session, coupon_id, views):
+    buffer = ViewBuffer(flush_ms=60_000, flush_rows=VIEW_FLUSH_ROWS, max_rows=views + 1)
+    db = Session()
+    try:
+        for i in range(views):
+            buffer.add(db, {"coupon_id": coupon_id, "user_id": None, "session_id": "bench", "viewed_at": datetime.utcnow()})
+            if (i + 1) % VIEW_FLUSH_ROWS == 0:
+                buffer.flush()
+        buffer.flush()
+    finally:
+        db.close()
+
+
+def main():
+    views = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    url = sys.argv[2] if len(sys.argv) > 2 else f"sqlite:///{tempfile.mkdtemp()}/views.db"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine, tables=[Coupon.__table__, CouponView.__table__])
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    coupon = Coupon(code=f"BENCH-{uuid.uuid4().hex[:8]}", title="Bench", discount_type="percentage", discount_amount=1.0)
+    db.add(coupon)
+    db.commit()
+    coupon_id = coupon.id
+
+    print(f"{'path':<28} {'views':>7} {'seconds':>9} {'views/sec':>11}")
+    for label, fn in [("per-view commit", per_view), (f"buffered ({VIEW_FLUSH_ROWS}/flush)", buffered)]:
+        started = time.perf_counter()
+        fn(Session, coupon_id, views)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<28} {views:>7} {elapsed:>9.2f} {views / elapsed:>11.0f}")
+        db.execute(delete(CouponView).where(CouponView.coupon_id == coupon_id))
+        db.commit()
+
+    db.execute(delete(Coupon).where(Coupon.id == coupon_id))
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Periodic upkeep for Redis stock reservations (see app/services/stock_service.py).
+
+Every interval: release holds whose deadline has passed, then reconcile the
+coupon_stock counters against the coupons table (StockService.reconcile; the
+drift report is logged and stored under stock:reconcile:last). Safe to run on
+several hosts at once.
+
+Usage:
+    python scripts/stock_maintenance.py [interval_seconds]   # 0 runs once and exits
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.database import SessionLocal
+from app.services.stock_service import StockService, SWEEP_BATCH
+
+logger = logging.getLogger("stock_maintenance")
+
+
+def run_once() -> None:
+    released = 0
+    while True:
+        batch = StockService.release_expired(SWEEP_BATCH)
+        released += batch
+        if batch < SWEEP_BATCH:
+            break
+
+    logger.info(f"Released {released} expired holds")
+
+    db = SessionLocal()
+    try:
+        StockService.reconcile(db)
+    finally:
+        db.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    interval = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    while True:
+        run_once()
+        if interval <= 0:
+            return
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    main()
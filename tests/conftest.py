@@ -19,6 +19,7 @@ os.environ["REDIS_URL"] = ""
 os.environ["PAYMENT_TOKEN_SECRET"] = "test-payment-token-secret"
 os.environ["STRIPE_SECRET_KEY"] = "sk_test_fake_key_for_ci"
 os.environ["ENVIRONMENT"] = "test"
+os.environ["VIEW_FLUSH_MS"] = "0"  # views written by the request; tests that buffer build their own ViewBuffer
 
 # ---- Patch UUID for SQLite BEFORE any model imports ----
 from sqlalchemy import String, TypeDecorator
@@ -117,6 +118,27 @@ def client(db):
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Route the cache layer (sync and async clients) to an in-memory Redis stand-in."""
+    import app.cache as cache
+    import app.cache_async as cache_async
+    from fake_redis import FakeRedis, FakeAsyncRedis
+
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", fake)
+
+    async def connect(loop):
+        monkeypatch.setattr(cache_async, "_async_client", FakeAsyncRedis(fake))
+        monkeypatch.setattr(cache_async, "_client_loop", loop)
+    monkeypatch.setattr(cache_async, "_async_client", None)
+    monkeypatch.setattr(cache_async, "_connect", connect)
+
+    cache._breaker.reset()
+    cache._local_cache.clear()
+    return fake
+
+
 # Valid US phone numbers
 ADMIN_PHONE = {"country_code": "+1", "number": "2025551234", "email": "admin@example.com"}
 REGULAR_PHONE = {"country_code": "+1", "number": "2025559876", "email": "user@example.com"}
@@ -0,0 +1,454 @@
+"""
+Minimal in-memory stand-in for the redis-py client used by the cache tests.
+
+Only the commands the app actually issues are implemented. Values are stored
+and returned the way a `decode_responses=False` client would return them
+(bytes). Lua scripts
+are emulated in Python: each script the app registers must have a handler in
+SCRIPT_HANDLERS.
+"""
+import fnmatch
+import time
+
+
+def _release_lock(redis, keys, args):
+    if redis.get(keys[0]) == args[0]:
+        return redis.delete(keys[0])
+    return 0
+
+
+def _mru_push(redis, keys, args):
+    value, max_length, ttl = args[0], int(args[1]), int(args[2])
+    redis.lrem(keys[0], 0, value)
+    redis.lpush(keys[0], value)
+    redis.ltrim(keys[0], 0, max_length - 1)
+    if ttl > 0:
+        redis.expire(keys[0], ttl)
+    return 1
+
+
+def _mru_merge(redis, keys, args):
+    incoming = redis.lrange(keys[1], 0, -1)
+    if not incoming:
+        return 0
+    for value in reversed(incoming):
+        redis.lrem(keys[0], 0, value)
+        redis.lpush(keys[0], value)
+    redis.ltrim(keys[0], 0, int(args[0]) - 1)
+    if int(args[1]) > 0:
+        redis.expire(keys[0], int(args[1]))
+    redis.delete(keys[1])
+    return len(incoming)
+
+
+def _hll_add(redis, keys, args):
+    for key, ttl in zip(keys, args[1:]):
+        redis.pfadd(key, args[0])
+        if int(ttl) > 0:
+            redis.expire(key, int(ttl))
+    return 1
+
+
+def _hll_merged_count(redis, keys, args):
+    merged = int(args[0])
+    if not redis.exists(keys[0]):
+        redis.pfmerge(keys[0], *keys[1:merged + 1])
+        redis.expire(keys[0], int(args[1]))
+    return redis.pfcount(keys[0], *keys[merged + 1:])
+
+
+def _pairs(args):
+    return [(args[i], int(args[i + 1])) for i in range(0, len(args), 2)]
+
+
+def _drop_held(redis, keys):
+    held = redis.hgetall(keys[2])
+    for coupon_id, units in held.items():
+        if redis.hincrby(keys[1], coupon_id, -int(units)) <= 0:
+            redis.hdel(keys[1], coupon_id)
+    redis.delete(keys[2])
+    return held
+
+
+def _stock_reserve(redis, keys, args):
+    order_id, deadline, ttl, pairs = args[0], float(args[1]), int(args[2]), _pairs(args[3:])
+    if redis.exists(keys[2]):
+        redis.expire(keys[2], ttl)
+        redis.zadd(keys[3], {order_id: deadline})
+        return [1]
+    missing = []
+    for coupon_id, units in pairs:
+        available = redis.hget(keys[0], coupon_id)
+        if available is None:
+            missing.append(coupon_id)
+        elif 0 <= int(available) < units:
+            return [0, coupon_id, int(available)]
+    if missing:
+        return [-1] + missing
+    for coupon_id, units in pairs:
+        if int(redis.hget(keys[0], coupon_id)) >= 0:
+            redis.hincrby(keys[0], coupon_id, -units)
+            redis.hincrby(keys[1], coupon_id, units)
+            redis.hset(keys[2], coupon_id, units)
+    if redis.exists(keys[2]):
+        redis.expire(keys[2], ttl)
+        redis.zadd(keys[3], {order_id: deadline})
+    return [1]
+
+
+def _stock_release(redis, keys, args):
+    held = _drop_held(redis, keys)
+    for coupon_id, units in held.items():
+        available = redis.hget(keys[0], coupon_id)
+        if available is not None and int(available) >= 0:
+            redis.hincrby(keys[0], coupon_id, int(units))
+    redis.zrem(keys[3], args[0])
+    return len(held)
+
+
+def _stock_commit(redis, keys, args):
+    if redis.exists(keys[2]):
+        _drop_held(redis, keys)
+        redis.zrem(keys[3], args[0])
+        return [1]
+    short = []
+    for coupon_id, units in _pairs(args[1:]):
+        available = redis.hget(keys[0], coupon_id)
+        if available is not None and int(available) >= 0:
+            if redis.hincrby(keys[0], coupon_id, -units) < 0:
+                redis.hset(keys[0], coupon_id, 0)
+                short.append(coupon_id)
+    redis.zrem(keys[3], args[0])
+    return [0] + short
+
+
+def _stock_seed(redis, keys, args):
+    counters = []
+    for coupon_id, stock in _pairs(args[1:]):
+        current = redis.hget(keys[0], coupon_id)
+        if args[0] == b"1" and current is not None:
+            counters.append(int(current))
+            continue
+        if stock >= 0:
+            stock = max(stock - int(redis.hget(keys[1], coupon_id) or 0), 0)
+        redis.hset(keys[0], coupon_id, stock)
+        counters.append(stock)
+    return counters
+
+
+def _script_handlers():
+    from app import cache
+    from app.services import stock_service
+    return {
+        cache.RELEASE_LOCK_SCRIPT: _release_lock,
+        cache.MRU_PUSH_SCRIPT: _mru_push,
+        cache.MRU_MERGE_SCRIPT: _mru_merge,
+        cache.HLL_ADD_SCRIPT: _hll_add,
+        cache.HLL_MERGED_COUNT_SCRIPT: _hll_merged_count,
+        stock_service.RESERVE_SCRIPT: _stock_reserve,
+        stock_service.RELEASE_SCRIPT: _stock_release,
+        stock_service.COMMIT_SCRIPT: _stock_commit,
+        stock_service.SEED_SCRIPT: _stock_seed,
+    }
+
+
+class FakePipeline:
+    """Buffers commands and runs them against the FakeRedis on execute()."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        self._redis.round_trips += 1
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+class FakeRedis:
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self.published = []
+        self.round_trips = 0  # counts execute() calls of pipelines
+
+    # ---- internals ----
+
+    def _alive(self, key):
+        exp = self._expiry.get(key)
+        if exp is not None and exp <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    def _encode(self, value):
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode("utf-8")
+
+    # ---- connection ----
+
+    def ping(self):
+        return True
+
+    # ---- strings ----
+
+    def get(self, key):
+        return self._data.get(key) if self._alive(key) else None
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = self._encode(value)
+        self._expiry.pop(key, None)
+        if ex is not None:
+            self.expire(key, ex)
+        if px is not None:
+            self._expiry[key] = time.monotonic() + px / 1000.0
+        return True
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def incr(self, key, amount=1):
+        value = int(self.get(key) or 0) + amount
+        self._data[key] = self._encode(value)
+        return value
+
+    def delete(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                deleted += 1
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return deleted
+
+    def exists(self, key):
+        return 1 if self._alive(key) else 0
+
+    def expire(self, key, ttl):
+        if not self._alive(key):
+            return False
+        self._expiry[key] = time.monotonic() + ttl
+        return True
+
+    def ttl(self, key):
+        if not self._alive(key):
+            return -2
+        exp = self._expiry.get(key)
+        return -1 if exp is None else max(0, int(exp - time.monotonic()))
+
+    def keys(self, pattern="*"):
+        return [k for k in list(self._data) if self._alive(k) and fnmatch.fnmatchcase(k, pattern)]
+
+    def scan_iter(self, match="*", count=None):
+        return iter(self.keys(match))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    # ---- scripting ----
+
+    def register_script(self, script):
+        handler = _script_handlers()[script]
+
+        def run(keys=(), args=(), client=None):
+            call = lambda: handler(self, list(keys), [self._encode(a) for a in args])  # noqa: E731
+            if isinstance(client, FakePipeline):
+                client._commands.append((call, (), {}))
+                return client
+            return call()
+        return run
+
+    # ---- pub/sub ----
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    # ---- sorted sets ----
+
+    def zincrby(self, key, amount, member):
+        if not self._alive(key):
+            self._data[key] = {}
+        zset = self._data[key]
+        member = self._encode(member)
+        zset[member] = zset.get(member, 0.0) + amount
+        return zset[member]
+
+    def zrevrange(self, key, start, stop, withscores=False):
+        zset = self._data.get(key, {}) if self._alive(key) else {}
+        ranked = sorted(zset.items(), key=lambda kv: (-kv[1], kv[0]))
+        stop = len(ranked) if stop == -1 else stop + 1
+        ranked = ranked[start:stop]
+        return ranked if withscores else [m for m, _ in ranked]
+
+    def zadd(self, key, mapping):
+        if not self._alive(key):
+            self._data[key] = {}
+        zset = self._data[key]
+        added = 0
+        for member, score in mapping.items():
+            member = self._encode(member)
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def zrem(self, key, *members):
+        zset = self._data.get(key, {}) if self._alive(key) else {}
+        removed = 0
+        for member in members:
+            removed += zset.pop(self._encode(member), None) is not None
+        return removed
+
+    def zrangebyscore(self, key, min, max, start=None, num=None):
+        zset = self._data.get(key, {}) if self._alive(key) else {}
+        ranked = sorted((kv for kv in zset.items() if float(min) <= kv[1] <= float(max)), key=lambda kv: (kv[1], kv[0]))
+        members = [m for m, _ in ranked]
+        if start is not None:
+            members = members[start:start + num]
+        return members
+
+    def zunionstore(self, dest, keys, aggregate=None):
+        weights = keys if isinstance(keys, dict) else {key: 1.0 for key in keys}
+        union = {}
+        for key, weight in weights.items():
+            if self._alive(key):
+                for member, score in self._data[key].items():
+                    union[member] = union.get(member, 0.0) + score * weight
+        self.delete(dest)
+        if union:
+            self._data[dest] = union
+        return len(union)
+
+    # ---- lists ----
+
+    def _list(self, key):
+        if not self._alive(key):
+            self._data[key] = []
+        return self._data[key]
+
+    def lrem(self, key, count, value):
+        lst = self._list(key)
+        before = len(lst)
+        value = self._encode(value)
+        lst[:] = [v for v in lst if v != value]
+        return before - len(lst)
+
+    def lpush(self, key, *values):
+        lst = self._list(key)
+        for value in values:
+            lst.insert(0, self._encode(value))
+        return len(lst)
+
+    def ltrim(self, key, start, stop):
+        lst = self._list(key)
+        lst[:] = lst[start:None if stop == -1 else stop + 1]
+        return True
+
+    def lrange(self, key, start, stop):
+        lst = self._data.get(key, []) if self._alive(key) else []
+        return list(lst[start:None if stop == -1 else stop + 1])
+
+    # ---- hyperloglog (exact sets; real Redis estimates) ----
+
+    def _sketch(self, key):
+        if not self._alive(key):
+            self._data[key] = set()
+        return self._data[key]
+
+    def pfadd(self, key, *members):
+        sketch = self._sketch(key)
+        before = len(sketch)
+        sketch.update(self._encode(m) for m in members)
+        return 1 if len(sketch) != before else 0
+
+    def pfcount(self, *keys):
+        union = set()
+        for key in keys:
+            if self._alive(key):
+                union |= self._data[key]
+        return len(union)
+
+    def pfmerge(self, dest, *sources):
+        union = set(self._data[dest]) if self._alive(dest) else set()
+        for key in sources:
+            if self._alive(key):
+                union |= self._data[key]
+        self._data[dest] = union
+        return True
+
+    # ---- hashes ----
+
+    def _hash(self, key):
+        if not self._alive(key):
+            self._data[key] = {}
+        return self._data[key]
+
+    def hget(self, key, field):
+        return self._hash(key).get(self._encode(field))
+
+    def hset(self, key, field, value):
+        self._hash(key)[self._encode(field)] = self._encode(value)
+        return 1
+
+    def hmget(self, key, fields):
+        h = self._data.get(key, {}) if self._alive(key) else {}
+        return [h.get(self._encode(f)) for f in fields]
+
+    def hgetall(self, key):
+        return dict(self._data.get(key, {})) if self._alive(key) else {}
+
+    def hdel(self, key, *fields):
+        h = self._hash(key)
+        return sum(h.pop(self._encode(f), None) is not None for f in fields)
+
+    def hincrby(self, key, field, amount=1):
+        h = self._hash(key)
+        field = self._encode(field)
+        value = int(h.get(field, 0)) + amount
+        h[field] = self._encode(value)
+        return value
+
+
+class FakeAsyncRedis:
+    """redis.asyncio-shaped view over a FakeRedis, so both clients share data."""
+
+    def __init__(self, redis):
+        self._redis = redis
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+
+        async def run(*args, **kwargs):
+            return command(*args, **kwargs)
+        return run
+
+    def pipeline(self, transaction=True):
+        pipe = self._redis.pipeline(transaction)
+        sync_execute = pipe.execute
+
+        async def execute():
+            return sync_execute()
+        pipe.execute = execute
+        return pipe
+
+    def register_script(self, script):
+        run = self._redis.register_script(script)
+
+        async def run_async(keys=(), args=()):
+            return run(keys=keys, args=args)
+        return run_async
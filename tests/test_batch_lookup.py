@@ -0,0 +1,58 @@
+"""Tests for GET /coupons/batch and GET /packages/batch."""
+import uuid
+
+
+def _coupon(client, admin_user, code):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True, "pricing": {"USD": {"price": 2.0}},
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+def test_coupon_batch_keeps_order_and_reports_missing(client, admin_user, fake_redis):
+    first, second = _coupon(client, admin_user, "BATCH-A"), _coupon(client, admin_user, "BATCH-B")
+    unknown = str(uuid.uuid4())
+    client.get(f"/coupons/{first}")  # one entry already cached
+
+    resp = client.get("/coupons/batch", params={"ids": f"{second},{unknown},{first},nope,{second}"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [c["id"] for c in body["items"]] == [second, first]
+    assert body["items"][0]["prices"] == {"USD": 2.0}
+    assert "code" not in body["items"][0]
+    assert body["missing"] == [unknown, "nope"]
+
+    # Repeated ids= parameters work too
+    repeated = client.get(f"/coupons/batch?ids={first}&ids={second}").json()
+    assert [c["id"] for c in repeated["items"]] == [first, second]
+
+
+def test_batch_rejects_oversized_requests(client):
+    ids = ",".join(str(uuid.uuid4()) for _ in range(101))
+    assert client.get("/coupons/batch", params={"ids": ids}).status_code == 400
+    assert client.get("/packages/batch", params={"ids": ids}).status_code == 400
+    assert client.get("/coupons/batch").status_code == 422
+
+
+def test_package_batch(client, admin_user, fake_redis):
+    coupon_ids = [_coupon(client, admin_user, "BATCH-P1"), _coupon(client, admin_user, "BATCH-P2")]
+    packages = []
+    for slug, members in (("batch-one", coupon_ids), ("batch-two", coupon_ids[:1]), ("batch-empty", [])):
+        resp = client.post("/packages/", json={"name": slug.title(), "slug": slug, "coupon_ids": members},
+                           headers=admin_user["headers"])
+        assert resp.status_code == 201, resp.text
+        packages.append(resp.json())
+    client.get(f"/packages/{packages[1]['id']}")  # one entry already cached
+
+    unknown = str(uuid.uuid4())
+    ids = [packages[2]["id"], unknown, packages[0]["id"], packages[1]["id"]]
+    body = client.get("/packages/batch", params={"ids": ",".join(ids)}).json()
+    assert [p["id"] for p in body["items"]] == [packages[2]["id"], packages[0]["id"], packages[1]["id"]]
+    assert body["missing"] == [unknown]
+    by_id = {p["id"]: p for p in body["items"]}
+    assert sorted(c["id"] for c in by_id[packages[0]["id"]]["coupons"]) == sorted(coupon_ids)
+    assert by_id[packages[0]["id"]]["pricing"] == {"USD": 4.0}
+    assert by_id[packages[1]["id"]] == client.get(f"/packages/{packages[1]['id']}").json()
+    assert by_id[packages[2]["id"]]["coupons"] == []
@@ -0,0 +1,518 @@
+"""Tests for the Redis cache layer (run against an in-memory Redis stand-in)."""
+import pytest
+
+from app.cache import (
+    get_cache, set_cache, delete_cache, invalidate_cache,
+    ns_cache_key, invalidate_namespace, get_namespace_generation,
+    NS_PACKAGES, NS_COUPONS_LIST,
+)
+
+
+class TestNamespaces:
+
+    def test_key_embeds_generation(self, fake_redis):
+        assert ns_cache_key(NS_PACKAGES, "list", 10) == "packages:g0:list:10"
+        invalidate_namespace(NS_PACKAGES)
+        assert ns_cache_key(NS_PACKAGES, "list", 10) == "packages:g1:list:10"
+
+    def test_invalidate_namespace_hides_old_entries(self, fake_redis):
+        set_cache(ns_cache_key(NS_PACKAGES, "id", "abc"), {"name": "Old"})
+        assert get_cache(ns_cache_key(NS_PACKAGES, "id", "abc")) == {"name": "Old"}
+
+        invalidate_namespace(NS_PACKAGES)
+        assert get_cache(ns_cache_key(NS_PACKAGES, "id", "abc")) is None
+
+    def test_namespaces_are_independent(self, fake_redis):
+        invalidate_namespace(NS_COUPONS_LIST)
+        assert get_namespace_generation(NS_COUPONS_LIST) == 1
+        assert get_namespace_generation(NS_PACKAGES) == 0
+
+    def test_per_user_generations_expire_and_share_one_round_trip(self, fake_redis):
+        from app.cache import cart_namespace, NS_USER_GENERATION_TTL
+        before = fake_redis.round_trips
+        invalidate_namespace(NS_PACKAGES, cart_namespace("u1"))
+        assert fake_redis.round_trips - before == 1
+        assert fake_redis.ttl("ns:gen:packages") == -1
+        assert 0 < fake_redis.ttl("ns:gen:cart:u1") <= NS_USER_GENERATION_TTL
+        assert get_namespace_generation(cart_namespace("u1")) == 1
+
+    def test_invalidation_never_uses_keys(self, fake_redis, monkeypatch):
+        def forbidden(*args, **kwargs):
+            raise AssertionError("KEYS must not be called")
+        monkeypatch.setattr(fake_redis, "keys", forbidden)
+
+        invalidate_namespace(NS_PACKAGES)
+        delete_cache("coupons:id:1")
+        invalidate_cache("coupons:id:1")
+
+    def test_pattern_invalidation_scans(self, fake_redis):
+        set_cache("legacy:a", 1)
+        set_cache("legacy:b", 2)
+        set_cache("other", 3)
+        assert invalidate_cache("legacy:*") == 2
+        assert get_cache("other") == 3
+
+    def test_helpers_degrade_without_redis(self):
+        assert invalidate_namespace(NS_PACKAGES) is False
+        assert ns_cache_key(NS_PACKAGES, "list") == "packages:g0:list"
+        assert delete_cache("x") == 0
+
+
+class TestServiceInvalidation:
+
+    def test_package_list_refreshes_after_update(self, client, admin_user, fake_redis):
+        created = client.post("/packages/", json={
+            "name": "Cached Pack", "slug": "cached-pack",
+        }, headers=admin_user["headers"]).json()
+
+        assert client.get("/packages/").json()[0]["name"] == "Cached Pack"
+
+        client.put(f"/packages/{created['id']}", json={"name": "Renamed Pack"},
+                   headers=admin_user["headers"])
+        assert client.get("/packages/").json()[0]["name"] == "Renamed Pack"
+        assert client.get(f"/packages/{created['id']}").json()["name"] == "Renamed Pack"
+
+    def test_coupon_update_drops_entity_cache(self, client, admin_user, sample_coupon, fake_redis):
+        coupon_id = sample_coupon["id"]
+        assert client.get(f"/coupons/{coupon_id}").json()["title"] == "Test 50% Off"
+
+        client.put(f"/coupons/{coupon_id}", json={"title": "Updated Title"},
+                   headers=admin_user["headers"])
+        assert client.get(f"/coupons/{coupon_id}").json()["title"] == "Updated Title"
+
+
+class TestLocalTier:
+
+    def test_lru_evicts_least_recently_used(self):
+        from app.cache import LocalCache
+        lru = LocalCache(max_entries=2, ttl=30)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+        assert lru.get("a") == (True, 1)
+        assert lru.get("b") == (False, None)
+
+    def test_entries_expire(self, monkeypatch):
+        import app.cache as cache
+        lru = cache.LocalCache(max_entries=10, ttl=30)
+        lru.set("k", "v", ttl=5)
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + 6)
+        assert lru.get("k") == (False, None)
+
+    def test_local_tier_serves_repeat_reads(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        monkeypatch.setattr(cache, "_local_tier_ready", True)
+        cache._local_cache.clear()
+        cache._cache_stats.reset()
+
+        set_cache("categories:g0:list:True", [{"name": "A"}])
+        get_cache("categories:g0:list:True")
+
+        def no_round_trip(key):
+            raise AssertionError("L1 hit must not reach Redis")
+        monkeypatch.setattr(fake_redis, "get", no_round_trip)
+        assert get_cache("categories:g0:list:True") == [{"name": "A"}]
+
+        stats = cache.cache_stats()["families"]["categories"]
+        assert stats["redis_hits"] == 1
+        assert stats["local_hits"] == 1
+        assert stats["local_hit_ratio"] == 0.5
+
+    def test_invalidation_is_broadcast_and_applied(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        monkeypatch.setattr(cache, "_local_tier_ready", True)
+        cache._local_cache.clear()
+
+        set_cache("coupons:id:1", {"title": "Old"})
+        assert get_cache("coupons:id:1") == {"title": "Old"}
+        delete_cache("coupons:id:1")
+        assert fake_redis.published[-1] == (cache.INVALIDATION_CHANNEL, '["coupons:id:1"]')
+        assert get_cache("coupons:id:1") is None
+
+        # A message from another worker drops our copy of the namespace generation
+        assert get_namespace_generation(NS_PACKAGES) == 0
+        fake_redis.incr("ns:gen:packages")
+        assert get_namespace_generation(NS_PACKAGES) == 0
+        cache._apply_invalidation_message('["ns:gen:packages"]')
+        assert get_namespace_generation(NS_PACKAGES) == 1
+
+    def test_local_tier_disabled_without_subscription(self, fake_redis):
+        import app.cache as cache
+        set_cache("coupons:id:2", {"title": "A"})
+        get_cache("coupons:id:2")
+        assert cache.cache_stats()["local_tier"] == "disabled"
+        assert cache._local_cache.get("coupons:id:2") == (False, None)
+
+
+class TestGetOrCompute:
+
+    def test_loader_runs_once_then_served_from_cache(self, fake_redis):
+        from app.cache import get_or_compute
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {"total": 3}
+
+        assert get_or_compute("analytics:g0:quick-stats", 60, loader) == {"total": 3}
+        assert get_or_compute("analytics:g0:quick-stats", 60, loader, beta=0) == {"total": 3}
+        assert len(calls) == 1
+        assert not fake_redis.exists("lock:analytics:g0:quick-stats")
+
+    def test_waits_for_lock_holder_instead_of_recomputing(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        fake_redis.set("lock:packages:g0:list", "other-worker", px=10000)
+
+        def other_worker_fills(seconds):
+            cache._compute_and_store("packages:g0:list", 60, lambda: ["from-winner"])
+        monkeypatch.setattr(cache.time, "sleep", other_worker_fills)
+
+        def loader():
+            raise AssertionError("loser must not run the loader")
+        assert cache.get_or_compute("packages:g0:list", 60, loader) == ["from-winner"]
+
+    def test_computes_locally_after_bounded_wait(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        fake_redis.set("lock:packages:g0:list", "other-worker", px=10000)
+        monkeypatch.setattr(cache, "LOCK_WAIT_SECONDS", 0.01)
+        monkeypatch.setattr(cache, "LOCK_POLL_SECONDS", 0.001)
+        assert cache.get_or_compute("packages:g0:list", 60, lambda: ["local"]) == ["local"]
+
+    def test_early_refresh_near_expiry(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        cache._compute_and_store("categories:g0:list", 60, lambda: ["old"])
+        entry = cache.get_cache("categories:g0:list")
+        entry["_d"] = 5.0
+        entry["_x"] = cache.time.time() + 1
+        set_cache("categories:g0:list", entry)
+
+        monkeypatch.setattr(cache.random, "random", lambda: 0.01)
+        assert cache.get_or_compute("categories:g0:list", 60, lambda: ["new"]) == ["new"]
+
+    def test_early_refresh_serves_stale_while_locked(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        cache._compute_and_store("categories:g0:list", 60, lambda: ["old"])
+        fake_redis.set("lock:categories:g0:list", "other-worker", px=10000)
+        monkeypatch.setattr(cache, "_should_refresh_early", lambda entry, beta: True)
+        assert cache.get_or_compute("categories:g0:list", 60, lambda: ["new"]) == ["old"]
+
+    def test_none_is_not_cached(self, fake_redis):
+        from app.cache import get_or_compute
+        assert get_or_compute("packages:g0:slug:missing", 60, lambda: None) is None
+        assert get_cache("packages:g0:slug:missing") is None
+
+    def test_local_tier_does_not_outlive_entry(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        monkeypatch.setattr(cache, "_local_tier_ready", True)
+        cache._local_cache.clear()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return len(calls)
+
+        assert cache.get_or_compute("categories:g0:list", 1, loader, beta=0) == 1
+        now = cache.time.time()
+        monkeypatch.setattr(cache.time, "time", lambda: now + 2)
+        assert [cache.get_or_compute("categories:g0:list", 1, loader, beta=0) for _ in range(5)] == [2] * 5
+        assert len(calls) == 2
+
+    def test_runs_loader_without_redis(self):
+        from app.cache import get_or_compute
+        assert get_or_compute("packages:g0:list", 60, lambda: [1]) == [1]
+
+
+class TestStaleWhileRevalidate:
+
+    @pytest.fixture
+    def deferred_refreshes(self, monkeypatch):
+        import app.cache as cache
+        queued = []
+
+        class Executor:
+            def submit(self, fn):
+                queued.append(fn)
+        monkeypatch.setattr(cache, "_refresh_executor", Executor())
+        return queued
+
+    @staticmethod
+    def _expire(key):
+        import app.cache as cache
+        entry = cache.get_cache(key)
+        entry["_x"] = cache.time.time() - 1
+        set_cache(key, entry)
+
+    def test_stale_entry_served_while_refreshing(self, fake_redis, deferred_refreshes):
+        import app.cache as cache
+        assert cache.get_or_compute("categories:g0:list", 60, lambda: ["old"], stale_ttl=30) == ["old"]
+        assert 60 < fake_redis.ttl("categories:g0:list") <= 90
+        self._expire("categories:g0:list")
+
+        def loader():
+            raise AssertionError("stale read must not run the loader inline")
+        assert cache.get_or_compute("categories:g0:list", 60, loader, stale_ttl=30,
+                                    refresh_loader=lambda: ["new"]) == ["old"]
+        assert len(deferred_refreshes) == 1
+        assert fake_redis.exists("lock:categories:g0:list")
+
+        # A second stale read while the refresh is queued doesn't queue another
+        cache.get_or_compute("categories:g0:list", 60, loader, stale_ttl=30)
+        assert len(deferred_refreshes) == 1
+
+        deferred_refreshes.pop()()
+        assert not fake_redis.exists("lock:categories:g0:list")
+        assert cache.get_or_compute("categories:g0:list", 60, loader, stale_ttl=30, beta=0) == ["new"]
+
+    def test_local_tier_serves_refreshed_value(self, fake_redis, deferred_refreshes, monkeypatch):
+        import app.cache as cache
+        monkeypatch.setattr(cache, "_local_tier_ready", True)
+        cache._local_cache.clear()
+        values = iter(["old", "new"])
+        assert cache.get_or_compute("categories:g0:list", 1, lambda: next(values), stale_ttl=60) == "old"
+
+        now = cache.time.time()
+        monkeypatch.setattr(cache.time, "time", lambda: now + 2)
+        reads = [cache.get_or_compute("categories:g0:list", 1, lambda: next(values), stale_ttl=60) for _ in range(3)]
+        assert reads == ["old"] * 3
+        assert len(deferred_refreshes) == 1
+
+        deferred_refreshes.pop()()
+        reads = [cache.get_or_compute("categories:g0:list", 1, lambda: next(values), stale_ttl=60) for _ in range(3)]
+        assert reads == ["new"] * 3
+        assert not deferred_refreshes
+
+    def test_failed_refresh_keeps_stale_value(self, fake_redis, deferred_refreshes):
+        import app.cache as cache
+        cache.get_or_compute("packages:g0:list", 60, lambda: ["old"], stale_ttl=30)
+        self._expire("packages:g0:list")
+
+        def broken():
+            raise RuntimeError("db down")
+        assert cache.get_or_compute("packages:g0:list", 60, broken, stale_ttl=30) == ["old"]
+        deferred_refreshes.pop()()
+        assert not fake_redis.exists("lock:packages:g0:list")
+        assert cache.get_cache("packages:g0:list")["_v"] == ["old"]
+
+    def test_category_list_refreshes_in_own_session(self, db, fake_redis, deferred_refreshes):
+        from app.models.category import Category
+        from app.services.category_service import CategoryService
+        db.add(Category(name="Books", slug="books"))
+        db.commit()
+        assert [c["name"] for c in CategoryService.get_all(db)] == ["Books"]
+
+        # A write that bypasses the service (no invalidation) only shows up after a refresh
+        db.query(Category).filter(Category.slug == "books").update({Category.name: "Novels"})
+        db.commit()
+        self._expire("categories:g0:list:True")
+
+        assert [c["name"] for c in CategoryService.get_all(db)] == ["Books"]
+        deferred_refreshes.pop()()
+        assert [c["name"] for c in CategoryService.get_all(db)] == ["Novels"]
+
+
+class TestCircuitBreaker:
+
+    @staticmethod
+    def _fail(fake_redis, monkeypatch):
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        def down(*args, **kwargs):
+            raise RedisConnectionError("connection refused")
+        monkeypatch.setattr(fake_redis, "get", down)
+        monkeypatch.setattr(fake_redis, "ping", down)
+
+    def test_repeated_errors_open_the_breaker(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        self._fail(fake_redis, monkeypatch)
+        for _ in range(cache.REDIS_BREAKER_THRESHOLD):
+            assert get_cache("coupons:id:1") is None
+        assert cache.redis_status()["state"] == "open"
+
+        # Degraded mode: helpers return without touching Redis
+        monkeypatch.setattr(fake_redis, "get", lambda key: pytest.fail("Redis used while open"))
+        assert get_cache("coupons:id:1") is None
+        assert set_cache("coupons:id:1", {"a": 1}) is False
+        assert invalidate_namespace(NS_PACKAGES) is False
+
+    def test_half_open_probe_closes_on_success(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        cache._breaker.trip(RuntimeError("boom"))
+        assert cache.get_redis_client() is None
+
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + cache.REDIS_BACKOFF_BASE + 0.1)
+        assert cache.get_redis_client() is fake_redis
+        assert cache.redis_status()["state"] == "closed"
+
+    def test_failed_probe_backs_off_exponentially(self, fake_redis, monkeypatch):
+        import app.cache as cache
+        self._fail(fake_redis, monkeypatch)
+        cache._breaker.trip(RuntimeError("boom"))
+
+        now = cache.time.monotonic()
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now + cache.REDIS_BACKOFF_BASE + 0.1)
+        assert cache.get_redis_client() is None
+        status = cache.redis_status()
+        assert status["state"] == "open"
+        assert status["backoff_seconds"] == cache.REDIS_BACKOFF_BASE * 2
+
+    def test_connect_failure_is_not_retried_per_call(self, monkeypatch):
+        import app.cache as cache
+        cache._breaker.reset()
+        attempts = []
+
+        def refuse():
+            attempts.append(1)
+            raise OSError("connection refused")
+        monkeypatch.setattr(cache, "_connect", refuse)
+
+        for _ in range(10):
+            assert cache.get_redis_client() is None
+        assert len(attempts) == 1
+        cache._breaker.reset()
+
+    def test_data_errors_do_not_trip(self, fake_redis):
+        import app.cache as cache
+        fake_redis.set("coupons:id:bad", "not json")
+        for _ in range(cache.REDIS_BREAKER_THRESHOLD + 1):
+            get_cache("coupons:id:bad")
+        assert cache.redis_status()["state"] == "closed"
+
+    def test_health_reports_breaker_state(self, client, fake_redis):
+        assert client.get("/health").json()["redis"]["state"] == "closed"
+
+
+class TestCodec:
+
+    def test_msgpack_round_trips_rich_types(self):
+        import uuid
+        from datetime import date, datetime, timezone
+        from decimal import Decimal
+        from app.cache import encode_value, decode_value
+
+        value = {
+            "id": uuid.uuid4(),
+            "created_at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+            "day": date(2024, 5, 1),
+            "price": 19.99,
+            "amount": Decimal("10.50"),
+            "tags": ["a", None, True],
+        }
+        assert decode_value(encode_value(value, codec="msgpack")) == value
+
+    def test_large_payloads_are_compressed(self, monkeypatch):
+        import app.cache as cache
+        monkeypatch.setattr(cache, "CACHE_COMPRESS_THRESHOLD", 100)
+        value = [{"title": "Coupon", "brand": "Brand"}] * 50
+
+        small = cache.encode_value({"a": 1}, codec="msgpack")
+        large = cache.encode_value(value, codec="msgpack")
+        assert small[0] == cache.MsgpackCodec.codec_id
+        assert large[0] == cache.MsgpackCodec.codec_id | 0x01
+        assert len(large) < len(cache.MsgpackCodec.dumps(value))
+        assert cache.decode_value(large) == value
+
+    def test_reads_json_codec_and_legacy_entries(self):
+        from app.cache import encode_value, decode_value
+        assert decode_value(encode_value({"a": [1, 2]}, codec="json")) == {"a": [1, 2]}
+        assert decode_value(b'{"legacy": true}') == {"legacy": True}
+
+    def test_cached_coupon_keeps_native_types(self, db, sample_coupon, fake_redis):
+        import uuid
+        from datetime import datetime
+        from app.read_models import CouponDTO
+        from app.services.coupon_service import CouponService
+
+        coupon_id = uuid.UUID(sample_coupon["id"])
+        CouponService.get_by_id(db, coupon_id)
+        assert fake_redis.get(CouponService.entity_key(coupon_id)) is not None
+        cached = CouponService.get_by_id(db, coupon_id)
+        assert isinstance(cached, CouponDTO)
+        assert cached.id == coupon_id
+        assert isinstance(cached.created_at, datetime)
+
+    @pytest.mark.parametrize("codec", ["json", "msgpack"])
+    def test_coupon_by_code_under_each_codec(self, db, sample_coupon, fake_redis, monkeypatch, codec):
+        import uuid
+        import app.cache as cache
+        from app.services.coupon_service import CouponService
+        monkeypatch.setattr(cache, "CACHE_CODEC", codec)
+
+        code = sample_coupon["code"]
+        assert str(CouponService.get_by_code(db, code).id) == sample_coupon["id"]
+        assert get_cache(cache.cache_key("coupons", "code", code.upper())) == sample_coupon["id"]
+        assert str(CouponService.get_by_code(db, code).id) == sample_coupon["id"]
+        assert fake_redis.exists(CouponService.entity_key(uuid.UUID(sample_coupon["id"])))
+
+
+class TestBatchedAccess:
+
+    def test_get_many_returns_hits_only(self, fake_redis):
+        from app.cache import get_many, set_many
+        assert set_many({"coupons:id:1": {"a": 1}, "coupons:id:2": [2]}, 60) is True
+        assert fake_redis.round_trips == 1
+        assert get_many(["coupons:id:1", "coupons:id:2", "coupons:id:3"]) == {
+            "coupons:id:1": {"a": 1}, "coupons:id:2": [2],
+        }
+
+    def test_batch_helpers_degrade_without_redis(self):
+        from app.cache import get_many, set_many, redis_pipeline
+        assert get_many(["a"]) == {}
+        assert set_many({"a": 1}) is False
+        with redis_pipeline() as pipe:
+            assert pipe is None
+
+    def test_get_or_compute_many_loads_only_misses(self, fake_redis):
+        from app.cache import get_or_compute_many
+        keys = {1: "k:1", 2: "k:2", 3: "k:3"}
+        loaded = []
+
+        def loader(missing):
+            loaded.append(sorted(missing))
+            return {i: f"v{i}" for i in missing if i != 3}
+
+        assert get_or_compute_many(keys, 60, loader) == {1: "v1", 2: "v2"}
+        assert get_or_compute_many(keys, 60, loader) == {1: "v1", 2: "v2"}
+        assert loaded == [[1, 2, 3], [3]]
+
+    def test_view_tracking_is_one_round_trip(self, client, sample_coupon, fake_redis):
+        coupon_id = sample_coupon["id"]
+        before = fake_redis.round_trips
+        client.post(f"/coupons/{coupon_id}/view", params={"session_id": "s1"})
+        assert fake_redis.round_trips == before + 1
+        import time
+        from app.services.redis_service import RedisService
+        bucket = RedisService._bucket_key(int(time.time() // 3600))
+        assert fake_redis.zrevrange(bucket, 0, -1) == [coupon_id.encode()]
+        assert fake_redis.lrange("recently_viewed:s1", 0, -1) == [coupon_id.encode()]
+
+    def test_trending_and_recent_keep_redis_order(self, client, admin_user, sample_coupon, fake_redis, db):
+        from app.services.redis_service import RedisService
+        other = client.post("/coupons/", json={
+            "code": "OTHER10", "title": "Other", "discount_type": "percentage",
+            "discount_amount": 10.0, "is_active": True,
+        }, headers=admin_user["headers"]).json()
+
+        for coupon_id in (sample_coupon["id"], other["id"], other["id"]):
+            client.post(f"/coupons/{coupon_id}/view", params={"session_id": "s2"})
+
+        trending = client.get("/coupons/trending").json()
+        assert [c["id"] for c in trending] == [other["id"], sample_coupon["id"]]
+
+        RedisService.record_recently_viewed("s2", "not-a-uuid")
+        recent = client.get("/coupons/recently-viewed", params={"session_id": "s2"}).json()
+        assert [c["id"] for c in recent] == [other["id"], sample_coupon["id"]]
+
+    def test_package_get_by_ids_shares_entity_cache(self, client, admin_user, db, fake_redis):
+        import uuid
+        from app.services.package_service import PackageService
+        created = client.post("/packages/", json={"name": "Batch Pack", "slug": "batch-pack"},
+                              headers=admin_user["headers"]).json()
+        package_id = uuid.UUID(created["id"])
+
+        assert PackageService.get_by_id(db, package_id)["name"] == "Batch Pack"
+        found = PackageService.get_by_ids(db, [package_id, uuid.uuid4()])
+        assert list(found) == [package_id]
+        assert found[package_id]["name"] == "Batch Pack"
@@ -0,0 +1,56 @@
+"""Tests for the async cache API (shares the in-memory Redis stand-in with the sync layer)."""
+import asyncio
+
+import pytest
+
+import app.cache_async as acache
+from app.cache import get_cache, set_cache, ns_cache_key, NS_PACKAGES
+
+
+@pytest.fixture
+def fake_async_redis(fake_redis):
+    # fake_redis routes the async client to the same in-memory store
+    return fake_redis
+
+
+def test_entries_are_shared_with_sync_layer(fake_async_redis):
+    async def scenario():
+        await acache.set_cache("coupons:id:1", {"title": "Async"})
+        assert get_cache("coupons:id:1") == {"title": "Async"}
+        set_cache("coupons:id:2", [1, 2])
+        assert await acache.get_many(["coupons:id:1", "coupons:id:2", "coupons:id:3"]) == {
+            "coupons:id:1": {"title": "Async"}, "coupons:id:2": [1, 2],
+        }
+    asyncio.run(scenario())
+
+
+def test_namespace_generations_match(fake_async_redis):
+    async def scenario():
+        assert await acache.invalidate_namespace(NS_PACKAGES) is True
+        assert await acache.ns_cache_key(NS_PACKAGES, "list") == ns_cache_key(NS_PACKAGES, "list")
+        assert await acache.ns_cache_key(NS_PACKAGES, "list") == "packages:g1:list"
+    asyncio.run(scenario())
+
+
+def test_get_or_compute_accepts_coroutine_loaders(fake_async_redis):
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return ["fresh"]
+
+    async def scenario():
+        assert await acache.get_or_compute("packages:g0:list", 60, loader) == ["fresh"]
+        assert await acache.get_or_compute("packages:g0:list", 60, loader, beta=0) == ["fresh"]
+    asyncio.run(scenario())
+    assert calls == [1]
+    assert not fake_async_redis.exists("lock:packages:g0:list")
+
+
+def test_degrades_without_redis():
+    async def scenario():
+        assert await acache.get_cache("x") is None
+        assert await acache.set_cache("x", 1) is False
+        assert await acache.invalidate_namespace(NS_PACKAGES) is False
+        assert await acache.get_or_compute("x", 60, lambda: 5) == 5
+    asyncio.run(scenario())
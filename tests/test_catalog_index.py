@@ -0,0 +1,136 @@
+"""Tests for the in-memory coupon catalog index."""
+import json
+
+import pytest
+
+import app.cache as cache
+from app.models.coupon import Coupon
+from app.services import catalog_index
+from app.services.catalog_index import coupon_index
+from app.services.coupon_service import CouponService
+
+
+@pytest.fixture
+def live_index(fake_redis, monkeypatch):
+    """Index trusted (as if subscribed to broadcasts) and rebuilt for this test's database."""
+    monkeypatch.setattr(cache, "_local_tier_ready", True)
+    coupon_index.invalidate()
+    yield coupon_index
+    coupon_index.invalidate()
+
+
+def _coupon(client, admin_user, code, **fields):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "price": 1.0, "is_active": True, **fields,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+@pytest.fixture
+def catalog(client, admin_user, sample_category):
+    coupons = [
+        _coupon(client, admin_user, "IDX-A1", category_id=sample_category["id"], discount_amount=5.0),
+        _coupon(client, admin_user, "IDX-A2", category_id=sample_category["id"], discount_amount=25.0, is_featured=True),
+        _coupon(client, admin_user, "IDX-B1", discount_amount=50.0),
+        _coupon(client, admin_user, "IDX-B2", discount_amount=15.0, is_featured=True),
+        _coupon(client, admin_user, "IDX-B3", discount_amount=30.0),
+    ]
+    client.delete(f"/coupons/{coupons[4]['id']}", headers=admin_user["headers"])
+    resp = client.post("/packages/", json={"name": "Index Pack", "slug": "index-pack", "coupon_ids": [coupons[3]["id"]]},
+                       headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return coupons
+
+
+def test_index_matches_sql(db, live_index, catalog, sample_category):
+    from uuid import UUID
+    category_id = UUID(sample_category["id"])
+    filter_sets = [
+        dict(active_only=True), dict(active_only=False), dict(category_id=category_id),
+        dict(is_featured=True), dict(is_featured=False, active_only=True), dict(min_discount=20.0),
+        dict(active_only=True, min_discount=10.0, category_id=category_id),
+    ]
+    for filters in filter_sets:
+        args = dict(active_only=False, category_id=None, is_featured=None, min_discount=None)
+        args.update(filters)
+        expected = [c.id for c in CouponService._load_list(db, 0, 100, search=None, **args)]
+        assert live_index.page(db, **args) == expected, filters
+
+    # Offset and cursor pages
+    everything = live_index.page(db)
+    assert live_index.page(db, skip=1, limit=2) == everything[1:3]
+    last = db.query(Coupon).filter(Coupon.id == everything[0]).one()
+    assert live_index.page(db, after=(last.created_at, last.id)) == everything[1:]
+
+
+def test_listing_is_served_from_index(client, db, live_index, catalog, monkeypatch):
+    sql_codes = [c["id"] for c in client.get("/coupons/").json()]
+
+    def no_sql(*args, **kwargs):
+        raise AssertionError("listing must come from the index")
+    monkeypatch.setattr(CouponService, "_load_list", no_sql)
+    assert [c["id"] for c in client.get("/coupons/", params={"limit": 100}).json()] == sql_codes
+
+
+def test_writes_patch_the_index_incrementally(client, admin_user, db, live_index, catalog, monkeypatch):
+    assert len(live_index.page(db, active_only=True)) == 3
+
+    def no_rebuild(session):
+        raise AssertionError("a write must not force a full rebuild")
+    monkeypatch.setattr(live_index, "_rebuild", no_rebuild)
+
+    client.put(f"/coupons/{catalog[0]['id']}", json={"is_active": False}, headers=admin_user["headers"])
+    created = _coupon(client, admin_user, "IDX-C1")
+    ids = [str(i) for i in live_index.page(db, active_only=True)]
+    assert ids[0] == created["id"]
+    assert catalog[0]["id"] not in ids
+
+
+def test_broadcast_marks_rows_dirty(db, live_index, catalog):
+    live_index.page(db)
+    db.query(Coupon).filter(Coupon.id == catalog[1]["id"]).update({Coupon.is_featured: False})
+    db.commit()
+    assert len(live_index.page(db, is_featured=True)) == 1  # not told yet
+
+    catalog_index._on_catalog_message(json.dumps([catalog[1]["id"]]).encode())
+    assert live_index.page(db, is_featured=True) == []
+
+
+def test_counts(db, live_index, catalog, sample_category):
+    from uuid import UUID
+    counts = live_index.counts(db, active_only=True)
+    assert counts["total"] == 3
+    assert counts["featured"] == 1
+    assert counts["category"] == {UUID(sample_category["id"]): 2, None: 1}
+    assert counts["discount"] == {"0-10": 1, "25-50": 1, "50-75": 1}
+
+
+def test_untrusted_index_defers_to_sql(db, fake_redis):
+    assert cache.local_tier_epoch() is None
+    assert coupon_index.page(db) is None
+
+
+def test_failed_refresh_keeps_rows_dirty(db, live_index, catalog, monkeypatch):
+    live_index.page(db)
+    db.query(Coupon).filter(Coupon.id == catalog[1]["id"]).update({Coupon.is_featured: False})
+    db.commit()
+    catalog_index._on_catalog_message(json.dumps([catalog[1]["id"]]).encode())
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("database went away")
+    monkeypatch.setattr(catalog_index, "_load_links", broken)
+    with pytest.raises(RuntimeError):
+        live_index.page(db)
+    monkeypatch.undo()
+    monkeypatch.setattr(cache, "_local_tier_ready", True)
+    assert live_index.page(db, is_featured=True) == []
+
+
+def test_busy_refresh_defers_to_sql(db, live_index, catalog):
+    live_index.page(db)
+    live_index.mark_dirty([catalog[1]["id"]])
+    with live_index._refresh_lock:
+        assert live_index.page(db) is None
+    assert live_index.page(db) is not None
@@ -0,0 +1,121 @@
+"""Tests for the normalized coupon_prices table and price filters/sorting."""
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.models.coupon_price import CouponPrice
+from app.models.user import User
+from app.services.cart_service import CartService
+from app.services.coupon_service import CouponService
+
+
+def _coupon(client, admin_user, code, pricing, **fields):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True, "pricing": pricing, **fields,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+def _prices(db, coupon_id):
+    rows = db.query(CouponPrice).filter(CouponPrice.coupon_id == coupon_id).all()
+    return {row.currency: (row.price_cents, row.discount_cents) for row in rows}
+
+
+def test_prices_follow_create_and_update(client, admin_user, db):
+    from uuid import UUID
+    coupon = _coupon(client, admin_user, "PRC-1", {"USD": {"price": 1.99, "discount_amount": 0.5}, "AED": {"price": 7.3}})
+    coupon_id = UUID(coupon["id"])
+    assert _prices(db, coupon_id) == {"USD": (199, 50), "AED": (730, None)}
+
+    client.put(f"/coupons/{coupon['id']}", json={"pricing": {"INR": {"price": 99.0}}}, headers=admin_user["headers"])
+    db.expire_all()
+    assert _prices(db, coupon_id) == {"INR": (9900, None)}
+
+    # Updates that don't touch pricing leave the rows alone
+    client.put(f"/coupons/{coupon['id']}", json={"title": "Renamed"}, headers=admin_user["headers"])
+    db.expire_all()
+    assert _prices(db, coupon_id) == {"INR": (9900, None)}
+
+
+def test_prices_skip_keys_get_price_cannot_read():
+    assert CouponService.price_rows({"usd": {"price": 1.0}, "Points": 5, "AED": {"price": "n/a"}, "INR": 80}) == [
+        {"currency": "INR", "price_cents": 8000, "discount_cents": None},
+    ]
+
+
+def test_get_price_cents_falls_back_to_usd(client, admin_user, db):
+    from uuid import UUID
+    both = UUID(_coupon(client, admin_user, "PRC-B", {"USD": {"price": 2.0}, "AED": {"price": 7.0}})["id"])
+    usd = UUID(_coupon(client, admin_user, "PRC-U", {"USD": {"price": 3.0}})["id"])
+    bare = UUID(_coupon(client, admin_user, "PRC-N", None)["id"])
+    assert CouponService.get_price_cents(db, [both, usd, bare], "aed") == {both: 700, usd: 300}
+
+
+def test_price_filter_and_sort(client, admin_user):
+    for code, price in (("PRC-C", 12.0), ("PRC-A", 3.5), ("PRC-D", 40.0), ("PRC-B", 8.0)):
+        _coupon(client, admin_user, code, {"USD": {"price": price}})
+    _coupon(client, admin_user, "PRC-X", {"AED": {"price": 5.0}})
+
+    resp = client.get("/coupons/", params={"sort": "price", "limit": 2})
+    assert resp.status_code == 200
+    page = resp.json()
+    assert [c["prices"]["USD"] for c in page] == [3.5, 8.0]
+    cursor = resp.headers["X-Next-Cursor"]
+
+    rest = client.get("/coupons/", params={"sort": "price", "limit": 2, "cursor": cursor}).json()
+    assert [c["prices"]["USD"] for c in rest] == [12.0, 40.0]
+
+    ranged = client.get("/coupons/", params={"min_price": 5, "max_price": 12}).json()
+    assert sorted(c["prices"]["USD"] for c in ranged) == [8.0, 12.0]
+
+    aed = client.get("/coupons/", params={"sort": "price", "currency": "AED"}).json()
+    assert [c["prices"] for c in aed] == [{"AED": 5.0}]
+
+    # A cursor only continues the sort (and currency) it was issued for
+    assert client.get("/coupons/", params={"cursor": cursor}).status_code == 400
+    assert client.get("/coupons/", params={"sort": "price", "currency": "AED", "cursor": cursor}).status_code == 400
+
+
+def test_price_cursor_pages_through_equal_prices(client, admin_user):
+    codes = {_coupon(client, admin_user, code, {"USD": {"price": price}})["id"]: code
+             for code, price in (("PRC-E1", 5.0), ("PRC-E2", 5.0), ("PRC-E3", 5.0), ("PRC-E0", 2.0))}
+    seen, cursor = [], None
+    while True:
+        params = {"sort": "price", "limit": 1, **({"cursor": cursor} if cursor else {})}
+        resp = client.get("/coupons/", params=params)
+        seen += [codes[c["id"]] for c in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    # Cheapest first, then newest first among equal prices, each coupon once
+    assert seen == ["PRC-E0", "PRC-E3", "PRC-E2", "PRC-E1"]
+
+
+def test_price_cursor_skipped_when_last_coupon_lacks_the_currency():
+    last = SimpleNamespace(pricing={"AED": {"price": 7.0}}, created_at=datetime.utcnow(), id=uuid4())
+    assert CouponService.list_cursor([last], 1, sort="price", currency="usd") is None
+    last.pricing = {"USD": {"price": 2.0}}
+    assert CouponService.list_cursor([last], 1, sort="price", currency="usd") is not None
+
+
+def test_cart_total_prices_packages_from_table(client, admin_user, regular_user, db):
+    first = _coupon(client, admin_user, "PRC-P1", {"USD": {"price": 10.0}, "AED": {"price": 36.0}})
+    second = _coupon(client, admin_user, "PRC-P2", {"USD": {"price": 5.0}})
+    single = _coupon(client, admin_user, "PRC-S1", {"USD": {"price": 2.25}})
+    pkg = client.post("/packages/", json={
+        "name": "Price Pack", "slug": "price-pack", "discount": 10.0,
+        "coupon_ids": [first["id"], second["id"]],
+    }, headers=admin_user["headers"]).json()
+    assert pkg["pricing"]["USD"] == 15.0
+
+    client.post("/cart/add", json={"coupon_id": single["id"], "quantity": 2}, headers=regular_user["headers"])
+    resp = client.post("/cart/add", json={"package_id": pkg["id"], "quantity": 1}, headers=regular_user["headers"])
+    assert resp.status_code == 201, resp.text
+
+    # 2 x 2.25 + (10 + 5) x 0.9
+    assert client.get("/cart/", headers=regular_user["headers"]).json()["total_amount"] == 18.0
+    # AED: PRC-S1 and PRC-P2 fall back to USD
+    user = db.query(User).filter(User.phone_number.like("%2025559876")).one()
+    assert CartService.get_cart_total(db, user.id, "AED") == 4.5 + 36.9
@@ -0,0 +1,53 @@
+"""Tests for ETag / If-None-Match conditional GETs."""
+from app.middleware.etag import etag_matches
+
+
+def test_etag_matching_rules():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert etag_matches('"abc"', 'W/"abc"') and etag_matches('W/"abc"', 'W/"abc"')
+    assert not etag_matches('"abd"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_catalog_revalidation_returns_304(client, sample_category):
+    first = client.get("/categories/")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = client.get("/categories/", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_known_etag_skips_the_route(client, sample_category, fake_redis, monkeypatch):
+    from app.services.category_service import CategoryService
+    etag = client.get("/categories/").headers["etag"]
+
+    def no_db(*args, **kwargs):
+        raise AssertionError("revalidation must not reach the service")
+    monkeypatch.setattr(CategoryService, "get_all", no_db)
+    assert client.get("/categories/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_write_invalidates_etag(client, admin_user, sample_category, fake_redis):
+    etag = client.get("/categories/").headers["etag"]
+    client.put(f"/categories/{sample_category['id']}", json={"name": "Gadgets"},
+               headers=admin_user["headers"])
+
+    response = client.get("/categories/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[0]["name"] == "Gadgets"
+
+
+def test_wallet_etag_is_private(client, regular_user):
+    first = client.get("/user/wallet", headers=regular_user["headers"])
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/user/wallet", headers={
+        **regular_user["headers"], "If-None-Match": first.headers["etag"],
+    })
+    assert again.status_code == 304
@@ -0,0 +1,136 @@
+"""Tests for /coupons/facets and /packages/facets."""
+import pytest
+
+import app.cache as cache
+from app.models.country import Country
+from app.models.coupon import coupon_countries
+from app.models.region import Region
+from app.services.catalog_index import coupon_index
+from app.services.facet_service import FacetService
+
+
+def _coupon(client, admin_user, code, **fields):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": f"{code.title()} voucher", "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True, **fields,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()
+
+
+@pytest.fixture
+def countries(db):
+    region = Region(name="Gulf", slug="gulf")
+    db.add(region)
+    db.flush()
+    uae = Country(name="United Arab Emirates", slug="uae", country_code="AE", region_id=region.id)
+    ksa = Country(name="Saudi Arabia", slug="ksa", country_code="SA", region_id=region.id)
+    db.add_all([uae, ksa])
+    db.commit()
+    return uae, ksa
+
+
+@pytest.fixture
+def catalog(client, admin_user, db, sample_category, countries):
+    usd = {"USD": {"price": 5.0}}
+    both = {"USD": {"price": 5.0}, "AED": {"price": 18.0}}
+    coupons = [
+        _coupon(client, admin_user, "FCT-A1", brand="Noon", category_id=sample_category["id"],
+                discount_amount=5.0, pricing=usd),
+        _coupon(client, admin_user, "FCT-A2", brand="Noon", category_id=sample_category["id"],
+                discount_amount=30.0, pricing=both, is_featured=True),
+        _coupon(client, admin_user, "FCT-B1", brand="Amazon", discount_amount=80.0, pricing=both),
+    ]
+    uae, ksa = countries
+    db.execute(coupon_countries.insert(), [
+        {"coupon_id": coupons[1]["id"], "country_id": uae.id},
+        {"coupon_id": coupons[1]["id"], "country_id": ksa.id},
+        {"coupon_id": coupons[2]["id"], "country_id": uae.id},
+    ])
+    db.commit()
+    return coupons
+
+
+def test_coupon_facets(client, catalog, sample_category):
+    resp = client.get("/coupons/facets")
+    assert resp.status_code == 200
+    facets = resp.json()
+    assert facets["total"] == 3
+    assert facets["featured"] == 1
+    assert facets["categories"] == [{
+        "id": sample_category["id"], "name": sample_category["name"],
+        "slug": sample_category["slug"], "count": 2,
+    }]
+    assert facets["brands"] == {"Noon": 2, "Amazon": 1}
+    assert facets["countries"] == {"AE": 2, "SA": 1}
+    assert facets["currencies"] == {"USD": 3, "AED": 2}
+    assert facets["discounts"] == {"0-10": 1, "25-50": 1, "75+": 1}
+
+
+def test_coupon_facets_follow_filters(client, catalog, sample_category):
+    facets = client.get("/coupons/facets", params={"category_id": sample_category["id"], "min_discount": 10}).json()
+    assert facets["total"] == 1
+    assert facets["brands"] == {"Noon": 1}
+    assert facets["countries"] == {"AE": 1, "SA": 1}
+
+    searched = client.get("/coupons/facets", params={"search": "amazon"}).json()
+    assert searched["total"] == 1
+    assert searched["currencies"] == {"USD": 1, "AED": 1}
+
+
+def test_index_and_sql_facets_agree(db, catalog, fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "_local_tier_ready", True)
+    coupon_index.invalidate()
+    try:
+        for active_only in (True, False):
+            from_index = coupon_index.counts(db, active_only=active_only)
+            from_sql = FacetService._count_coupons(db, active_only, None, None, None, None)
+            assert FacetService._resolve(db, from_index) == FacetService._resolve(db, from_sql)
+    finally:
+        coupon_index.invalidate()
+
+
+def test_currency_facet_counts_priced_currencies(client, admin_user, db, catalog, fake_redis, monkeypatch):
+    # get_price() can't read "eur", so no price filter matches it either
+    _coupon(client, admin_user, "FCT-C1", pricing={"eur": {"price": 4.0}, "AED": {"price": 15.0}})
+    assert client.get("/coupons/facets").json()["currencies"] == {"USD": 3, "AED": 3}
+
+    monkeypatch.setattr(cache, "_local_tier_ready", True)
+    coupon_index.invalidate()
+    try:
+        assert coupon_index.counts(db)["currency"] == {"USD": 3, "AED": 3}
+    finally:
+        coupon_index.invalidate()
+
+
+def test_coupon_facets_refresh_after_write(client, admin_user, catalog, fake_redis):
+    assert client.get("/coupons/facets").json()["total"] == 3
+    client.delete(f"/coupons/{catalog[2]['id']}", headers=admin_user["headers"])
+    facets = client.get("/coupons/facets").json()
+    assert facets["total"] == 2
+    assert "Amazon" not in facets["brands"]
+
+
+def test_package_facets(client, admin_user, catalog, sample_category):
+    for slug, fields in (
+        ("gulf-pack", {"brand": "Noon", "country": "UAE", "discount": 20.0, "category_id": sample_category["id"],
+                       "coupon_ids": [catalog[0]["id"], catalog[1]["id"]]}),
+        ("solo-pack", {"brand": "Amazon", "country": "KSA", "coupon_ids": [catalog[2]["id"]], "is_featured": True}),
+        ("empty-pack", {"country": "UAE"}),
+    ):
+        resp = client.post("/packages/", json={"name": slug.title(), "slug": slug, **fields},
+                           headers=admin_user["headers"])
+        assert resp.status_code == 201, resp.text
+
+    facets = client.get("/packages/facets").json()
+    assert facets["total"] == 3
+    assert facets["featured"] == 1
+    assert [c["count"] for c in facets["categories"]] == [1]
+    assert facets["brands"] == {"Noon": 1, "Amazon": 1}
+    assert facets["countries"] == {"UAE": 2, "KSA": 1}
+    assert facets["currencies"] == {"USD": 2, "AED": 2}
+    assert facets["discounts"] == {"10-25": 1}
+
+    filtered = client.get("/packages/facets", params={"country": "UAE"}).json()
+    assert filtered["total"] == 2
+    assert filtered["currencies"] == {"USD": 1, "AED": 1}
@@ -0,0 +1,59 @@
+"""Tests for keyset (cursor) pagination."""
+from app.utils.pagination import encode_cursor
+
+
+def _create_coupons(client, admin_user, count):
+    for i in range(count):
+        client.post("/coupons/", json={
+            "code": f"PAGE{i}", "title": f"Page {i}", "discount_type": "percentage",
+            "discount_amount": 10.0, "price": 1.0, "is_active": True,
+        }, headers=admin_user["headers"])
+
+
+def test_coupon_cursor_walk(client, admin_user):
+    _create_coupons(client, admin_user, 5)
+
+    seen, cursor = [], None
+    for _ in range(5):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        resp = client.get("/coupons/", params=params)
+        assert resp.status_code == 200
+        seen += [c["id"] for c in resp.json()]
+        cursor = resp.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == 5 and len(set(seen)) == 5
+    # Newest first, same order as the offset listing
+    assert seen == [c["id"] for c in client.get("/coupons/", params={"limit": 10}).json()]
+
+
+def test_invalid_cursor_is_400(client):
+    assert client.get("/coupons/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_package_cursor_must_match_sort(client, admin_user):
+    for i in range(3):
+        client.post("/packages/", json={"name": f"Pack {i}", "slug": f"pack-{i}"},
+                    headers=admin_user["headers"])
+
+    first = client.get("/packages/", params={"limit": 2})
+    cursor = first.headers["x-next-cursor"]
+    rest = client.get("/packages/", params={"limit": 2, "cursor": cursor})
+    assert len(rest.json()) == 1
+    assert {p["slug"] for p in first.json()} | {p["slug"] for p in rest.json()} == {"pack-0", "pack-1", "pack-2"}
+
+    mismatched = client.get("/packages/", params={"limit": 2, "cursor": cursor, "filter": "avg_rating"})
+    assert mismatched.status_code == 400
+
+
+def test_admin_users_next_cursor(client, admin_user, regular_user):
+    first = client.get("/admin/users", params={"limit": 1}, headers=admin_user["headers"]).json()
+    assert first["next_cursor"]
+
+    second = client.get("/admin/users", params={"limit": 1, "cursor": first["next_cursor"]},
+                        headers=admin_user["headers"]).json()
+    assert second["items"][0]["id"] != first["items"][0]["id"]
+
+    bad = client.get("/admin/orders", params={"cursor": encode_cursor("x")}, headers=admin_user["headers"])
+    assert bad.status_code == 400
@@ -1,10 +1,12 @@
 import pytest
+from uuid import UUID
 from unittest.mock import MagicMock, patch
 from fastapi.testclient import TestClient
 from app.main import app
 from app.models.user import User
 from app.models.order import Order, OrderItem
 from app.models.coupon import Coupon
+from app.models.coupon_price import CouponPrice
 from app.utils.security import get_current_user
 from app.database import get_db
 
@@ -14,6 +16,7 @@ client = TestClient(app)
 MOCK_USER_ID = "550e8400-e29b-41d4-a716-446655440001"
 MOCK_OTHER_USER_ID = "550e8400-e29b-41d4-a716-446655440002"
 MOCK_ORDER_ID = "550e8400-e29b-41d4-a716-446655440099"
+MOCK_COUPON_ID = UUID("550e8400-e29b-41d4-a716-446655440042")
 
 @pytest.fixture
 def mock_db():
@@ -70,15 +73,18 @@ def test_payment_init_explicit_pricing_aed(mock_db):
             mock_stripe.PaymentIntent.create.return_value = MagicMock(id="pi_123", client_secret="secret")
             
             # Mock Data
-            mock_coupon = Coupon(pricing={"AED": 50.0, "INR": 500.0}, is_active=True, code="TEST_AED")
-            mock_item = OrderItem(quantity=2, coupon=mock_coupon)
+            mock_coupon = Coupon(id=MOCK_COUPON_ID, pricing={"AED": 50.0, "INR": 500.0}, is_active=True, code="TEST_AED")
+            mock_item = OrderItem(quantity=2, coupon_id=MOCK_COUPON_ID, coupon=mock_coupon)
             mock_item.coupon = mock_coupon # Explicitly set relationship for logic
             mock_order = Order(id=MOCK_ORDER_ID, user_id=MOCK_USER_ID, total_amount=20.0, items=[mock_item])
             
             # Configure DB Query Side Effect
-            def query_side_effect(model):
+            def query_side_effect(model, *columns):
                 mock_q = MagicMock()
-                if model == Order:
+                if model is CouponPrice.coupon_id:
+                     # Price lookup: rows of coupon_prices kept in sync with mock_coupon.pricing
+                     mock_q.filter.return_value.all.return_value = [(MOCK_COUPON_ID, "AED", 5000)]
+                elif model == Order:
                      mock_q.filter.return_value.first.return_value = mock_order
                      mock_q.options.return_value.filter.return_value.first.return_value = mock_order
                 elif model == Payment:
@@ -0,0 +1,67 @@
+"""Tests for the coupon read models and their batched hydration."""
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app.read_models import CouponDTO
+from app.services.coupon_service import CouponService
+
+
+def _coupon(client, admin_user, code, **fields):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True, **fields,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return uuid.UUID(resp.json()["id"])
+
+
+class _Statements:
+    def __init__(self, db):
+        self.bind = db.get_bind()
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self)
+
+
+def test_coupon_dto_is_read_only(db, sample_coupon, sample_category):
+    coupon = CouponService.get_by_id(db, uuid.UUID(sample_coupon["id"]))
+    with pytest.raises(AttributeError):
+        coupon.current_uses = 99
+    with pytest.raises(AttributeError):
+        coupon.extra = 1
+    assert CouponDTO.from_cache(coupon.to_cache()) == coupon
+
+
+def test_get_many_batches_misses_and_keeps_order(client, admin_user, db, fake_redis):
+    first = _coupon(client, admin_user, "DTO-A")
+    second = _coupon(client, admin_user, "DTO-B")
+    CouponService.get_by_id(db, first)
+
+    with _Statements(db) as statements:
+        coupons = CouponService.get_many(db, [str(second), "not-a-uuid", first, uuid.uuid4(), second])
+    assert [c.id for c in coupons] == [second, first, second]
+    assert statements.count == 1  # one IN query for the misses; `first` came from the cache
+
+    with _Statements(db) as statements:
+        CouponService.get_many(db, [first, second])
+    assert statements.count == 0
+
+
+def test_claim_increments_usage_and_refreshes_cache(client, admin_user, regular_user, db, fake_redis):
+    coupon_id = _coupon(client, admin_user, "DTO-CLAIM", max_uses=5)
+    assert CouponService.get_by_id(db, coupon_id).current_uses == 0
+
+    resp = client.post(f"/coupons/{coupon_id}/claim", headers=regular_user["headers"])
+    assert resp.status_code == 201, resp.text
+    assert CouponService.get_by_id(db, coupon_id).current_uses == 1
+    assert client.get(f"/coupons/{coupon_id}").json()["stock_sold"] == 1
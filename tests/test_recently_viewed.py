@@ -0,0 +1,65 @@
+"""Tests for the capped MRU recently-viewed list and its merge at login."""
+from app.services.redis_service import RedisService
+
+from tests.conftest import REGULAR_PHONE
+
+
+def _coupon(client, admin_user, code):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+def test_views_are_deduplicated_capped_and_single_round_trip(client, admin_user, fake_redis, monkeypatch):
+    monkeypatch.setattr(RedisService, "RECENTLY_VIEWED_MAX", 3)
+    ids = [_coupon(client, admin_user, f"MRU-{i}") for i in range(4)]
+    params = {"session_id": "anon-mru"}
+
+    for coupon_id in ids + [ids[1]]:
+        before = fake_redis.round_trips
+        assert client.post(f"/coupons/{coupon_id}/view", params=params).status_code == 201
+        assert fake_redis.round_trips - before == 1
+
+    key = RedisService._recently_viewed_key("anon-mru")
+    assert fake_redis.lrange(key, 0, -1) == [ids[1].encode(), ids[3].encode(), ids[2].encode()]
+    assert fake_redis.ttl(key) > 0
+
+    resp = client.get("/coupons/recently-viewed", params=params)
+    assert [c["id"] for c in resp.json()] == [ids[1], ids[3], ids[2]]
+
+
+def test_login_merges_anonymous_views_into_user_list(client, admin_user, fake_redis):
+    ids = [_coupon(client, admin_user, f"MRG-{i}") for i in range(3)]
+    client.post("/auth/register", json={**REGULAR_PHONE, "password": "userpass123", "full_name": "Merge User"})
+    token = client.post("/auth/login", json={**REGULAR_PHONE, "password": "userpass123"}).json()["access_token"]
+    user = {"session_id": client.get("/user/me", headers={"Authorization": f"Bearer {token}"}).json()["id"]}
+    client.post(f"/coupons/{ids[0]}/view", params=user)
+    client.post(f"/coupons/{ids[1]}/view", params=user)
+
+    anon = {"session_id": "anon-merge"}
+    client.post(f"/coupons/{ids[0]}/view", params=anon)
+    resp = client.post(f"/coupons/{ids[2]}/view", params=anon)
+    assert "httponly" in resp.headers["set-cookie"].lower()
+    assert client.cookies[RedisService.ANON_SESSION_COOKIE] == "anon-merge"
+
+    resp = client.post("/auth/login", json={**REGULAR_PHONE, "password": "userpass123"})
+    assert resp.status_code == 200
+    assert RedisService.ANON_SESSION_COOKIE not in client.cookies
+    assert fake_redis.lrange(RedisService._recently_viewed_key("anon-merge"), 0, -1) == []
+
+    merged = client.get("/coupons/recently-viewed", params=user).json()
+    assert [c["id"] for c in merged] == [ids[2], ids[0], ids[1]]
+
+
+def test_login_ignores_sessions_this_client_did_not_record(client, admin_user, fake_redis):
+    coupon_id = _coupon(client, admin_user, "MRG-X")
+    client.post(f"/coupons/{coupon_id}/view", params={"session_id": "someone-else"})
+    client.cookies.clear()
+
+    client.post("/auth/register", json={**REGULAR_PHONE, "password": "userpass123", "full_name": "Merge User"})
+    resp = client.post("/auth/login", json={**REGULAR_PHONE, "password": "userpass123", "session_id": "someone-else"})
+    assert resp.status_code == 200
+    assert fake_redis.lrange(RedisService._recently_viewed_key("someone-else"), 0, -1) == [coupon_id.encode()]
@@ -0,0 +1,43 @@
+"""Tests for the full-response byte cache on anonymous public GETs."""
+
+
+def test_repeat_read_is_served_from_cache(client, sample_category, fake_redis, monkeypatch):
+    from app.services.category_service import CategoryService
+    first = client.get("/categories/")
+    assert "x-cache" not in first.headers
+
+    def no_route(*args, **kwargs):
+        raise AssertionError("cached response must not reach the route")
+    monkeypatch.setattr(CategoryService, "get_all", no_route)
+
+    hit = client.get("/categories/")
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.content == first.content
+    assert hit.headers["etag"] == first.headers["etag"]
+    assert hit.headers["cache-control"].startswith("public")
+
+    revalidated = client.get("/categories/", headers={"If-None-Match": first.headers["etag"]})
+    assert revalidated.status_code == 304
+
+
+def test_query_order_shares_an_entry(client, sample_category, fake_redis):
+    client.get("/categories/", params=[("active_only", "true"), ("x", "1")])
+    hit = client.get("/categories/", params=[("x", "1"), ("active_only", "true")])
+    assert hit.headers["x-cache"] == "HIT"
+
+
+def test_write_invalidates_cached_response(client, admin_user, sample_category, fake_redis):
+    client.get("/categories/")
+    client.put(f"/categories/{sample_category['id']}", json={"name": "Gadgets"},
+               headers=admin_user["headers"])
+    response = client.get("/categories/")
+    assert "x-cache" not in response.headers
+    assert response.json()[0]["name"] == "Gadgets"
+
+
+def test_authenticated_and_realtime_reads_bypass(client, admin_user, sample_coupon, fake_redis):
+    for _ in range(2):
+        authed = client.get("/categories/", headers=admin_user["headers"])
+        trending = client.get("/coupons/trending")
+    assert "x-cache" not in authed.headers
+    assert "x-cache" not in trending.headers
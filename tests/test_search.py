@@ -0,0 +1,69 @@
+"""Tests for indexed coupon search (SQLite FTS5 path; Postgres SQL is checked by compiling it)."""
+from sqlalchemy.dialects import postgresql
+
+from app.models.coupon import Coupon
+from app.services.search_service import CouponSearch
+
+
+def _coupon(client, admin_user, code, title, brand=None, description=None):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": title, "brand": brand, "description": description,
+        "discount_type": "percentage", "discount_amount": 10.0, "price": 1.0, "is_active": True,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201
+    return resp.json()
+
+
+def _titles(client, search):
+    resp = client.get("/coupons/", params={"search": search})
+    assert resp.status_code == 200
+    return [c["title"] for c in resp.json()]
+
+
+def test_title_match_ranks_above_description_match(client, admin_user):
+    _coupon(client, admin_user, "DESC1", "Weekend deal", description="Great for a holiday trip")
+    _coupon(client, admin_user, "TITLE1", "Holiday voucher")
+    assert _titles(client, "holiday") == ["Holiday voucher", "Weekend deal"]
+
+
+def test_prefix_and_multi_word_search(client, admin_user):
+    _coupon(client, admin_user, "NF1", "Streaming month", brand="Netflix")
+    _coupon(client, admin_user, "SP1", "Streaming month", brand="Spotify")
+    assert _titles(client, "netf") == ["Streaming month"]
+    assert len(_titles(client, "streaming month")) == 2
+
+
+def test_typo_tolerance(client, admin_user):
+    _coupon(client, admin_user, "EL1", "Electronics sale")
+    assert _titles(client, "electornics") == ["Electronics sale"]
+    assert _titles(client, "zzzzqqqq") == []
+
+
+def test_index_follows_updates_and_deletes(client, admin_user):
+    coupon = _coupon(client, admin_user, "UPD1", "Coffee treat")
+    client.put(f"/coupons/{coupon['id']}", json={"title": "Tea treat"}, headers=admin_user["headers"])
+    assert _titles(client, "coffee") == []
+    assert _titles(client, "tea") == ["Tea treat"]
+
+    client.delete(f"/coupons/{coupon['id']}", headers=admin_user["headers"])
+    assert _titles(client, "tea") == []
+
+
+def test_query_syntax_is_not_interpreted(client, admin_user):
+    _coupon(client, admin_user, "SYN1", "Plain coupon")
+    for search in ['"', "plain*", "NOT plain", "plain OR (", "%"]:
+        assert client.get("/coupons/", params={"search": search}).status_code == 200
+
+
+def test_search_is_not_cursor_paged(client, admin_user):
+    _coupon(client, admin_user, "CUR1", "Cursor coupon")
+    resp = client.get("/coupons/", params={"search": "cursor", "limit": 1})
+    assert "x-next-cursor" not in resp.headers
+
+
+def test_postgres_query_uses_search_indexes(db):
+    sql = str(CouponSearch._apply_postgres(db.query(Coupon), "Gift crd", ["gift", "crd"], True)
+              .statement.compile(dialect=postgresql.dialect()))
+    assert "coupons.search_vector @@ to_tsquery" in sql
+    assert "<%% lower(coalesce(coupons.title, '') || ' ' || coalesce(coupons.brand, '')" in sql
+    assert "ts_rank_cd" in sql and "word_similarity" in sql
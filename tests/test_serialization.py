@@ -0,0 +1,66 @@
+"""The prevalidated response path must emit what response_model validation would."""
+import json
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+
+from app.schemas.coupon import CouponPublicResponse
+from app.schemas.package import PackageListResponse
+from app.services.coupon_service import CouponService
+from app.services.package_service import PackageService
+from app.utils.serialization import PrevalidatedJSONResponse, project
+
+
+def _validated(model, items):
+    adapter = TypeAdapter(List[model])
+    return adapter.dump_python(adapter.validate_python(items), mode="json")
+
+
+@pytest.fixture
+def catalog(client, admin_user, sample_category):
+    coupon_ids = []
+    for code, fields in (
+        ("SER-A", {"category_id": sample_category["id"], "expiration_date": "2031-05-01T10:30:00",
+                   "pricing": {"USD": {"price": 4.5, "discount_amount": 1.0}, "AED": {"price": 16.0}}}),
+        ("SER-B", {"stock": 3, "is_featured": True, "brand": "Noon"}),
+    ):
+        resp = client.post("/coupons/", json={
+            "code": code, "title": f"{code} title", "discount_type": "percentage",
+            "discount_amount": 12.5, "is_active": True, **fields,
+        }, headers=admin_user["headers"])
+        assert resp.status_code == 201, resp.text
+        coupon_ids.append(resp.json()["id"])
+    resp = client.post("/packages/", json={
+        "name": "Serial Pack", "slug": "serial-pack", "discount": 10.0, "category_id": sample_category["id"],
+        "coupon_ids": coupon_ids[:1],
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return coupon_ids
+
+
+def test_coupon_payload_matches_validated_output(db, catalog):
+    coupons = CouponService.get_many(db, catalog)
+    fast = json.loads(PrevalidatedJSONResponse([CouponPublicResponse.payload(c) for c in coupons]).body)
+    assert fast == _validated(CouponPublicResponse, coupons)
+    assert "code" not in fast[0] and "redeem_code" not in fast[0]
+
+
+def test_package_payload_matches_validated_output(db, catalog):
+    packages = PackageService.get_all(db)
+    fast = json.loads(PrevalidatedJSONResponse([PackageListResponse.payload(p) for p in packages]).body)
+    assert fast == _validated(PackageListResponse, packages)
+
+
+def test_list_routes_use_fast_path(client, catalog):
+    resp = client.get("/coupons/", params={"active_only": False, "limit": 1})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.headers["X-Next-Cursor"]
+    assert len(resp.json()) == 1
+    assert client.get("/packages/").json()[0]["coupon_count"] == 1
+
+
+def test_project_requires_required_fields():
+    with pytest.raises(KeyError):
+        project(PackageListResponse, {"name": "No id"})
@@ -12,6 +12,7 @@ client = TestClient(app)
 
 MOCK_USER_ID = "550e8400-e29b-41d4-a716-446655440001"
 MOCK_ORDER_ID = "550e8400-e29b-41d4-a716-446655440099"
+MOCK_COUPON_ID = "550e8400-e29b-41d4-a716-446655440042"
 
 @pytest.fixture
 def mock_db():
@@ -29,18 +30,19 @@ def test_payment_init_out_of_stock(mock_db):
         
         # Mock Coupon - OUT OF STOCK
         mock_coupon = Coupon(
+            id=MOCK_COUPON_ID,
             code="TEST",
             stock=0, # No stock
             is_active=True
         )
         
-        mock_item = OrderItem(quantity=1, coupon=mock_coupon)
+        mock_item = OrderItem(quantity=1, coupon=mock_coupon, coupon_id=MOCK_COUPON_ID)
         mock_item.coupon = mock_coupon
         
         mock_order = Order(id=MOCK_ORDER_ID, user_id=MOCK_USER_ID, total_amount=10.0, items=[mock_item])
         
         # Database Mocks
-        def query_side_effect(model):
+        def query_side_effect(model, *columns):
             mock_q = MagicMock()
             if model == Order:
                  mock_q.filter.return_value.first.return_value = mock_order
@@ -89,7 +91,7 @@ def test_payment_init_stock_available(mock_db):
         
         # Database Mocks
         from app.models.payment import Payment
-        def query_side_effect(model):
+        def query_side_effect(model, *columns):
             mock_q = MagicMock()
             if model == Order:
                  mock_q.filter.return_value.first.return_value = mock_order
@@ -0,0 +1,180 @@
+"""Tests for Redis stock reservations: reserve at /payments/init, commit, release, expiry, reconcile."""
+import uuid
+
+import pytest
+
+from app.models.coupon import Coupon
+from app.models.payment import Payment, PaymentStatus
+from app.services import stock_service
+from app.services.stock_service import StockService
+from app.services.stripe.payment_service import StripePaymentService
+from app.services.stripe.webhook_service import StripeWebhookService
+
+from tests.conftest import REGULAR_PHONE
+
+OTHER_PHONE = {"country_code": "+1", "number": "2025550101", "email": "other@example.com"}
+
+
+def _coupon(client, admin_user, code, stock):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage", "discount_amount": 10.0,
+        "is_active": True, "stock": stock, "pricing": {"USD": {"price": 2.0}},
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+def _counter(fake_redis, coupon_id):
+    value = fake_redis.hget(StockService.STOCK_KEY, coupon_id)
+    return None if value is None else int(value)
+
+
+@pytest.fixture
+def fake_intents(monkeypatch):
+    def create_payment_intent(self, order_id, amount, currency, metadata):
+        payment = Payment(
+            order_id=order_id, stripe_payment_intent_id=f"pi_{order_id}", amount=amount,
+            currency=currency, status=PaymentStatus.PENDING.value,
+        )
+        self.db.add(payment)
+        self.db.commit()
+        return payment
+    monkeypatch.setattr(StripePaymentService, "create_payment_intent", create_payment_intent)
+
+
+def _buyer(client, phone):
+    client.post("/auth/register", json={**phone, "password": "userpass123", "full_name": "Buyer"})
+    token = client.post("/auth/login", json={**phone, "password": "userpass123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _checkout(client, headers, coupon_id, quantity):
+    assert client.post("/cart/add", json={"coupon_id": coupon_id, "quantity": quantity}, headers=headers).status_code in (200, 201)
+    order = client.post("/orders/checkout", json={"payment_method": "stripe"}, headers=headers).json()
+    return order["id"], client.post("/payments/init", json={
+        "order_id": order["id"], "currency": "USD", "return_url": "https://example.com/return",
+    }, headers=headers)
+
+
+def _webhook(db, event_type, order_id):
+    return StripeWebhookService(db).handle_webhook_event(
+        {"id": f"evt_{uuid.uuid4().hex}", "type": event_type, "data": {"object": {"id": f"pi_{order_id}"}}}
+    )
+
+
+def test_checkout_reserves_and_payment_commits(client, admin_user, db, fake_redis, fake_intents):
+    coupon_id = _coupon(client, admin_user, "HOLD-A", stock=3)
+    first, second = _buyer(client, REGULAR_PHONE), _buyer(client, OTHER_PHONE)
+
+    order_id, resp = _checkout(client, first, coupon_id, 2)
+    assert resp.status_code == 200, resp.text
+    assert _counter(fake_redis, coupon_id) == 1
+    assert fake_redis.hgetall(f"{StockService.HOLD_PREFIX}:{order_id}") == {coupon_id.encode(): b"2"}
+
+    # The database still says 3, but only one unit is left to reserve
+    _, resp = _checkout(client, second, coupon_id, 2)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Coupon 'HOLD-A' is out of stock (Requested: 2, Available: 1)"
+
+    assert _webhook(db, "payment_intent.succeeded", order_id)["status"] == "success"
+    db.expire_all()
+    coupon = db.get(Coupon, uuid.UUID(coupon_id))
+    assert (coupon.stock, coupon.current_uses) == (1, 2)
+    assert _counter(fake_redis, coupon_id) == 1
+    assert fake_redis.exists(f"{StockService.HOLD_PREFIX}:{order_id}") == 0
+    assert fake_redis.hgetall(StockService.HELD_KEY) == {}
+
+
+@pytest.mark.parametrize("event_type", ["payment_intent.payment_failed", "payment_intent.canceled"])
+def test_failed_or_cancelled_payment_releases_hold(client, admin_user, db, fake_redis, fake_intents, event_type):
+    coupon_id = _coupon(client, admin_user, "HOLD-B", stock=2)
+    order_id, resp = _checkout(client, _buyer(client, REGULAR_PHONE), coupon_id, 2)
+    assert resp.status_code == 200, resp.text
+    assert _counter(fake_redis, coupon_id) == 0
+
+    _webhook(db, event_type, order_id)
+    assert _counter(fake_redis, coupon_id) == 2
+    assert fake_redis.zrangebyscore(StockService.HOLDS_INDEX, 0, float("inf")) == []
+    db.expire_all()
+    assert db.get(Coupon, uuid.UUID(coupon_id)).stock == 2
+
+
+def test_expired_holds_are_released_and_late_payment_still_counts(db, fake_redis, monkeypatch):
+    coupon = Coupon(code="HOLD-C", title="Hold C", discount_type="percentage", discount_amount=5.0, stock=2)
+    db.add(coupon)
+    db.commit()
+    coupon_id = str(coupon.id)
+    monkeypatch.setattr(stock_service, "STOCK_HOLD_SECONDS", -1)  # every hold is already past its deadline
+
+    assert StockService.reserve(db, "order-1", {coupon.id: 2}).reserved
+    assert _counter(fake_redis, coupon_id) == 0
+    # The next reservation sweeps the expired hold first, so the units are there again
+    assert StockService.reserve(db, "order-2", {coupon.id: 1}).reserved
+    assert _counter(fake_redis, coupon_id) == 1
+    assert fake_redis.exists(f"{StockService.HOLD_PREFIX}:order-1") == 0
+
+    # order-1 is paid anyway: its units are taken directly, and the overrun is clamped
+    assert StockService.commit("order-1", {coupon.id: 2}) is False
+    assert _counter(fake_redis, coupon_id) == 0
+
+
+def test_counters_are_seeded_net_of_holds(db, fake_redis):
+    limited = Coupon(code="HOLD-D", title="Hold D", discount_type="percentage", discount_amount=5.0, stock=5)
+    unlimited = Coupon(code="HOLD-E", title="Hold E", discount_type="percentage", discount_amount=5.0)
+    db.add_all([limited, unlimited])
+    db.commit()
+
+    assert StockService.reserve(db, "order-1", {limited.id: 2, unlimited.id: 10}).reserved
+    assert StockService.sync(db, [limited.id, unlimited.id]) == {str(limited.id): 3, str(unlimited.id): -1}
+    assert StockService.seed({limited.id: 4}) == {str(limited.id): 2}
+    assert StockService.release("order-1") == 1
+    assert _counter(fake_redis, str(limited.id)) == 4
+
+
+def test_reserve_without_redis_defers_to_database(db):
+    assert StockService.reserve(db, "order-1", {uuid.uuid4(): 1}) is None
+
+
+def test_init_checks_stock_column_without_redis(client, admin_user, db, fake_intents):
+    coupon_id = _coupon(client, admin_user, "HOLD-DB", stock=2)
+    headers = _buyer(client, REGULAR_PHONE)
+    assert client.post("/cart/add", json={"coupon_id": coupon_id, "quantity": 2}, headers=headers).status_code in (200, 201)
+    order = client.post("/orders/checkout", json={"payment_method": "stripe"}, headers=headers).json()
+
+    db.get(Coupon, uuid.UUID(coupon_id)).stock = 1
+    db.commit()
+    resp = client.post("/payments/init", json={
+        "order_id": order["id"], "currency": "USD", "return_url": "https://example.com/return",
+    }, headers=headers)
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "Coupon 'HOLD-DB' is out of stock (Requested: 2, Available: 1)"
+
+
+def test_reconcile_fixes_drift_in_keyset_batches(db, fake_redis):
+    coupons = [
+        Coupon(code=f"RECON-{i}", title=f"Recon {i}", discount_type="percentage", discount_amount=5.0, stock=stock)
+        for i, stock in enumerate([10, 4, None, 7, 3])
+    ]
+    db.add_all(coupons)
+    db.commit()
+    ten, four, unlimited, seven, three = coupons
+    assert StockService.reserve(db, "order-1", {ten.id: 2}).reserved  # seeds ten at 8, holds 2
+
+    fake_redis.hset(StockService.STOCK_KEY, str(four.id), 9)       # overcounts by 5
+    fake_redis.hset(StockService.STOCK_KEY, str(unlimited.id), 1)  # limited in Redis, unlimited in the DB
+    fake_redis.hset(StockService.STOCK_KEY, str(seven.id), 6)      # undercounts by 1
+    # three has no counter yet and is left alone
+
+    before = fake_redis.round_trips
+    report = StockService.reconcile(db, batch_size=2)
+    assert fake_redis.round_trips - before == 3  # one HMGET snapshot per batch
+    assert {k: report[k] for k in ("coupons", "counters", "drifted", "overcounted", "units_drift", "max_drift")} == {
+        "coupons": 5, "counters": 4, "drifted": 3, "overcounted": 1, "units_drift": 6, "max_drift": 5,
+    }
+    assert _counter(fake_redis, str(ten.id)) == 8
+    assert _counter(fake_redis, str(four.id)) == 4
+    assert _counter(fake_redis, str(unlimited.id)) == -1
+    assert _counter(fake_redis, str(seven.id)) == 7
+    assert _counter(fake_redis, str(three.id)) is None
+
+    assert StockService.reconcile(db)["drifted"] == 0
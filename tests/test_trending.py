@@ -0,0 +1,79 @@
+"""Tests for hourly-bucketed, sliding-window trending."""
+import time
+
+import pytest
+
+from app.services.redis_service import RedisService
+
+HOUR = 3600
+
+
+def _coupon(client, admin_user, code):
+    resp = client.post("/coupons/", json={
+        "code": code, "title": code.title(), "discount_type": "percentage",
+        "discount_amount": 10.0, "is_active": True,
+    }, headers=admin_user["headers"])
+    assert resp.status_code == 201, resp.text
+    return resp.json()["id"]
+
+
+def test_window_weights_slide_and_decay(monkeypatch):
+    now = 1000 * HOUR + HOUR / 4  # a quarter into hour 1000
+    weights = RedisService._trending_weights(24, now)
+    assert len(weights) == 25
+    assert weights[RedisService._bucket_key(1000)] == 1.0
+    assert weights[RedisService._bucket_key(976)] == pytest.approx(0.75)
+    assert RedisService._bucket_key(975) not in weights
+
+    monkeypatch.setattr(RedisService, "TRENDING_HALF_LIFE_HOURS", 6.0)
+    decayed = RedisService._trending_weights(24, now)
+    assert decayed[RedisService._bucket_key(994)] == pytest.approx(0.5)
+    assert decayed[RedisService._bucket_key(976)] == pytest.approx(0.75 / 16)
+
+
+def test_old_views_fall_out_of_the_window(client, admin_user, fake_redis):
+    hot_yesterday, rising = _coupon(client, admin_user, "TRD-OLD"), _coupon(client, admin_user, "TRD-NEW")
+    hour = int(time.time() // HOUR)
+    fake_redis.zincrby(RedisService._bucket_key(hour - 30), 500.0, hot_yesterday)
+    fake_redis.zincrby(RedisService._bucket_key(hour - 2), 3.0, hot_yesterday)
+    fake_redis.zincrby(RedisService._bucket_key(hour), 5.0, rising)
+
+    day = client.get("/coupons/trending", params={"period": "24h"}).json()
+    assert [c["id"] for c in day] == [rising, hot_yesterday]
+    week = client.get("/coupons/trending", params={"period": "7d"}).json()
+    assert [c["id"] for c in week] == [hot_yesterday, rising]
+    hour_only = client.get("/coupons/trending", params={"period": "1h"}).json()
+    assert [c["id"] for c in hour_only] == [rising]
+
+
+def test_trending_is_materialized_between_refreshes(client, admin_user, fake_redis):
+    first, second = _coupon(client, admin_user, "TRD-A"), _coupon(client, admin_user, "TRD-B")
+    client.post(f"/coupons/{first}/view")
+    assert [c["id"] for c in client.get("/coupons/trending").json()] == [first]
+
+    for _ in range(3):
+        client.post(f"/coupons/{second}/view")
+    # Served from the materialized ranking until it expires
+    assert [c["id"] for c in client.get("/coupons/trending").json()] == [first]
+    top_key = f"{RedisService.TRENDING_TOP_PREFIX}:24h"
+    assert 0 < fake_redis.ttl(top_key) <= RedisService.TRENDING_REFRESH_SECONDS
+
+    fake_redis.delete(top_key)
+    assert [c["id"] for c in client.get("/coupons/trending").json()] == [second, first]
+
+
+def test_inactive_coupons_do_not_shorten_trending(client, admin_user, fake_redis):
+    ids = [_coupon(client, admin_user, f"TRD-R{i}") for i in range(4)]
+    hour = int(time.time() // HOUR)
+    for rank, coupon_id in enumerate(ids):
+        fake_redis.zincrby(RedisService._bucket_key(hour), 10.0 - rank, coupon_id)
+    for coupon_id in ids[:2]:
+        client.put(f"/coupons/{coupon_id}", json={"is_active": False}, headers=admin_user["headers"])
+
+    trending = client.get("/coupons/trending", params={"limit": 2}).json()
+    assert [c["id"] for c in trending] == ids[2:]
+
+    for coupon_id in ids[2:]:
+        client.put(f"/coupons/{coupon_id}", json={"is_active": False}, headers=admin_user["headers"])
+    newest = _coupon(client, admin_user, "TRD-FRESH")
+    assert [c["id"] for c in client.get("/coupons/trending", params={"limit": 2}).json()] == [newest]
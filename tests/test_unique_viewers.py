@@ -0,0 +1,90 @@
+"""Tests for HyperLogLog unique-viewer counting."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.cache import invalidate_namespace, NS_ANALYTICS
+from app.services.coupon_view_service import CouponViewService
+from app.services.redis_service import RedisService
+
+
+@pytest.fixture
+def coupons(client, admin_user):
+    ids = []
+    for code in ("HLL-A", "HLL-B"):
+        resp = client.post("/coupons/", json={
+            "code": code, "title": code.title(), "discount_type": "percentage", "discount_amount": 10.0, "is_active": True,
+        }, headers=admin_user["headers"])
+        assert resp.status_code == 201, resp.text
+        ids.append(resp.json()["id"])
+    return ids
+
+
+def _view(client, coupon_id, session_id=None):
+    params = {"session_id": session_id} if session_id else {}
+    assert client.post(f"/coupons/{coupon_id}/view", params=params).status_code == 201
+
+
+def test_views_feed_coupon_and_site_wide_sketches(client, coupons, fake_redis):
+    first, second = coupons
+    for session_id in ["s-1", "s-1", "s-2", None]:
+        _view(client, first, session_id)
+    _view(client, second, "s-2")
+    _view(client, second, "s-3")
+
+    today = datetime.utcnow().date()
+    assert RedisService.count_unique_viewers(first) == 2
+    assert RedisService.count_unique_viewers(second, since=today) == 2
+    assert RedisService.count_unique_viewers() == 3
+    assert RedisService.count_unique_viewers_many([first, second]) == {first: 2, second: 2}
+    assert 0 < fake_redis.ttl(RedisService._unique_key(first, today)) <= RedisService.UNIQUE_RETENTION_DAYS * 86400
+
+
+def test_ranges_merge_closed_days_once_and_count_today_live(coupons, fake_redis):
+    coupon_id = coupons[0]
+    today = datetime.utcnow().date()
+    for days_ago, viewers in [(5, ["a"]), (2, ["a", "b"]), (1, ["c"])]:
+        for viewer in viewers:
+            RedisService.record_unique_viewer(coupon_id, viewer, day=today - timedelta(days=days_ago))
+    RedisService.record_unique_viewer(coupon_id, "d")
+
+    since = today - timedelta(days=2)
+    assert RedisService.count_unique_viewers(coupon_id, since) == 4
+    merged = f"{RedisService.UNIQUE_PREFIX}:range:{coupon_id}:{since:%Y%m%d}:{today - timedelta(days=1):%Y%m%d}"
+    assert fake_redis.pfcount(merged) == 3 and fake_redis.ttl(merged) > 0
+
+    RedisService.record_unique_viewer(coupon_id, "e")  # today stays live
+    assert RedisService.count_unique_viewers(coupon_id, since) == 5
+    assert RedisService.count_unique_viewers(coupon_id, today - timedelta(days=6)) == 5
+    assert RedisService.count_unique_viewers(coupon_id, today) == 2
+
+
+def test_analytics_estimate_by_default_and_count_exactly_on_request(client, admin_user, coupons, fake_redis):
+    coupon_id = coupons[0]
+    for session_id in ["s-1", "s-2", "s-2"]:
+        _view(client, coupon_id, session_id)
+    # A viewer seen only by the sketch tells the two modes apart
+    RedisService.record_unique_viewer(coupon_id, RedisService.viewer_member(session_id="s-9"))
+    headers = admin_user["headers"]
+
+    estimated = client.get(f"/admin/analytics/coupons/{coupon_id}", headers=headers).json()
+    assert (estimated["unique_viewers"], estimated["unique_viewers_last_7_days"]) == (3, 3)
+    exact = client.get(f"/admin/analytics/coupons/{coupon_id}", params={"exact_uniques": True}, headers=headers).json()
+    assert (exact["unique_viewers"], exact["unique_viewers_last_30_days"]) == (2, 2)
+
+    listing = client.get("/admin/analytics/coupons", headers=headers).json()["items"]
+    assert {item["coupon_id"]: item["unique_viewers"] for item in listing} == {coupon_id: 3, coupons[1]: 0}
+
+    client.post("/cart/add", json={"coupon_id": coupon_id, "quantity": 1}, headers=headers)
+    client.post("/orders/checkout", json={"payment_method": "mock"}, headers=headers)
+    invalidate_namespace(NS_ANALYTICS)
+    assert client.get("/admin/analytics/quick-stats", headers=headers).json()["today"]["conversion_rate"] == 33.33
+    exact_stats = client.get("/admin/analytics/quick-stats", params={"exact_uniques": True}, headers=headers).json()
+    assert exact_stats["today"]["conversion_rate"] == 50.0
+
+
+def test_falls_back_to_exact_counts_without_redis(client, db, coupons):
+    _view(client, coupons[0], "s-1")
+    _view(client, coupons[0], "s-2")
+    assert RedisService.count_unique_viewers(coupons[0]) is None
+    assert CouponViewService.get_unique_viewers(db, coupons[0]) == 2
@@ -0,0 +1,107 @@
+"""Tests for write-behind coupon view ingestion."""
+import time
+from datetime import datetime
+
+import pytest
+
+from app.cache import _generation_key, NS_ANALYTICS
+from app.models.coupon import Coupon
+from app.models.coupon_view import CouponView
+from app.services import coupon_view_service, view_buffer as view_buffer_module
+from app.services.view_buffer import ViewBuffer
+
+IDLE_MS = 60_000  # the flusher thread never fires on its own during a test
+
+
+@pytest.fixture
+def coupon(db):
+    coupon = Coupon(code="VIEW-BUF", title="View Buf", discount_type="percentage", discount_amount=5.0)
+    db.add(coupon)
+    db.commit()
+    return coupon
+
+
+def _row(coupon):
+    return {"coupon_id": coupon.id, "user_id": None, "session_id": "s-1", "viewed_at": datetime.utcnow()}
+
+
+def _stored(db):
+    db.expire_all()
+    return db.query(CouponView).count()
+
+
+def _generation(fake_redis):
+    return int(fake_redis.get(_generation_key(NS_ANALYTICS)) or 0)
+
+
+def test_views_are_buffered_and_flushed_in_one_transaction(db, coupon, fake_redis):
+    buffer = ViewBuffer(flush_ms=IDLE_MS, flush_rows=100, max_rows=1000)
+    for _ in range(5):
+        buffer.add(db, _row(coupon))
+    assert buffer.pending() == 5
+    assert _stored(db) == 0
+
+    generation = _generation(fake_redis)
+    assert buffer.flush() == 5
+    assert _stored(db) == 5
+    assert _generation(fake_redis) == generation  # analytics caches age out; flushes don't wipe them
+    assert buffer.stats()["flushes"] == 1
+    assert buffer.flush() == 0
+
+
+def test_flusher_wakes_up_at_flush_rows(db, coupon):
+    buffer = ViewBuffer(flush_ms=IDLE_MS, flush_rows=3, max_rows=1000)
+    for _ in range(3):
+        buffer.add(db, _row(coupon))
+    deadline = time.monotonic() + 5
+    while buffer.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert buffer.pending() == 0
+    assert _stored(db) == 3
+
+
+def test_full_buffer_is_drained_by_the_request(db, coupon):
+    buffer = ViewBuffer(flush_ms=IDLE_MS, flush_rows=100, max_rows=4)
+    for _ in range(4):
+        buffer.add(db, _row(coupon))
+    assert buffer.pending() == 0
+    assert _stored(db) == 4
+    assert buffer.stats()["request_flushes"] == 1
+
+
+def test_failed_flush_requeues_within_bounds(db, coupon, monkeypatch):
+    buffer = ViewBuffer(flush_ms=IDLE_MS, flush_rows=100, max_rows=3)
+    for _ in range(2):
+        buffer.add(db, _row(coupon))
+
+    def fail(session, rows):
+        raise RuntimeError("database is down")
+    monkeypatch.setattr(view_buffer_module, "write_views", fail)
+    assert buffer.flush() == 0
+    assert buffer.pending() == 2
+
+    buffer.add(db, _row(coupon))  # hits max_rows: the request tries to drain, fails, keeps what fits
+    assert buffer.pending() == 3
+    buffer._requeue([_row(coupon), _row(coupon)])
+    assert buffer.pending() == 3
+    assert buffer.stats()["dropped"] == 2
+    assert buffer.stats()["failed_flushes"] == 2
+
+    monkeypatch.undo()
+    assert buffer.flush() == 3
+    assert _stored(db) == 3
+
+
+def test_view_route_goes_through_the_buffer(client, db, coupon, monkeypatch):
+    buffer = ViewBuffer(flush_ms=IDLE_MS, flush_rows=100, max_rows=1000)
+    monkeypatch.setattr(coupon_view_service, "view_buffer", buffer)
+    for _ in range(3):
+        assert client.post(f"/coupons/{coupon.id}/view", params={"session_id": "s-1"}).status_code == 201
+    assert _stored(db) == 0
+    assert buffer.flush() == 3
+    assert _stored(db) == 3
+
+
+def test_write_through_when_buffering_is_off(client, db, coupon):
+    assert client.post(f"/coupons/{coupon.id}/view").status_code == 201
+    assert _stored(db) == 1